@@ -2,7 +2,23 @@
 # pylint: disable=invalid-name
 import time
 
-from sphinx_imgur.imgur import DEFAULT_EXT, DEFAULT_SIZE, IMG_SRC_FORMAT, TARGET_FORMAT
+from sphinx_imgur.imgur import (
+    API_URL,
+    DEFAULT_CACHE_MAX_SIZE,
+    DEFAULT_CACHE_TTL,
+    DEFAULT_CHECK_TTL,
+    DEFAULT_DOWNLOAD_WORKERS,
+    DEFAULT_EMBED_LOADING,
+    DEFAULT_EMBED_MODE,
+    DEFAULT_EMBED_SCRIPT,
+    DEFAULT_EXT,
+    DEFAULT_HTTP_RETRIES,
+    DEFAULT_PRELOAD,
+    DEFAULT_SIZE,
+    IMG_SRC_FORMAT,
+    OEMBED_URL,
+    TARGET_FORMAT,
+)
 
 
 # General configuration.
@@ -26,6 +42,31 @@ rst_epilog = f"""
 .. |LABEL_IMG_SRC_FORMAT| replace:: :guilabel:`{IMG_SRC_FORMAT}`
 .. |LABEL_TARGET_FORMAT| replace:: :guilabel:`{TARGET_FORMAT}`
 .. |LABEL_HIDE_POST_DETAILS| replace:: :guilabel:`False`
+.. |LABEL_DIMENSIONS| replace:: :guilabel:`False`
+.. |LABEL_DOWNLOAD_WORKERS| replace:: :guilabel:`{DEFAULT_DOWNLOAD_WORKERS}`
+.. |LABEL_EMBED_LOADING| replace:: :guilabel:`{DEFAULT_EMBED_LOADING}`
+.. |LABEL_EMBED_MODE| replace:: :guilabel:`{DEFAULT_EMBED_MODE}`
+.. |LABEL_EMBED_SCRIPT| replace:: :guilabel:`{DEFAULT_EMBED_SCRIPT}`
+.. |LABEL_CLIENT_ID| replace:: :guilabel:`None`
+.. |LABEL_API_URL| replace:: :guilabel:`{API_URL}`
+.. |LABEL_OEMBED_URL| replace:: :guilabel:`{OEMBED_URL}`
+.. |LABEL_BUILDER_POLICY| replace:: :guilabel:`{{}}`
+.. |LABEL_CACHE_DIR| replace:: :guilabel:`None`
+.. |LABEL_CACHE_MAX_SIZE| replace:: :guilabel:`{DEFAULT_CACHE_MAX_SIZE}`
+.. |LABEL_CACHE_TTL| replace:: :guilabel:`{DEFAULT_CACHE_TTL}`
+.. |LABEL_CHECK_TTL| replace:: :guilabel:`{DEFAULT_CHECK_TTL}`
+.. |LABEL_FORMATS| replace:: :guilabel:`()`
+.. |LABEL_HTTP_BUDGET| replace:: :guilabel:`None`
+.. |LABEL_HTTP_RATE| replace:: :guilabel:`None`
+.. |LABEL_HTTP_RETRIES| replace:: :guilabel:`{DEFAULT_HTTP_RETRIES}`
+.. |LABEL_MANIFEST| replace:: :guilabel:`None`
+.. |LABEL_METRICS| replace:: :guilabel:`None`
+.. |LABEL_MIRROR| replace:: :guilabel:`False`
+.. |LABEL_PLACEHOLDERS| replace:: :guilabel:`False`
+.. |LABEL_PRECONNECT| replace:: :guilabel:`True`
+.. |LABEL_PRELOAD| replace:: :guilabel:`{DEFAULT_PRELOAD}`
+.. |LABEL_SRCSET| replace:: :guilabel:`()`
+.. |LABEL_SRCSET_SIZES| replace:: :guilabel:`None`
 """
 
 
@@ -0,0 +1,167 @@
+"""Embed metadata from Imgur for static embeds (imgur_embed_mode = "static").
+
+Albums are rendered as galleries using metadata from Imgur's API, images are rendered directly (with their dimensions,
+so nothing shifts when they load) using Imgur's oEmbed data. This replaces one widget per embed loading Imgur's
+JavaScript and iframes in the browser.
+
+Every embed of the project is looked up at once after all documents are read, through the HTTP client used to download
+images (see client.py). Responses are kept in imgur-embeds.json (in imgur_cache_dir or the doctree directory) for
+imgur_cache_ttl seconds. Once Imgur reports few remaining credits or rejects a request no more requests are made. Embeds
+without metadata keep using Imgur's widget.
+"""
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+from sphinx.util import logging
+
+from sphinx_imgur.cache import cache_path, load_json, save_json
+from sphinx_imgur.client import BudgetExceeded, get_client, ImgurHttpClient, RateLimited
+from sphinx_imgur.environment import iter_references
+from sphinx_imgur.metrics import METRICS, timed
+from sphinx_imgur.nodes import EMBED_TARGET_FORMAT
+
+ALBUM_PREFIX = "a/"
+METADATA_FILE = "imgur-embeds.json"
+METADATA_VERSION = 1
+logger = logging.getLogger(__name__)
+
+
+def parse_album(response: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep what galleries need from an API album response.
+
+    :param response: The response.
+    """
+    data = response["data"]
+    images = []
+    for entry in data.get("images") or []:
+        ext = os.path.splitext(urlsplit(entry.get("link") or "").path)[1].lstrip(".")
+        images.append(
+            {
+                "id": entry["id"],
+                "title": entry.get("title") or "",
+                "width": entry.get("width") or 0,
+                "height": entry.get("height") or 0,
+                "ext": ext or "jpg",
+            }
+        )
+    return {"title": data.get("title") or "", "images": images}
+
+
+def parse_oembed(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep what static images need from an oEmbed response.
+
+    :param data: The response.
+
+    :raises ValueError: Dimensions missing.
+    """
+    width, height = int(data["width"]), int(data["height"])
+    if width <= 0 or height <= 0:
+        raise ValueError("invalid dimensions {}x{}".format(width, height))
+    return {"title": data.get("title") or "", "width": width, "height": height}
+
+
+def fetch_metadata(client: ImgurHttpClient, url: str, headers: Dict[str, str], parse: Callable) -> Optional[Dict[str, Any]]:
+    """Fetch one album's or image's metadata.
+
+    :param client: HTTP client.
+    :param url: API or oEmbed URL.
+    :param headers: Request headers (authorization).
+    :param parse: Function keeping what's needed from the decoded JSON response.
+
+    :returns: Parsed metadata, None on failure or when out of credits.
+    """
+    try:
+        response = client.get(url, headers=headers)
+        response.raise_for_status()
+        metadata = parse(response.json())
+    except (RateLimited, BudgetExceeded):
+        return None
+    except (requests.RequestException, ValueError, KeyError, TypeError) as exc:
+        METRICS.count(api_failures=1)
+        logger.verbose("Could not fetch Imgur metadata: %s [%s]", url, exc)
+        return None
+    METRICS.count(api_requests=1)
+    return metadata
+
+
+def embed_docs(env: BuildEnvironment) -> Dict[str, List[str]]:
+    """Return embedded Imgur IDs (e.g. a/hWyW0 or 611EovQ) mapped to the documents embedding them.
+
+    :param env: Sphinx build environment.
+    """
+    embeds: Dict[str, List[str]] = {}
+    for docname, entry in iter_references(env, {"imgur-embed"}):
+        embeds.setdefault(entry["imgur_id"], []).append(docname)
+    return embeds
+
+
+def refresh_metadata(app: Sphinx, imgur_ids: List[str], stored: Dict[str, Dict[str, Any]]):
+    """Fetch metadata not fetched recently, updating stored metadata in place.
+
+    :param app: Sphinx application object.
+    :param imgur_ids: Embedded Imgur IDs.
+    :param stored: Previously fetched metadata keyed by Imgur ID.
+    """
+    config = app.config
+    now = time.time()
+    stale = sorted(i for i in imgur_ids if now - stored.get(i, {}).get("fetched", 0) >= config["imgur_cache_ttl"])
+    albums = [i for i in stale if i.startswith(ALBUM_PREFIX)]
+    if albums and not config["imgur_client_id"]:
+        logger.warning("imgur_client_id not set, %d albums rendered with Imgur's embed widget", len(albums))
+        stale = [i for i in stale if i not in albums]
+    if not stale:
+        return
+
+    headers = {"Authorization": "Client-ID {}".format(config["imgur_client_id"])}
+    api_url = config["imgur_api_url"].rstrip("/")
+
+    def request(imgur_id: str):
+        """Return the URL, headers, and response parser for an Imgur ID."""
+        if imgur_id.startswith(ALBUM_PREFIX):
+            url = "{}/album/{}".format(api_url, imgur_id[slice(len(ALBUM_PREFIX), None)])
+            return url, headers, parse_album
+        url = "{}?{}".format(config["imgur_oembed_url"], urlencode({"url": EMBED_TARGET_FORMAT.format(imgur_id)}))
+        return url, {}, parse_oembed
+
+    logger.info("fetching metadata of %d Imgur embeds... ", len(stale), nonl=True)
+    client = get_client(app)
+    results = client.map(lambda c, i: fetch_metadata(c, *request(i)), stale)
+    fetched = {i: dict(r, fetched=now) for i, r in zip(stale, results) if r is not None}
+    logger.info("%d done", len(fetched))
+    if client.is_limited(api_url) or client.is_limited(config["imgur_oembed_url"]):
+        logger.warning("Imgur API rate limit reached, using previously fetched metadata")
+    if fetched:
+        stored.update(fetched)
+        save_json(cache_path(app, METADATA_FILE), METADATA_VERSION, "embeds", stored)
+
+
+@timed
+def fetch_embeds(app: Sphinx, env: BuildEnvironment) -> List[str]:
+    """Fetch metadata for static embeds, remembering it in app.imgur_embeds. Called on env-updated.
+
+    :param app: Sphinx application object.
+    :param env: Sphinx build environment.
+
+    :returns: Documents to write again because their embeds changed, or became (un)available as static embeds.
+    """
+    embeds = {}
+    docnames = {}
+    if app.builder.format == "html" and app.config["imgur_embed_mode"] == "static":
+        docnames = embed_docs(env)
+    if docnames:
+        stored = load_json(cache_path(app, METADATA_FILE), METADATA_VERSION, "embeds")
+        refresh_metadata(app, list(docnames), stored)
+        for imgur_id in docnames:
+            if imgur_id in stored:
+                embeds[imgur_id] = {k: v for k, v in stored[imgur_id].items() if k != "fetched"}
+    app.imgur_embeds = embeds
+
+    previous = getattr(env, "imgur_embeds", {})
+    env.imgur_embeds = embeds
+    changed = {i for i in set(previous) | set(embeds) if previous.get(i) != embeds.get(i)}
+    return sorted({d for i in changed for d in docnames.get(i, [])})
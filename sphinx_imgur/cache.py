@@ -0,0 +1,243 @@
+"""Persistent on-disk cache of Imgur images shared by all builds using the same directory.
+
+Files are stored under objects/ keyed by Imgur ID, size and extension (e.g. 611EovQh.jpg). An index.json file tracks HTTP
+validators (ETag, Last-Modified), when each entry was last validated and last used for LRU eviction. The index is only
+read-modified-written while holding an exclusive lock on index.lock so concurrent builds never clobber each other; objects
+are replaced atomically.
+
+Other files kept between builds (embed metadata, image dimensions, placeholders, imgurcheck results) are versioned JSON
+files too, located with cache_path() and read and written with load_json() and save_json().
+"""
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, IO, Iterable, Optional
+
+from sphinx.application import Sphinx
+from sphinx.util import logging
+from sphinx.util.osutil import ensuredir
+
+try:
+    import fcntl
+
+    def lock_file(handle: IO):
+        """Block until an exclusive lock on the open file is acquired."""
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+
+    def unlock_file(handle: IO):
+        """Release the lock."""
+        fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+
+except ImportError:  # Windows.
+    import msvcrt
+
+    def lock_file(handle: IO):
+        """Block until an exclusive lock on the first byte of the open file is acquired."""
+        handle.seek(0)
+        while True:
+            try:
+                msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:  # Gives up after 10 seconds, keep trying.
+                continue
+
+    def unlock_file(handle: IO):
+        """Release the lock."""
+        handle.seek(0)
+        msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+INDEX_VERSION = 1
+logger = logging.getLogger(__name__)
+
+
+def cache_key(imgur_id: str, size: str, ext: str) -> str:
+    """Return the cache key (and object file name) of an image.
+
+    :param imgur_id: Imgur image ID.
+    :param size: Imgur size character, empty for the original image.
+    :param ext: File extension.
+    """
+    return "{}{}.{}".format(imgur_id, size, ext)
+
+
+def cache_path(app: Sphinx, filename: str) -> str:
+    """Return where a file is kept between builds, in imgur_cache_dir (shared with other builds) when set.
+
+    :param app: Sphinx application object.
+    :param filename: File name, e.g. imgur-embeds.json.
+    """
+    if app.config["imgur_cache_dir"]:
+        return os.path.join(app.confdir, app.config["imgur_cache_dir"], filename)
+    return os.path.join(app.doctreedir, filename)
+
+
+def load_json(path: str, version: int, key: str) -> Dict[str, Any]:
+    """Return data stored by save_json(), empty when the file is missing, malformed, or from another version.
+
+    :param path: JSON file.
+    :param version: Expected format version.
+    :param key: Key of the data, e.g. embeds.
+    """
+    try:
+        with open(path, encoding="utf8") as handle:
+            stored = json.load(handle)
+    except (OSError, ValueError):
+        return {}
+    if stored.get("version") != version:
+        return {}
+    return stored[key]
+
+
+def save_json(path: str, version: int, key: str, data: Dict[str, Any]):
+    """Atomically replace a JSON file with versioned data, e.g. {"version": 1, "embeds": {...}}.
+
+    :param path: JSON file.
+    :param version: Format version.
+    :param key: Key of the data.
+    :param data: Data to store.
+    """
+    ensuredir(os.path.dirname(path))
+    temporary = "{}.{}.tmp".format(path, os.getpid())
+    with open(temporary, "w", encoding="utf8") as handle:
+        json.dump({"version": version, key: data}, handle, indent=1, sort_keys=True)
+    os.replace(temporary, path)
+
+
+class ImgurCache:
+    """Size-bounded LRU cache of downloaded images."""
+
+    def __init__(self, directory: str, max_size: int, ttl: int):
+        """Constructor.
+
+        :param directory: Cache directory, created on first use.
+        :param max_size: Maximum total size of cached files in bytes before the least recently used ones are evicted.
+        :param ttl: Seconds before cached files are revalidated with Imgur.
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.ttl = ttl
+        self.stats = Counter()
+
+    @property
+    def index_path(self) -> str:
+        """Path to index.json."""
+        return os.path.join(self.directory, "index.json")
+
+    def object_path(self, key: str) -> str:
+        """Path to a cached file.
+
+        :param key: Cache key.
+        """
+        return os.path.join(self.directory, "objects", key)
+
+    @contextmanager
+    def locked(self):
+        """Hold an exclusive lock on the index, blocking until other builds release theirs."""
+        ensuredir(os.path.join(self.directory, "objects"))
+        with open(os.path.join(self.directory, "index.lock"), "a+b") as handle:
+            lock_file(handle)
+            try:
+                yield
+            finally:
+                unlock_file(handle)
+
+    def read_index(self) -> Dict[str, Dict[str, Any]]:
+        """Return index entries keyed by cache key. Should be called while holding the lock."""
+        return load_json(self.index_path, INDEX_VERSION, "entries")
+
+    def write_index(self, entries: Dict[str, Dict[str, Any]]):
+        """Atomically replace the index. Should be called while holding the lock.
+
+        :param entries: Index entries keyed by cache key.
+        """
+        save_json(self.index_path, INDEX_VERSION, "entries", entries)
+
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        """Return a snapshot of index entries whose files exist."""
+        with self.locked():
+            entries = self.read_index()
+        return {k: v for k, v in entries.items() if os.path.isfile(self.object_path(k))}
+
+    def is_fresh(self, entry: Dict[str, Any], now: Optional[float] = None) -> bool:
+        """Determine if a cached file can be used without revalidating it.
+
+        :param entry: Index entry.
+        :param now: Current time, defaults to time.time().
+        """
+        return (now or time.time()) - entry["validated"] < self.ttl
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Return HTTP headers to revalidate a cached file.
+
+        :param entry: Index entry, None when not cached.
+        """
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def update(self, updated: Dict[str, Dict[str, Any]], used: Iterable[str]):
+        """Merge new/revalidated entries into the index, mark entries as used, then evict least recently used files.
+
+        :param updated: New or revalidated index entries keyed by cache key.
+        :param used: Cache keys served from the cache.
+        """
+        now = time.time()
+        with self.locked():
+            entries = self.read_index()
+            entries.update(updated)
+            for key in used:
+                if key in entries:
+                    entries[key]["accessed"] = now
+            for key in [k for k in entries if not os.path.isfile(self.object_path(k))]:
+                entries.pop(key)
+
+            total = sum(e["bytes"] for e in entries.values())
+            for key in sorted(entries, key=lambda k: entries[k]["accessed"]):
+                if total <= self.max_size:
+                    break
+                total -= entries.pop(key)["bytes"]
+                os.remove(self.object_path(key))
+                self.stats["evicted"] += 1
+
+            self.write_index(entries)
+
+
+def get_cache(app: Sphinx) -> Optional[ImgurCache]:
+    """Return the cache configured for this build, None if disabled.
+
+    :param app: Sphinx application object.
+    """
+    if not app.config["imgur_cache_dir"]:
+        return None
+    try:
+        return app.imgur_cache
+    except AttributeError:
+        directory = os.path.join(app.confdir, app.config["imgur_cache_dir"])
+        app.imgur_cache = ImgurCache(directory, app.config["imgur_cache_max_size"], app.config["imgur_cache_ttl"])
+        return app.imgur_cache
+
+
+def report_cache_stats(app: Sphinx, _):
+    """Log cache hits and misses at the end of the build. Called on build-finished.
+
+    :param app: Sphinx application object.
+    :param _: Exception raised during the build, if any.
+    """
+    cache = get_cache(app)
+    if cache is None or not cache.stats:
+        return
+    stats = cache.stats
+    logger.info(
+        "imgur cache: %d hits, %d misses, %d revalidated, %d evicted",
+        stats["hits"],
+        stats["misses"],
+        stats["revalidated"],
+        stats["evicted"],
+    )
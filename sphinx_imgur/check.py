@@ -0,0 +1,176 @@
+"""The imgurcheck builder: validate every Imgur image, figure and embed referenced by the project.
+
+Sphinx's linkcheck builder only follows links, it never sees image URLs generated by the directives, so deleted Imgur
+images silently turn into broken pictures. This builder checks references the directives record in the build
+environment instead of writing documents:
+
+* imgur and imgur-figure: the image URL.
+* imgur-embed: the album or image through Imgur's oEmbed endpoint (404 once deleted), and the image opengraph uses
+  (including :og_imgur_id:).
+
+URLs are checked once each with concurrent HEAD requests through the build's HTTP client (see client.py), falling back
+to a single byte GET when HEAD isn't allowed. Imgur redirects deleted images to removed.png instead of answering 404, that
+counts as broken too. Working URLs are remembered in imgur-check.json (in imgur_cache_dir or the doctree directory) for
+imgur_check_ttl seconds, broken ones are checked on every run.
+
+Results are written to output.txt (problems only) and output.json in the output directory, like linkcheck.
+"""
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+import requests
+from sphinx.builders import Builder
+from sphinx.util import logging
+from sphinx.util.osutil import ensuredir
+
+from sphinx_imgur.cache import cache_path, load_json, save_json
+from sphinx_imgur.client import BudgetExceeded, get_client, ImgurHttpClient, RateLimited
+from sphinx_imgur.environment import iter_references
+from sphinx_imgur.nodes import EMBED_TARGET_FORMAT
+
+HEAD_NOT_ALLOWED = frozenset({403, 405, 501})
+REMOVED_PATH = "/removed.png"
+RESULTS_FILE = "imgur-check.json"
+RESULTS_VERSION = 1
+logger = logging.getLogger(__name__)
+
+
+def check_url(client: ImgurHttpClient, url: str) -> Tuple[str, str]:
+    """Check one URL.
+
+    :param client: HTTP client.
+    :param url: Image or oEmbed URL.
+
+    :returns: Status (working, broken or unchecked) and details.
+    """
+    try:
+        response = client.request("HEAD", url, allow_redirects=True)
+        if response.status_code in HEAD_NOT_ALLOWED:
+            with client.get(url, headers={"Range": "bytes=0-0"}, stream=True) as response:
+                pass
+        response.raise_for_status()
+    except (RateLimited, BudgetExceeded) as exc:
+        return "unchecked", str(exc)
+    except requests.RequestException as exc:
+        return "broken", str(exc)
+    if response.url.endswith(REMOVED_PATH) and not url.endswith(REMOVED_PATH):
+        return "broken", "removed from Imgur"
+    return "working", ""
+
+
+def check_urls(builder: Builder, references: List[Tuple[str, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """Return the URLs to check for each reference.
+
+    :param builder: The builder.
+    :param references: (docname, reference) tuples recorded by the directives.
+    """
+    oembed_url = builder.config["imgur_oembed_url"]
+    checks = []
+    for docname, entry in references:
+        urls = [entry["src"]] if entry["src"] else []
+        if entry["directive"] == "imgur-embed":
+            urls.insert(0, "{}?{}".format(oembed_url, urlencode({"url": EMBED_TARGET_FORMAT.format(entry["imgur_id"])})))
+        for url in urls:
+            checks.append(
+                {
+                    "docname": docname,
+                    "source": builder.env.doc2path(docname, base=False),
+                    "lineno": entry["lineno"],
+                    "directive": entry["directive"],
+                    "imgur_id": entry["imgur_id"],
+                    "uri": url,
+                }
+            )
+    return checks
+
+
+class ImgurCheckBuilder(Builder):
+    """Check Imgur references instead of writing documents."""
+
+    name = "imgurcheck"
+    epilog = "Look for any errors in the above output or in %(outdir)s/output.txt"
+
+    def init(self):
+        """Nothing to set up."""
+
+    def get_outdated_docs(self) -> Iterable[str]:
+        """Every run checks the whole project."""
+        return self.env.found_docs
+
+    def get_target_uri(self, docname: str, typ: Optional[str] = None) -> str:
+        """Nothing is written.
+
+        :param docname: Unused.
+        :param typ: Unused.
+        """
+        return ""
+
+    def prepare_writing(self, docnames: Iterable[str]):
+        """Nothing is written.
+
+        :param docnames: Unused.
+        """
+
+    def write_doc(self, docname: str, doctree: Any):
+        """Nothing is written.
+
+        :param docname: Unused.
+        :param doctree: Unused.
+        """
+
+    def write(self, build_docnames: Iterable[str], updated_docnames: Sequence[str], method: str = "update"):
+        """Skip resolving doctrees, references were recorded in the environment while reading.
+
+        :param build_docnames: Unused.
+        :param updated_docnames: Unused.
+        :param method: Unused.
+        """
+
+    def finish(self):
+        """Check every URL, then write the reports."""
+        checks = check_urls(self, list(iter_references(self.env)))
+        now = time.time()
+        ttl = self.config["imgur_check_ttl"]
+        path = cache_path(self.app, RESULTS_FILE)
+        working = {u: t for u, t in load_json(path, RESULTS_VERSION, "working").items() if now - t < ttl}
+        pending = sorted({c["uri"] for c in checks} - set(working))
+        results = {u: ("working", "cached") for u in working}
+        if pending:
+            logger.info("checking %d Imgur URLs... ", len(pending), nonl=True)
+            results.update(zip(pending, get_client(self.app).map(check_url, pending)))
+            logger.info("done")
+        working.update((u, now) for u in pending if results[u][0] == "working")
+        save_json(path, RESULTS_VERSION, "working", {u: t for u, t in working.items() if u in results})
+
+        for check in checks:
+            check["status"], check["info"] = results[check["uri"]]
+            if check["status"] != "working":
+                logger.warning(
+                    "%s Imgur %s: %s %s",
+                    check["status"],
+                    check["directive"],
+                    check["uri"],
+                    check["info"],
+                    location=(check["docname"], check["lineno"]),
+                )
+        self.write_reports(checks)
+        if any(c["status"] == "broken" for c in checks):
+            self.app.statuscode = 1
+
+    def write_reports(self, checks: List[Dict[str, Any]]):
+        """Write output.txt and output.json.
+
+        :param checks: Results of each checked URL of each reference.
+        """
+        ensuredir(self.outdir)
+        with open(os.path.join(self.outdir, "output.txt"), "w", encoding="utf8") as handle:
+            for check in checks:
+                if check["status"] != "working":
+                    handle.write("{source}:{lineno}: [{status}] {uri}: {info}\n".format(**check))
+        with open(os.path.join(self.outdir, "output.json"), "w", encoding="utf8") as handle:
+            json.dump({"version": RESULTS_VERSION, "results": checks}, handle, indent=1, sort_keys=True)
+        counts = {s: sum(c["status"] == s for c in checks) for s in ("working", "broken", "unchecked")}
+        logger.info("imgurcheck: %(working)d working, %(broken)d broken, %(unchecked)d unchecked", counts)
@@ -0,0 +1,290 @@
+"""HTTP client shared by all network work of a build (image downloads, API and oEmbed requests).
+
+One client per build keeps connections alive per host, bounds concurrency with a single thread pool, spaces requests
+with a token bucket (imgur_http_rate), retries transient failures with exponential backoff and full jitter, honours
+Retry-After and Imgur's rate limit headers, and stops after a per-build request budget (imgur_http_budget). Request
+counts and a latency histogram are included in the metrics report (imgur_metrics).
+
+Callers use ImgurHttpClient.get()/map() from threads, or get_async() from asyncio code.
+
+This module is imported when the extension loads. concurrent.futures and asyncio are slow to import and only needed by
+builds making requests, so they're imported on first use to keep within the import time budget of
+tests/benchmarks/startup.py (see DEFERRED there).
+"""
+import functools
+import random
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Set, TypeVar
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from sphinx.application import Sphinx
+from sphinx.util import logging
+
+DEFAULT_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30.0
+RATE_LIMIT_HEADERS = ("X-RateLimit-ClientRemaining", "X-RateLimit-UserRemaining")
+RATE_LIMIT_RESERVE = 10  # Credits left for everything else using the same client ID.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+TIMEOUT = 30
+R = TypeVar("R")
+T = TypeVar("T")
+logger = logging.getLogger(__name__)
+
+
+class RateLimited(requests.RequestException):
+    """The host's rate limit was reached, no more requests are made to it during this build."""
+
+
+class BudgetExceeded(requests.RequestException):
+    """The build's request budget (imgur_http_budget) is spent."""
+
+
+class TokenBucket:  # pylint: disable=too-few-public-methods
+    """Allow rate requests per second on average, with bursts of up to rate requests."""
+
+    def __init__(self, rate: float):
+        """Constructor.
+
+        :param rate: Requests per second.
+        """
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ImgurHttpClient:  # pylint: disable=too-many-instance-attributes
+    """Pooled, rate limited, retrying HTTP client."""
+
+    def __init__(
+        self,
+        workers: int = 8,
+        rate: Optional[float] = None,
+        budget: Optional[int] = None,
+        retries: int = 3,
+        backoff: float = DEFAULT_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+    ):  # pylint: disable=too-many-arguments
+        """Constructor.
+
+        :param workers: Maximum number of concurrent requests, and connections kept alive per host.
+        :param rate: Maximum requests per second, None for no limit.
+        :param budget: Maximum number of requests (including retries), None for no limit.
+        :param retries: Retries of each request after transient failures.
+        :param backoff: Delay before the first retry in seconds, doubled for each following one.
+        :param max_backoff: Longest delay between retries, also the longest Retry-After honoured.
+        """
+        from concurrent.futures import ThreadPoolExecutor  # pylint: disable=import-outside-toplevel  # See module docstring.
+
+        self.workers = max(1, workers)
+        self.bucket = TokenBucket(rate) if rate else None
+        self.budget = budget
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.limited_hosts: Set[str] = set()
+        self.stats = Counter()
+        self.latencies: List[float] = []
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="imgur-http")
+
+    def is_limited(self, url: str) -> bool:
+        """Determine if requests to the URL's host stopped because of its rate limit.
+
+        :param url: Any URL on the host.
+        """
+        return urlsplit(url).netloc in self.limited_hosts
+
+    def _take_budget(self):
+        """Count one request against the budget.
+
+        :raises BudgetExceeded: Budget spent.
+        """
+        with self.lock:
+            if self.budget is not None and self.stats["requests"] >= self.budget:
+                self.stats["budget_exceeded"] += 1
+                if self.stats["budget_exceeded"] == 1:
+                    logger.warning("imgur_http_budget of %d requests spent, skipping other requests", self.budget)
+                raise BudgetExceeded("Request budget of {} spent".format(self.budget))
+            self.stats["requests"] += 1
+
+    def _record(self, response: requests.Response, seconds: float):
+        """Track latency, and hosts reporting few remaining credits.
+
+        :param response: Response.
+        :param seconds: Latency until response headers were received.
+        """
+        remaining = [response.headers.get(h, "") for h in RATE_LIMIT_HEADERS]
+        with self.lock:
+            self.latencies.append(seconds)
+            if any(r.isdigit() and int(r) <= RATE_LIMIT_RESERVE for r in remaining):
+                self.limited_hosts.add(urlsplit(response.url).netloc)
+
+    def _retry_delay(self, attempt: int, response: Optional[requests.Response]) -> Optional[float]:
+        """Return how long to wait before retrying, None when the host must not be retried during this build.
+
+        :param attempt: Number of the failed attempt, starting at 0.
+        :param response: Response of the failed attempt, None after a connection error.
+        """
+        if response is not None and response.status_code == 429:
+            retry_after = response.headers.get("Retry-After", "")
+            if not retry_after.isdigit() or int(retry_after) > self.max_backoff:
+                return None  # Out of credits for a long time (Imgur's limits reset hourly/daily).
+            return float(retry_after)
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """Send a request, retrying transient failures.
+
+        :param method: HTTP method.
+        :param url: URL.
+        :param kwargs: Passed to requests.Session.request() (e.g. headers, stream).
+
+        :raises RateLimited: The host's rate limit was reached during this build.
+        :raises BudgetExceeded: The build's request budget is spent.
+        :raises requests.RequestException: Connection errors after the last retry.
+
+        :returns: Last response, even when its status is an error.
+        """
+        kwargs.setdefault("timeout", TIMEOUT)
+        host = urlsplit(url).netloc
+        attempt = 0
+        while True:
+            if host in self.limited_hosts:
+                raise RateLimited("Rate limit of {} reached".format(host))
+            self._take_budget()
+            if self.bucket:
+                self.bucket.acquire()
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= self.retries:
+                    raise
+                response = None
+            else:
+                self._record(response, time.perf_counter() - start)
+                if response.status_code not in RETRY_STATUSES:
+                    return response
+            delay = self._retry_delay(attempt, response)
+            if response is not None and response.status_code == 429:
+                with self.lock:
+                    self.stats["rate_limited"] += 1
+                    if delay is None or attempt >= self.retries:
+                        self.limited_hosts.add(host)
+            if delay is None or attempt >= self.retries:
+                return response
+            if response is not None:
+                response.close()
+            attempt += 1
+            with self.lock:
+                self.stats["retries"] += 1
+            time.sleep(delay)
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        """Send a GET request, retrying transient failures. See request().
+
+        :param url: URL.
+        :param kwargs: Passed to requests.Session.request() (e.g. headers, stream).
+        """
+        return self.request("GET", url, **kwargs)
+
+    async def get_async(self, url: str, **kwargs: Any) -> requests.Response:
+        """Send a GET request from asyncio code, running it in the client's thread pool. See request().
+
+        :param url: URL.
+        :param kwargs: Passed to requests.Session.request() (e.g. headers).
+        """
+        import asyncio  # pylint: disable=import-outside-toplevel  # See module docstring.
+
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(self.request, "GET", url, **kwargs))
+
+    def map(self, func: Callable[["ImgurHttpClient", T], R], items: List[T]) -> List[R]:
+        """Call func(client, item) for every item from the client's thread pool.
+
+        :param func: Function doing the network work. It should handle its own exceptions.
+        :param items: Arguments for each call.
+
+        :returns: Return values in the same order as items.
+        """
+        return list(self.executor.map(lambda item: func(self, item), items))
+
+    def summary(self) -> Dict[str, Any]:
+        """Return request counts and a latency histogram."""
+        with self.lock:
+            return dict(self.stats, latency_histogram=histogram(self.latencies))
+
+    def close(self):
+        """Stop the thread pool and close connections."""
+        self.executor.shutdown()
+        self.session.close()
+
+
+# Upper bounds of latency histogram buckets in seconds.
+HISTOGRAM_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def histogram(latencies: List[float]) -> Dict[str, int]:
+    """Count latencies per bucket, e.g. {"<=0.01": 3, "<=0.025": 1, ..., ">10.0": 0}.
+
+    :param latencies: Latencies in seconds.
+    """
+    counts = {"<={}".format(b): 0 for b in HISTOGRAM_BUCKETS}
+    counts[">{}".format(HISTOGRAM_BUCKETS[-1])] = 0
+    for latency in latencies:
+        bucket = next((b for b in HISTOGRAM_BUCKETS if latency <= b), None)
+        counts["<={}".format(bucket) if bucket else ">{}".format(HISTOGRAM_BUCKETS[-1])] += 1
+    return counts
+
+
+def get_client(app: Sphinx) -> ImgurHttpClient:
+    """Return the build's HTTP client, creating it on first use.
+
+    :param app: Sphinx application object.
+    """
+    try:
+        return app.imgur_client
+    except AttributeError:
+        config = app.config
+        app.imgur_client = ImgurHttpClient(
+            config["imgur_download_workers"],
+            rate=config["imgur_http_rate"],
+            budget=config["imgur_http_budget"],
+            retries=config["imgur_http_retries"],
+        )
+        return app.imgur_client
+
+
+def close_client(app: Sphinx, _):
+    """Close the build's HTTP client if one was created. Called on build-finished.
+
+    :param app: Sphinx application object.
+    :param _: Exception raised during the build, if any.
+    """
+    client = getattr(app, "imgur_client", None)
+    if client is not None:
+        client.close()
+        del app.imgur_client
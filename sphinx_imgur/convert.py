@@ -0,0 +1,157 @@
+"""Modern image formats (imgur_formats): WebP/AVIF variants of images rendered as <picture> by HTML builders.
+
+Images downloaded by prefetch_images() are encoded by a process pool (Pillow is CPU bound and holds the GIL). Encoded
+files are kept in <doctreedir>/images/imgur-variants/ named after the source image's content hash, so unchanged images
+are never encoded twice, then copied to _images/imgur/ next to mirrored images. Variants larger than the original are
+discarded, browsers fall back to the original <img> for formats they don't support.
+
+Requires Pillow, built with libwebp/libavif for the formats used.
+"""
+import os
+from typing import Callable, Dict, List, Tuple, TypeVar
+
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+from sphinx.util import logging
+from sphinx.util.osutil import copyfile, ensuredir
+
+from sphinx_imgur.download import content_hash, image_keys, local_path, MIRROR_DIR, needs_local_copies
+from sphinx_imgur.metrics import METRICS, timed
+from sphinx_imgur.utils import FORMATS
+
+try:
+    from PIL import Image
+except ImportError:  # Optional dependency.
+    Image = None
+
+CONVERTIBLE_EXTS = frozenset({".jpeg", ".jpg", ".png"})  # Animated GIFs are left alone.
+QUALITY = 80
+VARIANTS_DIR = "imgur-variants"
+logger = logging.getLogger(__name__)
+R = TypeVar("R")
+T = TypeVar("T")
+
+
+def supported_formats(formats: List[str]) -> List[str]:
+    """Return formats Pillow can write, in the same order.
+
+    :param formats: Value of imgur_formats.
+    """
+    if Image is None:
+        return []
+    Image.init()
+    return [f for f in formats if f.upper() in Image.SAVE]
+
+
+def encode(item: Tuple[str, str, str]) -> bool:
+    """Encode one image. Runs in a worker process.
+
+    :param item: Source image path, destination path, and format.
+
+    :returns: If successful.
+    """
+    source, destination, fmt = item
+    partial = destination + ".part"
+    try:
+        with Image.open(source) as img:
+            img.save(partial, fmt.upper(), quality=QUALITY)
+        os.replace(partial, destination)
+    except (OSError, ValueError):  # Corrupt or unsupported image.
+        if os.path.exists(partial):
+            os.remove(partial)
+        return False
+    return True
+
+
+def run_in_processes(func: Callable[[T], R], items: List[T]) -> List[R]:
+    """Call func(item) for every item from parallel worker processes, or in this process for a single item.
+
+    :param func: Top-level function (worker processes import it by name).
+    :param items: Arguments for each call, must be picklable.
+
+    :returns: Return values in the same order as items.
+    """
+    workers = max(1, min(os.cpu_count() or 1, len(items)))
+    if workers == 1:
+        return [func(i) for i in items]
+    from concurrent.futures import ProcessPoolExecutor  # pylint: disable=import-outside-toplevel  # Loads multiprocessing.
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(func, items))
+
+
+def variants_dir(app: Sphinx) -> str:
+    """Return where encoded images are cached.
+
+    :param app: Sphinx application object.
+    """
+    return os.path.join(app.doctreedir, "images", VARIANTS_DIR)
+
+
+def copy_variants(app: Sphinx, sources: Dict[str, Tuple[str, str]], formats: List[str]) -> Dict[str, List[Tuple[str, str]]]:
+    """Copy encoded images smaller than their originals to the output directory.
+
+    :param app: Sphinx application object.
+    :param sources: Image URLs mapped to downloaded paths and their content hashes.
+    :param formats: Formats to copy, in order of preference.
+
+    :returns: Image URLs mapped to MIME types and file names of their variants.
+    """
+    cache_dir = variants_dir(app)
+    directory = os.path.join(app.outdir, getattr(app.builder, "imagedir", "_images"), MIRROR_DIR)
+    variants: Dict[str, List[Tuple[str, str]]] = {}
+    for uri, (path, digest) in sources.items():
+        stem = os.path.splitext(os.path.basename(path))[0]
+        size = os.path.getsize(path)
+        for fmt in formats:
+            cached = os.path.join(cache_dir, "{}.{}".format(digest, fmt))
+            if not os.path.isfile(cached) or os.path.getsize(cached) >= size:
+                continue  # Conversion failed or didn't pay off.
+            name = "{}.{}.{}".format(stem, digest, fmt)
+            destination = os.path.join(directory, name)
+            if not os.path.isfile(destination):
+                ensuredir(directory)
+                copyfile(cached, destination)
+            variants.setdefault(uri, []).append((FORMATS[fmt], name))
+    return variants
+
+
+@timed
+def convert_images(app: Sphinx, env: BuildEnvironment):
+    """Encode downloaded images to imgur_formats, remembering smaller variants in app.imgur_variants. Called on env-updated.
+
+    :param app: Sphinx application object.
+    :param env: Sphinx build environment.
+    """
+    app.imgur_variants = {}
+    formats = app.config["imgur_formats"]
+    if not formats or not needs_local_copies(app.builder):
+        return
+    supported = supported_formats(formats)
+    if len(supported) < len(formats):
+        missing = ", ".join(f for f in formats if f not in supported)
+        logger.warning("imgur_formats: Pillow is not installed or cannot write %s, skipping", missing)
+    if not supported:
+        return
+
+    cache_dir = variants_dir(app)
+    sources = {}  # Image URLs mapped to downloaded paths and content hashes.
+    pending = []
+    for uri in sorted(image_keys(env)):
+        path = local_path(app, uri)
+        if os.path.splitext(path)[1].lower() not in CONVERTIBLE_EXTS or not os.path.isfile(path):
+            continue
+        digest = content_hash(path)
+        sources[uri] = path, digest
+        for fmt in supported:
+            cached = os.path.join(cache_dir, "{}.{}".format(digest, fmt))
+            if not os.path.isfile(cached) and (path, cached, fmt) not in pending:
+                pending.append((path, cached, fmt))
+    if pending:
+        ensuredir(cache_dir)
+        logger.info("converting %d Imgur images... ", len(pending), nonl=True)
+        converted = sum(run_in_processes(encode, pending))
+        METRICS.count(conversions=converted, conversion_failures=len(pending) - converted)
+        logger.info("%d done", converted)
+
+    app.imgur_variants = copy_variants(app, sources, supported)
@@ -0,0 +1,376 @@
+"""Concurrent download of Imgur images for builders that cannot reference remote images (e.g. LaTeX).
+
+Sphinx's own ImageDownloader fetches remote images one at a time while writing each document. Instead every image URL
+recorded by the directives is fetched up front through the build's HTTP client (see client.py), optionally through the
+persistent cache (imgur_cache_dir). A post-transform running before Sphinx's then points image nodes at the local
+copies.
+
+Builders that can't run Imgur's embed.js (e.g. LaTeX, EPUB) render embeds as static thumbnails instead (see
+ImgurEmbedFallbackTransform), those thumbnails are downloaded in the same batch.
+
+HTML builders download the same way when imgur_mirror is set, then copy images to _images/imgur/ with content hashes in
+their file names and point image nodes there. They also download when imgur_formats or imgur_placeholders is set, see
+convert.py and placeholder.py.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import shutil
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from docutils import nodes
+from sphinx.application import Sphinx
+from sphinx.builders import Builder
+from sphinx.environment import BuildEnvironment
+from sphinx.transforms.post_transforms import SphinxPostTransform
+from sphinx.transforms.post_transforms.images import BaseImageConverter
+from sphinx.util import logging
+from sphinx.util.images import guess_mimetype
+from sphinx.util.osutil import copyfile, ensuredir, relative_uri
+
+from sphinx_imgur.cache import cache_key, get_cache, ImgurCache
+from sphinx_imgur.client import get_client, ImgurHttpClient
+from sphinx_imgur.environment import iter_references
+from sphinx_imgur.metrics import METRICS, timed
+from sphinx_imgur.nodes import ImgurOmittedImageNode
+from sphinx_imgur.utils import findall
+
+CHUNK_SIZE = 64 * 1024
+HASH_LENGTH = 16
+IMAGE_DIRECTIVES = frozenset({"imgur", "imgur-figure"})
+MIRROR_DIR = "imgur"
+UNSAFE_PATH_CHARS = re.compile(r'[:?&*<>|"\\]')
+logger = logging.getLogger(__name__)
+
+
+def needs_download(builder: Builder) -> bool:
+    """Determine if the builder needs remote images downloaded to disk.
+
+    :param builder: Sphinx builder.
+    """
+    return bool(builder.supported_image_types) and not builder.supported_remote_images
+
+
+def needs_embed_fallback(builder: Builder) -> bool:
+    """Determine if embeds must be rendered without Imgur's embed.js, as a thumbnail (when supported) and a link.
+
+    :param builder: Sphinx builder.
+    """
+    return builder.format != "html" or not builder.supported_remote_images
+
+
+def needs_mirror(builder: Builder) -> bool:
+    """Determine if images should be copied to the HTML output directory instead of linking to Imgur.
+
+    :param builder: Sphinx builder.
+    """
+    return builder.format == "html" and bool(builder.config["imgur_mirror"])
+
+
+def needs_local_copies(builder: Builder) -> bool:
+    """Determine if an HTML builder needs images on disk, to mirror them, convert them, or compute their placeholders.
+
+    :param builder: Sphinx builder.
+    """
+    if needs_mirror(builder):
+        return True
+    return builder.format == "html" and bool(builder.config["imgur_formats"] or builder.config["imgur_placeholders"])
+
+
+def local_path(app: Sphinx, uri: str) -> str:
+    """Return where a remote image is stored, e.g. <doctreedir>/images/imgur/i.imgur.com/611EovQh.jpg.
+
+    :param app: Sphinx application object.
+    :param uri: Remote image URL.
+    """
+    parts = urlsplit(uri)
+    names = [parts.netloc] + [n for n in parts.path.split("/") if n]
+    if parts.query:
+        names[-1] += "_" + parts.query
+    return os.path.join(app.doctreedir, "images", "imgur", *(UNSAFE_PATH_CHARS.sub("_", n) for n in names))
+
+
+def stream_to_file(client: ImgurHttpClient, uri: str, path: str, headers: Optional[Dict[str, str]] = None):
+    """Download a file in chunks without holding it in memory. Partial downloads never replace the destination.
+
+    :param client: HTTP client.
+    :param uri: URL to download.
+    :param path: Destination file path.
+    :param headers: Additional request headers (e.g. for conditional requests).
+
+    :returns: The closed response. Nothing is written when its status is 304 (Not Modified).
+    :rtype: requests.Response
+    """
+    ensuredir(os.path.dirname(path))
+    partial = "{}.{}.{}.part".format(path, os.getpid(), threading.get_ident())
+    try:
+        with client.get(uri, headers=headers, stream=True) as response:
+            response.raise_for_status()
+            if response.status_code == 304:
+                return response
+            with open(partial, "wb") as handle:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    handle.write(chunk)
+        os.replace(partial, path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    return response
+
+
+def image_keys(env: BuildEnvironment, embeds: bool = False) -> Dict[str, str]:
+    """Return all unique remote image URLs in the project mapped to their cache keys.
+
+    :param env: Sphinx build environment.
+    :param embeds: Also include thumbnails of embeds, for builders rendering them with needs_embed_fallback().
+    """
+    keys = {
+        e["src"]: cache_key(e["imgur_id"], e["size"], e["ext"])
+        for _, e in iter_references(env, IMAGE_DIRECTIVES)
+        if "://" in e["src"]
+    }
+    if embeds:  # Keyed by file name, their imgur_id/size/ext describe the embed rather than :og_imgur_id:.
+        for _, entry in iter_references(env, {"imgur-embed"}):
+            if entry["src"] and "://" in entry["src"]:
+                keys.setdefault(entry["src"], posixpath.basename(urlsplit(entry["src"]).path))
+    return keys
+
+
+def fetch(client: ImgurHttpClient, item: Tuple[str, str]) -> bool:
+    """Download one image.
+
+    :param client: HTTP client.
+    :param item: URL and destination path.
+
+    :returns: If the download succeeded.
+    """
+    uri, path = item
+    try:
+        stream_to_file(client, uri, path)
+    except (OSError, requests.RequestException) as exc:
+        # Sphinx's ImageDownloader will try again and emit its own warning.
+        logger.verbose("Could not fetch remote image: %s [%s]", uri, exc)
+        METRICS.count(download_failures=1)
+        return False
+    METRICS.count(downloads=1, bytes_downloaded=os.path.getsize(path))
+    return True
+
+
+def fetch_cached(
+    client: ImgurHttpClient, cache: ImgurCache, key: str, uri: str, entry: Optional[Dict[str, Any]]
+) -> Tuple[str, Optional[int], Dict[str, Any]]:
+    """Download an image into the persistent cache, with a conditional request if it's already cached.
+
+    :param client: HTTP client.
+    :param cache: Persistent cache.
+    :param key: Cache key.
+    :param uri: Image URL.
+    :param entry: Stale index entry, None if not cached.
+
+    :returns: Cache key, HTTP status (None on failure), and the new index entry (the stale one when it can still be
+        served, empty otherwise).
+    """
+    path = cache.object_path(key)
+    try:
+        response = stream_to_file(client, uri, path, cache.conditional_headers(entry))
+    except (OSError, requests.RequestException) as exc:
+        METRICS.count(download_failures=1)
+        if entry and os.path.isfile(path):
+            logger.warning("Could not revalidate cached Imgur image, using stale copy: %s [%s]", uri, exc)
+            return key, None, entry
+        logger.verbose("Could not fetch remote image: %s [%s]", uri, exc)
+        return key, None, {}
+    entry = dict(entry or {}, uri=uri, validated=time.time(), accessed=time.time())
+    if response.status_code == 304:
+        METRICS.count(not_modified=1)
+    else:
+        METRICS.count(downloads=1, bytes_downloaded=os.path.getsize(path))
+        headers = response.headers
+        entry.update(bytes=os.path.getsize(path), etag=headers.get("ETag"), last_modified=headers.get("Last-Modified"))
+    return key, response.status_code, entry
+
+
+def prefetch_cached(app: Sphinx, cache: ImgurCache, images: Dict[str, str]):
+    """Serve images from the persistent cache, downloading misses and revalidating stale entries.
+
+    Stale entries are still served (with a warning) when they can't be revalidated, e.g. while offline.
+
+    :param app: Sphinx application object.
+    :param cache: Persistent cache.
+    :param images: Image URLs mapped to their cache keys.
+    """
+    entries = cache.entries()
+    now = time.time()
+    used = set()
+    pending = {}  # Cache key to (URL, index entry).
+    for uri, key in sorted(images.items()):
+        if key in used or key in pending:
+            continue
+        entry = entries.get(key)
+        if entry and cache.is_fresh(entry, now):
+            cache.stats["hits"] += 1
+            used.add(key)
+        else:
+            pending[key] = (uri, entry)
+
+    updated = {}
+    changed = set()
+    if pending:
+        logger.info("downloading %d Imgur images... ", len(pending), nonl=True)
+        results = get_client(app).map(lambda c, k: fetch_cached(c, cache, k, *pending[k]), sorted(pending))
+        for key, status, entry in results:
+            if status is None:  # Failed, the stale copy is served if there is one.
+                cache.stats["hits" if entry else "misses"] += 1
+                used.update([key] if entry else [])
+                continue
+            if status == 304:
+                cache.stats["revalidated"] += 1
+            else:
+                cache.stats["misses"] += 1
+                changed.add(key)
+            updated[key] = entry
+        logger.info("%d done", len(updated))
+
+    for uri, key in images.items():
+        path = local_path(app, uri)
+        if key in changed or ((key in used or key in updated) and not os.path.isfile(path)):
+            ensuredir(os.path.dirname(path))
+            try:
+                shutil.copyfile(cache.object_path(key), path)
+            except FileNotFoundError:  # Evicted by a concurrent build.
+                continue
+
+    cache.update(updated, used)
+
+
+def content_hash(path: str) -> str:
+    """Return the truncated SHA-256 hex digest of a file.
+
+    :param path: File to hash.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def mirror_name(path: str) -> str:
+    """Return the file name of a mirrored image, e.g. 611EovQh.0123456789abcdef.jpg.
+
+    Names change when contents do, so they can be served with immutable cache headers.
+
+    :param path: Downloaded image.
+    """
+    stem, ext = os.path.splitext(os.path.basename(path))
+    return "{}.{}{}".format(stem, content_hash(path), ext)
+
+
+def mirror_images(app: Sphinx, images: Dict[str, str]):
+    """Copy downloaded images to the output directory, remembering their mirrored names in app.imgur_mirror.
+
+    :param app: Sphinx application object.
+    :param images: Image URLs mapped to their cache keys.
+    """
+    mirrored = {}
+    directory = os.path.join(app.outdir, getattr(app.builder, "imagedir", "_images"), MIRROR_DIR)
+    for uri in sorted(images):
+        path = local_path(app, uri)
+        if not os.path.isfile(path):
+            continue  # Download failed, keep linking to Imgur.
+        name = mirror_name(path)
+        destination = os.path.join(directory, name)
+        if not os.path.isfile(destination):
+            ensuredir(directory)
+            copyfile(path, destination)
+        mirrored[uri] = name
+    app.imgur_mirror = mirrored
+
+
+@timed
+def prefetch_images(app: Sphinx, env: BuildEnvironment):
+    """Download all Imgur images missing on disk before the builder writes documents. Called on env-updated.
+
+    Everything is fetched in one concurrent batch: images, and for builders without embed.js the embed thumbnails.
+
+    :param app: Sphinx application object.
+    :param env: Sphinx build environment.
+    """
+    if not needs_download(app.builder) and not needs_local_copies(app.builder):
+        return
+    images = image_keys(env, embeds=needs_embed_fallback(app.builder))
+    cache = get_cache(app)
+    if cache is not None:
+        prefetch_cached(app, cache, images)
+    else:
+        pending = [(u, p) for u, p in ((u, local_path(app, u)) for u in sorted(images)) if not os.path.isfile(p)]
+        if pending:
+            logger.info("downloading %d Imgur images... ", len(pending), nonl=True)
+            downloaded = sum(get_client(app).map(fetch, pending))
+            logger.info("%d done", downloaded)
+    if needs_mirror(app.builder):
+        mirror_images(app, images)
+
+
+class ImgurImageDownloader(BaseImageConverter):
+    """Point remote image nodes to files downloaded by prefetch_images(), skipping Sphinx's serial ImageDownloader."""
+
+    default_priority = 90  # Before sphinx.transforms.post_transforms.images.ImageDownloader.
+
+    def match(self, node: nodes.image) -> bool:
+        """Only handle images already downloaded."""
+        uri = node["uri"]
+        return "://" in uri and needs_download(self.app.builder) and os.path.isfile(local_path(self.app, uri))
+
+    def handle(self, node: nodes.image):
+        """Same as Sphinx's ImageDownloader after a successful download."""
+        uri = node["uri"]
+        path = local_path(self.app, uri)
+        self.app.env.original_image_uri[path] = uri
+        node["candidates"].pop("?", None)
+        node["candidates"][guess_mimetype(path, default="*")] = path
+        node["uri"] = path
+        self.app.env.images.add_file(self.env.docname, path)
+
+
+class ImgurImageMirror(SphinxPostTransform):
+    """Point HTML image nodes to mirrored copies, list converted variants, and add placeholders and dimensions.
+
+    Uses the results of mirror_images(), convert_images(), make_placeholders() and probe_images(). Links to Imgur are left
+    as they are.
+    """
+
+    default_priority = 450  # Before ImgurImageTransform.
+    formats = ("html",)
+
+    def run(self, **kwargs: Any):
+        """Main method."""
+        mirrored = getattr(self.app, "imgur_mirror", None) or {}
+        variants = getattr(self.app, "imgur_variants", None) or {}
+        placeholders = getattr(self.app, "imgur_placeholders", None) or {}
+        dimensions = getattr(self.app, "imgur_dimensions", None) or {}
+        if not mirrored and not variants and not placeholders and not dimensions:
+            return
+        builder = self.app.builder
+        imgpath = relative_uri(builder.get_target_uri(self.env.docname), getattr(builder, "imagedir", "_images"))
+        for node in findall(self.document, nodes.image):
+            uri = node["uri"]
+            if isinstance(node, ImgurOmittedImageNode):
+                continue  # Opengraph needs absolute URLs.
+            if uri in dimensions:
+                node["dimensions"] = dimensions[uri]
+            if uri in placeholders:
+                node["placeholder"] = placeholders[uri]
+            if uri not in mirrored and uri not in variants:
+                continue
+            if uri in mirrored:
+                node["uri"] = posixpath.join(imgpath, MIRROR_DIR, mirrored[uri])
+            if uri in variants:
+                node["sources"] = [(m, posixpath.join(imgpath, MIRROR_DIR, n)) for m, n in variants[uri]]
+            for key in ("srcset", "sizes"):  # Thumbnails aren't mirrored or converted.
+                node.attributes.pop(key, None)
@@ -0,0 +1,123 @@
+"""Per-document state stored in the Sphinx build environment.
+
+Everything here is keyed by docname so Sphinx can purge stale documents and merge state from parallel read workers.
+"""
+from typing import Any, Dict, List, Set
+
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+
+from sphinx_imgur.utils import builder_policy
+
+# Config values affecting the output of each directive. They're registered without rebuild so changing one only
+# re-reads documents using these directives (see outdated_docs()) instead of the whole project.
+IMAGE_CONFIG = (
+    "imgur_builder_policy",
+    "imgur_default_ext",
+    "imgur_default_size",
+    "imgur_dimensions",
+    "imgur_formats",
+    "imgur_img_src_format",
+    "imgur_mirror",
+    "imgur_placeholders",
+    "imgur_preconnect",
+    "imgur_preload",
+    "imgur_srcset",
+    "imgur_srcset_sizes",
+    "imgur_target_format",
+)
+EMBED_CONFIG = (
+    "imgur_builder_policy",
+    "imgur_default_ext",
+    "imgur_default_size",
+    "imgur_embed_loading",
+    "imgur_embed_mode",
+    "imgur_embed_script",
+    "imgur_hide_post_details",
+    "imgur_img_src_format",
+    "imgur_preconnect",
+)
+CONFIG_DEPENDENCIES = {"imgur": IMAGE_CONFIG, "imgur-figure": IMAGE_CONFIG, "imgur-embed": EMBED_CONFIG}
+TRACKED_CONFIG = tuple(sorted(set(IMAGE_CONFIG + EMBED_CONFIG)))
+
+
+def get_references(env: BuildEnvironment) -> Dict[str, List[Dict[str, Any]]]:
+    """Return Imgur references keyed by docname, initializing the environment attribute on first use.
+
+    :param env: Sphinx build environment.
+    """
+    try:
+        return env.imgur_references
+    except AttributeError:
+        env.imgur_references = {}
+        return env.imgur_references
+
+
+def record_reference(env: BuildEnvironment, directive: str, lineno: int, **fields: Any):
+    """Remember an Imgur image/album referenced by the document currently being read.
+
+    :param env: Sphinx build environment.
+    :param directive: Name of the directive used in the document.
+    :param lineno: Line number of the directive in the document.
+    :param fields: Resolved values (e.g. imgur_id, size, ext, src).
+    """
+    entry = {"directive": directive, "lineno": lineno}
+    entry.update(fields)
+    get_references(env).setdefault(env.docname, []).append(entry)
+
+
+def iter_references(env: BuildEnvironment, directives: Set[str] = frozenset()):
+    """Yield (docname, reference) tuples in a stable order.
+
+    :param env: Sphinx build environment.
+    :param directives: Only yield references created by these directive names, all when empty.
+    """
+    references = get_references(env)
+    for docname in sorted(references):
+        for entry in references[docname]:
+            if not directives or entry["directive"] in directives:
+                yield docname, entry
+
+
+def purge_doc(_: Sphinx, env: BuildEnvironment, docname: str):
+    """Forget everything about a document that is about to be re-read or was removed.
+
+    :param _: Sphinx application object.
+    :param env: Sphinx build environment.
+    :param docname: Name of the document being purged.
+    """
+    get_references(env).pop(docname, None)
+
+
+def merge_info(_: Sphinx, env: BuildEnvironment, docnames: Set[str], other: BuildEnvironment):
+    """Merge state collected by a parallel read worker into the main process environment.
+
+    :param _: Sphinx application object.
+    :param env: Sphinx build environment of the main process.
+    :param docnames: Documents read by the worker.
+    :param other: Sphinx build environment of the worker.
+    """
+    references = get_references(env)
+    other_references = get_references(other)
+    for docname in docnames:
+        if docname in other_references:
+            references[docname] = other_references[docname]
+
+
+def outdated_docs(app: Sphinx, env: BuildEnvironment, *_) -> List[str]:
+    """Return documents using Imgur config values changed since the previous build. Called on env-get-outdated.
+
+    :param app: Sphinx application object.
+    :param env: Sphinx build environment.
+    :param _: Added, changed, and removed docnames (unused).
+    """
+    current = {name: app.config[name] for name in TRACKED_CONFIG}
+    current["imgur_builder_policy"] = builder_policy(app.config, app.builder)  # Doctrees may be shared by builders.
+    previous = getattr(env, "imgur_config", None)
+    env.imgur_config = current
+    if previous is None:  # New environment, everything is read anyway.
+        return []
+    changed = {name for name, value in current.items() if name not in previous or previous[name] != value}
+    if not changed:
+        return []
+    return sorted({d for d, e in iter_references(env) if changed.intersection(CONFIG_DEPENDENCIES[e["directive"]])})
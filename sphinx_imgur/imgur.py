@@ -3,68 +3,207 @@
 https://sphinx-imgur.readthedocs.io
 https://github.com/Robpol86/sphinx-imgur
 https://pypi.org/project/sphinx-imgur
+
+Modules only needed by some features (embed metadata, image conversion, placeholders, dimensions) are imported by their
+event handlers when first called, and the imgurcheck builder by setup(), keeping them out of this module's import time
+(see DEFERRED in tests/benchmarks/startup.py). Post-transforms and their modules are needed to register them.
 """
-from typing import Dict, List
+import importlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-from docutils.nodes import Element, SkipNode
+from docutils.nodes import Element, image
 from docutils.parsers.rst import Directive, directives
 from docutils.parsers.rst.directives import images
 from sphinx.application import Sphinx
+from sphinx.config import ENUM
 
 from sphinx_imgur import __version__
-from sphinx_imgur.nodes import ImgurEmbedNode, ImgurJavaScriptNode, ImgurOmittedImageNode
-from sphinx_imgur.utils import img_src_target_formats, imgur_id_size_ext
+from sphinx_imgur.cache import report_cache_stats
+from sphinx_imgur.client import close_client
+from sphinx_imgur.download import ImgurImageDownloader, ImgurImageMirror, prefetch_images
+from sphinx_imgur.environment import merge_info, outdated_docs, purge_doc, record_reference
+from sphinx_imgur.manifest import write_manifest
+from sphinx_imgur.metrics import flush_metrics, start_metrics, timed, write_report
+from sphinx_imgur.nodes import (
+    EMBED_TARGET_FORMAT,
+    ImgurEmbedNode,
+    ImgurGalleryNode,
+    ImgurImageNode,
+    ImgurJavaScriptNode,
+    ImgurOmittedImageNode,
+    ImgurStaticImageNode,
+    OPENGRAPH_EXTENSIONS,
+)
+from sphinx_imgur.transforms import (
+    add_embed_script,
+    add_resource_hints,
+    EMBED_SCRIPT_PLACEMENTS,
+    ImgurEmbedFallbackTransform,
+    ImgurImageTransform,
+    ImgurJavaScriptTransform,
+    ImgurPreloadTransform,
+    ImgurStaticEmbedTransform,
+)
+from sphinx_imgur.utils import (
+    findall,
+    img_src_target_formats,
+    imgur_id_size_ext,
+    resolve,
+    RESOLVE_OPTIONS,
+    srcset_sizes,
+    url_template,
+    validate_config,
+    validate_formats,
+)
 
+DEFAULT_CACHE_MAX_SIZE = 256 * 1024 * 1024
+DEFAULT_CACHE_TTL = 30 * 24 * 60 * 60
+DEFAULT_CHECK_TTL = 7 * 24 * 60 * 60
+DEFAULT_DOWNLOAD_WORKERS = 8
+DEFAULT_EMBED_LOADING = "eager"
+DEFAULT_EMBED_MODE = "widget"
+DEFAULT_EMBED_SCRIPT = "body"
 DEFAULT_EXT = "jpg"
+DEFAULT_FORMATS = ()
+DEFAULT_HTTP_RETRIES = 3
+DEFAULT_PRELOAD = 0
 DEFAULT_SIZE = "h"
+DEFAULT_SRCSET = ()
+IMAGE_OPTION_SPEC = {  # Added to the options of the parent directive classes of imgur and imgur-figure.
+    "ext": directives.unchanged,
+    "fullsize": directives.flag,
+    "img_src_format": directives.unchanged,
+    "nosrcset": directives.flag,
+    "nopreload": directives.flag,
+    "notarget": directives.flag,
+    "preload": directives.flag,
+    "size": directives.single_char_or_unicode,
+    "sizes": directives.unchanged,
+    "srcset": directives.unchanged,
+}
+PRELOAD_OPTIONS = ("preload", "nopreload")
+SRCSET_OPTIONS = ("nosrcset", "sizes", "srcset")
+API_URL = "https://api.imgur.com/3"
+OEMBED_URL = "https://api.imgur.com/oembed.json"
 IMG_SRC_FORMAT = "https://i.imgur.com/%(id)s%(size)s.%(ext)s"
 TARGET_FORMAT = "https://imgur.com/%(id)s"
 
 
+def add_srcset(node_list: List[Element], srcset: Optional[Tuple[str, str]]) -> List[Element]:
+    """Store srcset and sizes values in image nodes created by the parent directive class.
+
+    :param node_list: Nodes returned by the parent directive class.
+    :param srcset: Return value of srcset_sizes().
+    """
+    if srcset:
+        for node in node_list:
+            for image_node in findall(node, image):
+                image_node["srcset"], image_node["sizes"] = srcset
+    return node_list
+
+
+def add_preload(node_list: List[Element], preload: str) -> List[Element]:
+    """Store when to preload image nodes created by the parent directive class, see add_resource_hints().
+
+    :param node_list: Nodes returned by the parent directive class.
+    :param preload: "yes" (:preload:), "no" (:nopreload:), or "auto" (first imgur_preload images of the page).
+    """
+    for node in node_list:
+        for image_node in findall(node, image):
+            image_node["preload"] = preload
+    return node_list
+
+
+def drop_block_text(node_list: List[Element]) -> List[Element]:
+    """Empty the raw source of image nodes created by the parent directive class, it's pickled with the doctree unused.
+
+    :param node_list: Nodes returned by the parent directive class.
+    """
+    for node in node_list:
+        for image_node in findall(node, image):
+            image_node.rawsource = ""
+    return node_list
+
+
+def embed_image_src(imgur_id: str, size: str, ext: str, options: Dict[str, Any], config: Dict[str, Any]) -> Optional[str]:
+    """Return the URL of the image shown for an embed by opengraph and lazy loading placeholders.
+
+    :param imgur_id: Imgur ID from embed directive, or from its :og_imgur_id: option.
+    :param size: Image size from embed directive.
+    :param ext: Image extension from embed directive.
+    :param options: Embed directive options.
+    :param config: Sphinx config.
+
+    :returns: Image URL, None when all we have is an album.
+
+    :raises ValueError: Malformed URL format in the options.
+    """
+    img_src_format, _ = img_src_target_formats(options, config)
+    if imgur_id.startswith("a/"):
+        return None
+    return url_template(img_src_format)(imgur_id, size, ext)
+
+
+def preload_option(directive: Directive) -> str:
+    """Remove :preload: and :nopreload: from directive options so they don't leak into image node attributes.
+
+    :param directive: Image or figure directive.
+
+    :returns: Value for add_preload().
+    """
+    preload, nopreload = (directive.options.pop(k, False) is not False for k in PRELOAD_OPTIONS)
+    if preload and nopreload:
+        raise directive.error(":preload: and :nopreload: are mutually exclusive")
+    return "yes" if preload else "no" if nopreload else "auto"
+
+
+def run_image(directive: images.Image, name: str, run: Callable[[], List[Element]]) -> List[Element]:
+    """Run the imgur or imgur-figure directive: resolve its URLs, then let the parent directive class build the nodes.
+
+    :param directive: Image or figure directive.
+    :param name: Directive name, recorded with its references.
+    :param run: run() of the parent directive class.
+    """
+    env = directive.state.document.settings.env
+    config = env.config
+    try:
+        urls = resolve(directive.arguments[0], directive.options, config, env.app.builder)
+    except ValueError as exc:
+        raise directive.error(str(exc))
+    srcset = srcset_sizes(urls, directive.options, config)
+    preload = preload_option(directive)
+    for key in SRCSET_OPTIONS + RESOLVE_OPTIONS:  # Don't leak into image node attributes.
+        directive.options.pop(key, None)
+
+    directive.arguments[0] = urls.src
+    if urls.target:
+        directive.options["target"] = urls.target
+
+    record_reference(env, name, directive.lineno, **urls._asdict())
+
+    return drop_block_text(add_preload(add_srcset(run(), srcset), preload))
+
+
 class ImgurImage(images.Image):
     """Imgur image directive."""
 
-    option_spec = images.Image.option_spec.copy()
-    option_spec["ext"] = directives.unchanged
-    option_spec["fullsize"] = directives.flag
-    option_spec["img_src_format"] = directives.unchanged
-    option_spec["notarget"] = directives.flag
-    option_spec["size"] = directives.single_char_or_unicode
+    option_spec = dict(images.Image.option_spec, **IMAGE_OPTION_SPEC)
 
+    @timed
     def run(self) -> List[Element]:
         """Main method."""
-        config = self.state.document.settings.env.config
-        imgur_id, size, ext = imgur_id_size_ext(self.arguments[0], self.options, config)
-        img_src_format, target_format = img_src_target_formats(self.options, config)
-
-        self.arguments[0] = img_src_format % {"id": imgur_id, "size": size, "ext": ext}
-        if target_format:
-            self.options["target"] = target_format % {"id": imgur_id, "size": size, "ext": ext}
-
-        return super().run()
+        return run_image(self, "imgur", super().run)
 
 
 class ImgurFigure(images.Figure):
     """Imgur figure directive."""
 
-    option_spec = images.Figure.option_spec.copy()
-    option_spec["ext"] = directives.unchanged
-    option_spec["fullsize"] = directives.flag
-    option_spec["img_src_format"] = directives.unchanged
-    option_spec["notarget"] = directives.flag
-    option_spec["size"] = directives.single_char_or_unicode
+    option_spec = dict(images.Figure.option_spec, **IMAGE_OPTION_SPEC)
 
+    @timed
     def run(self) -> List[Element]:
         """Main method."""
-        config = self.state.document.settings.env.config
-        imgur_id, size, ext = imgur_id_size_ext(self.arguments[0], self.options, config)
-        img_src_format, target_format = img_src_target_formats(self.options, config)
-
-        self.arguments[0] = img_src_format % {"id": imgur_id, "size": size, "ext": ext}
-        if target_format:
-            self.options["target"] = target_format % {"id": imgur_id, "size": size, "ext": ext}
-
-        return super().run()
+        return run_image(self, "imgur-figure", super().run)
 
 
 class ImgurEmbed(Directive):
@@ -81,44 +220,130 @@ class ImgurEmbed(Directive):
         "size": directives.single_char_or_unicode,
     }
 
+    @timed
     def run(self) -> List[Element]:
         """Main method."""
-        config = self.state.document.settings.env.config
-        imgur_id, size, ext = imgur_id_size_ext(self.arguments[0], self.options, config)
+        env = self.state.document.settings.env
+        config = env.config
+        imgur_id, size, ext = imgur_id_size_ext(self.arguments[0], self.options, config, env.app.builder)
         hide_post_details = "hide_post_details" in self.options or config["imgur_hide_post_details"]
+        og_image = (imgur_id, size, ext)
+        if "og_imgur_id" in self.options:
+            og_image = imgur_id_size_ext(self.options["og_imgur_id"], self.options, config, env.app.builder)
 
-        node_embed = ImgurEmbedNode(imgur_id, hide_post_details)
-        node_js = ImgurJavaScriptNode()
-        nodes = [node_embed, node_js]
-
-        # Hidden image node for opengraph.
         try:
-            node_img = ImgurOmittedImageNode(self.block_text, self.options, config, imgur_id, size, ext)
-        except SkipNode:
-            pass
-        else:
+            src = embed_image_src(*og_image, self.options, config)
+        except ValueError as exc:
+            raise self.error(str(exc))
+
+        node_embed = ImgurEmbedNode(imgur_id=imgur_id)
+        if hide_post_details:
+            node_embed["hide_post_details"] = True
+        if src:
+            node_embed["thumbnail"] = src
+        if self.options.get("alt"):
+            node_embed["title"] = self.options["alt"]
+        nodes = [node_embed]
+        if src and any(e in env.app.extensions for e in OPENGRAPH_EXTENSIONS):
+            node_img = ImgurOmittedImageNode(uri=src)  # Hidden image for opengraph.
+            if self.options.get("alt"):
+                node_img["alt"] = self.options["alt"]
             nodes.append(node_img)
 
+        target = EMBED_TARGET_FORMAT.format(imgur_id)
+        record_reference(env, "imgur-embed", self.lineno, imgur_id=imgur_id, size=size, ext=ext, src=src, target=target)
+
         return nodes
 
 
-def setup(app: Sphinx) -> Dict[str, str]:
+def deferred(path: str) -> Callable[..., Any]:
+    """Return an event handler importing its module on its first call.
+
+    :param path: Dotted path to the function, e.g. sphinx_imgur.api.fetch_embeds.
+    """
+    module, name = path.rsplit(".", 1)
+
+    def handler(*args: Any) -> Any:
+        return getattr(importlib.import_module(module), name)(*args)
+
+    handler.__name__ = handler.__qualname__ = name
+    return handler
+
+
+def setup(app: Sphinx) -> Dict[str, Any]:  # pylint: disable=too-many-statements
     """Called by Sphinx during phase 0 (initialization).
 
     :param app: Sphinx application object.
 
-    :returns: Extension version.
+    :returns: Extension version and parallel safety.
     """
-    app.add_config_value("imgur_default_ext", DEFAULT_EXT, "html")
-    app.add_config_value("imgur_default_size", DEFAULT_SIZE, "html")
-    app.add_config_value("imgur_hide_post_details", False, "html")
-    app.add_config_value("imgur_img_src_format", IMG_SRC_FORMAT, "html")
-    app.add_config_value("imgur_target_format", TARGET_FORMAT, "html")
+    app.add_config_value("imgur_api_url", API_URL, "")
+    app.add_config_value("imgur_builder_policy", {}, "")
+    app.add_config_value("imgur_cache_dir", None, "")
+    app.add_config_value("imgur_cache_max_size", DEFAULT_CACHE_MAX_SIZE, "")
+    app.add_config_value("imgur_cache_ttl", DEFAULT_CACHE_TTL, "")
+    app.add_config_value("imgur_check_ttl", DEFAULT_CHECK_TTL, "")
+    app.add_config_value("imgur_client_id", None, "")
+    app.add_config_value("imgur_default_ext", DEFAULT_EXT, "")
+    app.add_config_value("imgur_default_size", DEFAULT_SIZE, "")
+    app.add_config_value("imgur_dimensions", False, "")
+    app.add_config_value("imgur_download_workers", DEFAULT_DOWNLOAD_WORKERS, "")
+    app.add_config_value("imgur_embed_loading", DEFAULT_EMBED_LOADING, "", ENUM("eager", "lazy"))
+    app.add_config_value("imgur_embed_mode", DEFAULT_EMBED_MODE, "", ENUM("widget", "static"))
+    app.add_config_value("imgur_embed_script", DEFAULT_EMBED_SCRIPT, "", ENUM(*EMBED_SCRIPT_PLACEMENTS))
+    app.add_config_value("imgur_formats", DEFAULT_FORMATS, "")
+    app.add_config_value("imgur_hide_post_details", False, "")
+    app.add_config_value("imgur_http_budget", None, "")
+    app.add_config_value("imgur_http_rate", None, "")
+    app.add_config_value("imgur_http_retries", DEFAULT_HTTP_RETRIES, "")
+    app.add_config_value("imgur_img_src_format", IMG_SRC_FORMAT, "")
+    app.add_config_value("imgur_manifest", None, "")
+    app.add_config_value("imgur_metrics", None, "")
+    app.add_config_value("imgur_mirror", False, "")
+    app.add_config_value("imgur_oembed_url", OEMBED_URL, "")
+    app.add_config_value("imgur_placeholders", False, "")
+    app.add_config_value("imgur_preconnect", True, "")
+    app.add_config_value("imgur_preload", DEFAULT_PRELOAD, "")
+    app.add_config_value("imgur_srcset", DEFAULT_SRCSET, "")
+    app.add_config_value("imgur_srcset_sizes", None, "")
+    app.add_config_value("imgur_target_format", TARGET_FORMAT, "")
+    from sphinx_imgur.check import ImgurCheckBuilder  # pylint: disable=import-outside-toplevel  # See module docstring.
+
+    app.add_builder(ImgurCheckBuilder)
     app.add_directive("imgur", ImgurImage)
     app.add_directive("imgur-embed", ImgurEmbed)
     app.add_directive("imgur-figure", ImgurFigure)
     app.add_directive("imgur-image", ImgurImage)
+    app.add_node(ImgurGalleryNode, html=(ImgurGalleryNode.html_visit, ImgurGalleryNode.html_visit))
+    app.add_node(ImgurImageNode, html=(ImgurImageNode.html_visit, ImgurImageNode.html_depart))
     app.add_node(ImgurEmbedNode, html=(ImgurEmbedNode.html_visit, ImgurEmbedNode.html_depart))
     app.add_node(ImgurJavaScriptNode, html=(ImgurJavaScriptNode.html_visit, ImgurJavaScriptNode.html_depart))
     app.add_node(ImgurOmittedImageNode, html=(ImgurOmittedImageNode.html_visit, ImgurOmittedImageNode.html_visit))
-    return dict(version=__version__)
+    app.add_node(ImgurStaticImageNode, html=(ImgurStaticImageNode.html_visit, ImgurStaticImageNode.html_visit))
+    app.add_post_transform(ImgurImageDownloader)
+    app.add_post_transform(ImgurImageMirror)
+    app.add_post_transform(ImgurImageTransform)
+    app.add_post_transform(ImgurEmbedFallbackTransform)
+    app.add_post_transform(ImgurJavaScriptTransform)
+    app.add_post_transform(ImgurPreloadTransform)
+    app.add_post_transform(ImgurStaticEmbedTransform)
+    app.connect("config-inited", validate_config)
+    app.connect("config-inited", validate_formats)
+    app.connect("builder-inited", start_metrics)
+    app.connect("doctree-read", flush_metrics)
+    app.connect("env-get-outdated", outdated_docs)
+    app.connect("env-purge-doc", purge_doc)
+    app.connect("env-merge-info", merge_info)
+    app.connect("env-updated", prefetch_images)
+    app.connect("env-updated", deferred("sphinx_imgur.convert.convert_images"))
+    app.connect("env-updated", deferred("sphinx_imgur.placeholder.make_placeholders"))
+    app.connect("env-updated", deferred("sphinx_imgur.probe.probe_images"))
+    app.connect("env-updated", deferred("sphinx_imgur.api.fetch_embeds"))
+    app.connect("html-page-context", add_embed_script)
+    app.connect("html-page-context", add_resource_hints)
+    app.connect("html-page-context", flush_metrics)
+    app.connect("build-finished", report_cache_stats)
+    app.connect("build-finished", write_manifest)
+    app.connect("build-finished", write_report)
+    app.connect("build-finished", close_client)
+    return dict(version=__version__, parallel_read_safe=True, parallel_write_safe=True)
@@ -0,0 +1,54 @@
+"""Inventory of every Imgur image/album referenced by the project (imgur_manifest).
+
+Written from references the directives record in the build environment (merged from parallel read workers), so tools
+warming caches or checking links don't have to parse documents themselves.
+"""
+import json
+import os
+from typing import Any, Dict, Optional
+
+from sphinx.application import Sphinx
+from sphinx.util import logging
+from sphinx.util.osutil import ensuredir
+
+from sphinx_imgur.environment import iter_references
+
+MANIFEST_VERSION = 1
+logger = logging.getLogger(__name__)
+
+
+def build_manifest(app: Sphinx) -> Dict[str, Any]:
+    """Return the manifest contents.
+
+    :param app: Sphinx application object.
+    """
+    env = app.env
+    references = []
+    urls = set()
+    for docname, entry in iter_references(env):
+        references.append(dict(entry, docname=docname, source=env.doc2path(docname, base=False)))
+        urls.update(u for u in (entry["src"], entry.get("target")) if u)
+    return {
+        "version": MANIFEST_VERSION,
+        "imgur_ids": sorted({e["imgur_id"] for e in references}),
+        "urls": sorted(urls),
+        "references": references,
+    }
+
+
+def write_manifest(app: Sphinx, exc: Optional[Exception]):
+    """Write the manifest to the output directory when configured. Called on build-finished.
+
+    :param app: Sphinx application object.
+    :param exc: Exception raised during the build, if any.
+    """
+    if exc or not app.config["imgur_manifest"]:
+        return
+    manifest = build_manifest(app)
+    path = os.path.join(app.outdir, app.config["imgur_manifest"])
+    ensuredir(os.path.dirname(path))
+    with open(path, "w", encoding="utf8") as handle:
+        json.dump(manifest, handle, indent=1, sort_keys=True)
+    logger.info(
+        "imgur manifest: %d references to %d Imgur IDs: %s", len(manifest["references"]), len(manifest["imgur_ids"]), path
+    )
@@ -0,0 +1,220 @@
+"""Opt-in build metrics (imgur_metrics): how long Imgur directives and nodes take, and what was downloaded.
+
+Samples are collected in memory by whichever process does the work, then appended to a file named after the process ID
+after each document is read (doctree-read) or written (html-page-context). Parallel read/write workers are forked
+processes whose memory is thrown away, the files are how their samples reach the main process, which aggregates them at
+build-finished. Network requests are all made by the main process, their counts and latencies come from its HTTP client.
+"""
+import functools
+import json
+import math
+import os
+import shutil
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+
+from sphinx.application import Sphinx
+from sphinx.util import logging
+from sphinx.util.osutil import ensuredir
+
+from sphinx_imgur.cache import get_cache
+
+F = TypeVar("F", bound=Callable[..., Any])
+logger = logging.getLogger(__name__)
+
+
+class Metrics:
+    """Samples collected by the current process since the last flush."""
+
+    def __init__(self):
+        """Constructor."""
+        self.enabled = False
+        self.directory = ""
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        self.durations: Dict[str, List[float]] = defaultdict(list)
+        self.counters = Counter()
+
+    def reset(self, directory: str = ""):
+        """Forget samples and enable collection when directory is set.
+
+        :param directory: Where processes flush their samples, empty to disable collection.
+        """
+        with self.lock:
+            self.enabled = bool(directory)
+            self.directory = directory
+            self.pid = os.getpid()
+            self.durations.clear()
+            self.counters.clear()
+
+    def _check_fork(self):
+        """Drop samples inherited from the parent process, they're flushed by the parent. Called while holding the lock."""
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.durations.clear()
+            self.counters.clear()
+
+    def add_duration(self, name: str, seconds: float):
+        """Record how long something took.
+
+        :param name: What was timed (e.g. ImgurImage.run).
+        :param seconds: Duration.
+        """
+        with self.lock:
+            self._check_fork()
+            self.durations[name].append(seconds)
+
+    def count(self, **counts: int):
+        """Increment counters (e.g. downloads=1, bytes_downloaded=1234)."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self._check_fork()
+            self.counters.update(counts)
+
+    def flush(self):
+        """Append samples to this process' file and forget them."""
+        if not self.enabled:
+            return
+        with self.lock:
+            self._check_fork()
+            if not self.durations and not self.counters:
+                return
+            line = json.dumps({"durations": self.durations, "counters": self.counters})
+            self.durations.clear()
+            self.counters.clear()
+            with open(os.path.join(self.directory, "{}.jsonl".format(self.pid)), "a", encoding="utf8") as handle:
+                handle.write(line + "\n")
+
+
+METRICS = Metrics()
+
+
+def timed(func: F) -> F:
+    """Decorator recording the duration of every call when metrics are enabled, named after the function."""
+    name = func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not METRICS.enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            METRICS.add_duration(name, time.perf_counter() - start)
+
+    return wrapper
+
+
+def summarize(durations: List[float]) -> Dict[str, float]:
+    """Return count, total, mean, p95 and max of durations in seconds.
+
+    :param durations: Samples.
+    """
+    ordered = sorted(durations)
+    total = sum(ordered)
+    return {
+        "count": len(ordered),
+        "total": total,
+        "mean": total / len(ordered),
+        "p95": ordered[math.ceil(len(ordered) * 0.95) - 1],
+        "max": ordered[-1],
+    }
+
+
+def metrics_dir(app: Sphinx) -> str:
+    """Return the directory processes flush their samples to.
+
+    :param app: Sphinx application object.
+    """
+    return os.path.join(app.doctreedir, "imgur-metrics")
+
+
+def start_metrics(app: Sphinx):
+    """Enable collection when configured. Called on builder-inited, before parallel workers are forked.
+
+    :param app: Sphinx application object.
+    """
+    if not app.config["imgur_metrics"]:
+        METRICS.reset()
+        return
+    directory = metrics_dir(app)
+    shutil.rmtree(directory, ignore_errors=True)
+    ensuredir(directory)
+    METRICS.reset(directory)
+
+
+def flush_metrics(*_):
+    """Flush samples of the document just read or written. Called on doctree-read and html-page-context."""
+    METRICS.flush()
+
+
+def collect(directory: str) -> Dict[str, Any]:
+    """Aggregate samples flushed by all processes.
+
+    :param directory: Directory with flushed samples.
+    """
+    durations: Dict[str, List[float]] = defaultdict(list)
+    counters = Counter()
+    processes = 0
+    for name in sorted(os.listdir(directory)):
+        processes += 1
+        with open(os.path.join(directory, name), encoding="utf8") as handle:
+            for line in handle:
+                samples = json.loads(line)
+                for key, values in samples["durations"].items():
+                    durations[key].extend(values)
+                counters.update(samples["counters"])
+    return {
+        "processes": processes,
+        "timings": {k: summarize(v) for k, v in sorted(durations.items())},
+        "counters": dict(sorted(counters.items())),
+    }
+
+
+def write_report(app: Sphinx, exc: Optional[Exception]):
+    """Write the JSON report and log a summary. Called on build-finished.
+
+    :param app: Sphinx application object.
+    :param exc: Exception raised during the build, if any.
+    """
+    if not METRICS.enabled:
+        return
+    METRICS.flush()
+    report = collect(METRICS.directory)
+    METRICS.reset()
+    shutil.rmtree(metrics_dir(app), ignore_errors=True)
+    if exc:
+        return
+
+    cache = get_cache(app)
+    client = getattr(app, "imgur_client", None)
+    report.update(
+        builder=app.builder.name,
+        parallel=app.parallel,
+        cache=dict(cache.stats) if cache else None,
+        http=client.summary() if client else None,
+    )
+    path = os.path.join(app.outdir, app.config["imgur_metrics"])
+    ensuredir(os.path.dirname(path))
+    with open(path, "w", encoding="utf8") as handle:
+        json.dump(report, handle, indent=2)
+
+    timings = report["timings"]
+    directives = [v for k, v in timings.items() if k.endswith(".run")]
+    visits = [v for k, v in timings.items() if k.endswith(".html_visit")]
+    counters = report["counters"]
+    logger.info(
+        "imgur metrics: %d directives in %.3fs, %d nodes rendered in %.3fs, %d downloads (%d bytes), %d cache hits: %s",
+        sum(v["count"] for v in directives),
+        sum(v["total"] for v in directives),
+        sum(v["count"] for v in visits),
+        sum(v["total"] for v in visits),
+        counters.get("downloads", 0),
+        counters.get("bytes_downloaded", 0),
+        report["cache"].get("hits", 0) if report["cache"] else 0,
+        path,
+    )
@@ -1,79 +1,293 @@
 """Docutils nodes for Imgur embeds."""
-from typing import Any, Dict
+from typing import Dict, TYPE_CHECKING
 
 from docutils import nodes
-from sphinx.writers.html5 import HTML5Translator
 
-from sphinx_imgur.utils import img_src_target_formats, imgur_id_size_ext
+from sphinx_imgur.metrics import timed
+from sphinx_imgur.utils import THUMBNAIL_WIDTHS, url_template
+
+if TYPE_CHECKING:  # Only loaded by HTML builders.
+    from sphinx.writers.html5 import HTML5Translator
+
+EMBED_JS_URL = "//s.imgur.com/min/embed.js"
+EMBED_TARGET_FORMAT = "https://imgur.com/{}"
+GALLERY_STYLE = "display: flex; flex-wrap: wrap; gap: 4px; list-style: none; margin: 0; padding: 0"
+GALLERY_THUMBNAIL_SIZE = "m"
+LAZY_LOADER_JS = """\
+(function () {
+  if (window.sphinxImgurLazy) return;
+  window.sphinxImgurLazy = true;
+  function load(facade) {
+    var quote = document.createElement("blockquote"), link = document.createElement("a");
+    quote.className = "imgur-embed-pub";
+    quote.lang = facade.lang;
+    quote.setAttribute("data-id", facade.getAttribute("data-id"));
+    if (facade.hasAttribute("data-context")) quote.setAttribute("data-context", facade.getAttribute("data-context"));
+    link.href = facade.querySelector("a").href;
+    quote.appendChild(link);
+    facade.parentNode.replaceChild(quote, facade);
+    if (window.imgurEmbed && window.imgurEmbed.createIframe) return window.imgurEmbed.createIframe();
+    if (document.getElementById("imgur-embed-js")) return;
+    var script = document.createElement("script");
+    script.id = "imgur-embed-js";
+    script.async = true;
+    script.charset = "utf-8";
+    script.src = "https:%s";
+    document.body.appendChild(script);
+  }
+  function init() {
+    var facades = document.querySelectorAll(".imgur-embed-facade"), i;
+    if (!("IntersectionObserver" in window)) {
+      for (i = 0; i < facades.length; i++) load(facades[i]);
+      return;
+    }
+    var observer = new IntersectionObserver(function (entries) {
+      entries.forEach(function (entry) {
+        if (!entry.isIntersecting) return;
+        observer.unobserve(entry.target);
+        load(entry.target);
+      });
+    }, {rootMargin: "300px"});
+    for (i = 0; i < facades.length; i++) observer.observe(facades[i]);
+  }
+  if (document.readyState === "loading") document.addEventListener("DOMContentLoaded", init);
+  else init();
+})();
+""" % (
+    EMBED_JS_URL
+)
+OPENGRAPH_EXTENSIONS = ("sphinxext.opengraph",)  # Extensions using the first image of each page.
 
 
 class ImgurEmbedNode(nodes.Element):
-    """Imgur <blockquote><a /></blockquote> node for Sphinx/docutils."""
+    """Imgur <blockquote><a /></blockquote> node for Sphinx/docutils.
 
-    def __init__(self, imgur_id: str, hide_post_details: bool):
-        """Store directive options during instantiation.
+    With imgur_embed_loading = "lazy" a lightweight placeholder is rendered instead, replaced with the blockquote by
+    LAZY_LOADER_JS when scrolled into view.
 
-        :param imgur_id: Imgur ID of the album or image.
-        :param hide_post_details: Hide title and image descriptions in embedded albums or images.
-        """
-        super().__init__()
-        self.imgur_id = imgur_id
-        self.hide_post_details = hide_post_details
+    Attributes are set by the directive: imgur_id, and only when needed hide_post_details, thumbnail (image URL shown by
+    the lazy loading placeholder) and title (its text). They're pickled with every doctree, keep them few.
+    """
 
     @staticmethod
-    def html_visit(writer: HTML5Translator, node: "ImgurEmbedNode"):
+    @timed
+    def html_visit(writer: "HTML5Translator", node: "ImgurEmbedNode"):
         """Append opening tags to document body list."""
-        html_attrs_bq = {"CLASS": "imgur-embed-pub", "lang": writer.settings.language_code, "data-id": node.imgur_id}
-        if node.hide_post_details:
+        if writer.config["imgur_embed_loading"] == "lazy":
+            ImgurEmbedNode.html_visit_lazy(writer, node)
+            raise nodes.SkipNode
+        html_attrs_bq = {"CLASS": "imgur-embed-pub", "lang": writer.settings.language_code, "data-id": node["imgur_id"]}
+        if node.get("hide_post_details"):
             html_attrs_bq["data-context"] = "false"
         writer.body.append(writer.starttag(node, "blockquote", "", **html_attrs_bq))
-        html_attrs_ah = dict(href="https://imgur.com/{}".format(node.imgur_id), CLASS="reference external")
+        html_attrs_ah = dict(href=EMBED_TARGET_FORMAT.format(node["imgur_id"]), CLASS="reference external")
         writer.body.append(writer.starttag(node, "a", "Loading...", **html_attrs_ah))
 
     @staticmethod
-    def html_depart(writer: HTML5Translator, _):
+    def html_visit_lazy(writer: "HTML5Translator", node: "ImgurEmbedNode"):
+        """Append the complete placeholder to document body list."""
+        html_attrs_div = {"CLASS": "imgur-embed-facade", "lang": writer.settings.language_code, "data-id": node["imgur_id"]}
+        if node.get("hide_post_details"):
+            html_attrs_div["data-context"] = "false"
+        writer.body.append(writer.starttag(node, "div", "", **html_attrs_div))
+        html_attrs_ah = {"href": EMBED_TARGET_FORMAT.format(node["imgur_id"]), "CLASS": "reference external"}
+        writer.body.append(writer.starttag(node, "a", "", **html_attrs_ah))
+        title = node.get("title") or ("Imgur album" if node["imgur_id"].startswith("a/") else "Imgur image")
+        if node.get("thumbnail"):
+            html_attrs_img = {"src": node["thumbnail"], "alt": title, "loading": "lazy", "decoding": "async"}
+            writer.body.append(writer.emptytag(node, "img", "", **html_attrs_img))
+        writer.body.extend([writer.starttag(node, "span", ""), writer.encode(title), "</span></a></div>\n"])
+
+    @staticmethod
+    def html_depart(writer: "HTML5Translator", _):
         """Append closing tags to document body list."""
         writer.body.extend(["</a>", "</blockquote>"])
 
 
+class ImgurGalleryNode(nodes.Element):
+    """Static gallery of album thumbnails, replacing ImgurEmbedNode in HTML output when album metadata is available.
+
+    Attributes are set by ImgurStaticEmbedTransform: imgur_id (e.g. a/hWyW0), hide_post_details, title, and images
+    (metadata from sphinx_imgur.api.parse_album()).
+    """
+
+    @staticmethod
+    def thumbnail_size(width: int, height: int) -> Dict[str, int]:
+        """Return width/height attributes of a thumbnail, Imgur scales images down to fit a square box.
+
+        :param width: Width of the original image, 0 when unknown.
+        :param height: Height of the original image, 0 when unknown.
+        """
+        box = THUMBNAIL_WIDTHS[GALLERY_THUMBNAIL_SIZE]
+        if not width or not height:
+            return {}
+        scale = min(1.0, box / max(width, height))
+        return {"width": max(1, round(width * scale)), "height": max(1, round(height * scale))}
+
+    @staticmethod
+    @timed
+    def html_visit(writer: "HTML5Translator", node: "ImgurGalleryNode"):
+        """Append the complete gallery to document body list."""
+        img_src = url_template(writer.config["imgur_img_src_format"])
+        title = node["title"] if not node["hide_post_details"] and node["title"] else "Imgur album"
+        writer.body.append(writer.starttag(node, "div", "", CLASS="imgur-gallery", **{"data-id": node["imgur_id"]}))
+        writer.body.append('<ul class="imgur-gallery-images" style="{}">\n'.format(GALLERY_STYLE))
+        for entry in node["images"]:
+            ext = "jpg" if entry["ext"] in ("gif", "gifv", "mp4") else entry["ext"]  # Still thumbnail of animations.
+            html_attrs_img = {
+                "src": img_src(entry["id"], GALLERY_THUMBNAIL_SIZE, ext),
+                "alt": entry["title"] or title,
+                "loading": "lazy",
+                "decoding": "async",
+            }
+            html_attrs_img.update(ImgurGalleryNode.thumbnail_size(entry["width"], entry["height"]))
+            html_attrs_ah = {"href": EMBED_TARGET_FORMAT.format(entry["id"]), "CLASS": "reference external"}
+            writer.body.extend(
+                [
+                    "<li>",
+                    writer.starttag(node, "a", "", **html_attrs_ah),
+                    writer.emptytag(node, "img", "", **html_attrs_img),
+                    "</a></li>\n",
+                ]
+            )
+        writer.body.append("</ul>\n")
+        html_attrs_ah = {"href": EMBED_TARGET_FORMAT.format(node["imgur_id"]), "CLASS": "reference external"}
+        writer.body.extend(
+            [
+                '<p class="imgur-gallery-title">',
+                writer.starttag(node, "a", "", **html_attrs_ah),
+                writer.encode(title),
+                "</a></p></div>\n",
+            ]
+        )
+        raise nodes.SkipNode
+
+
+class ImgurStaticImageNode(nodes.Element):
+    """Image rendered directly, replacing ImgurEmbedNode in HTML output when oEmbed metadata is available.
+
+    Attributes are set by ImgurStaticEmbedTransform: imgur_id, hide_post_details, src, title, width, and height (metadata
+    from sphinx_imgur.api.parse_oembed()). Width and height let browsers reserve space before the image loads, the image
+    is scaled down to fit the page.
+    """
+
+    @staticmethod
+    @timed
+    def html_visit(writer: "HTML5Translator", node: "ImgurStaticImageNode"):
+        """Append the complete image to document body list."""
+        title = node["title"] if not node["hide_post_details"] else ""
+        writer.body.append(writer.starttag(node, "div", "", CLASS="imgur-embed-static", **{"data-id": node["imgur_id"]}))
+        html_attrs_ah = {"href": EMBED_TARGET_FORMAT.format(node["imgur_id"]), "CLASS": "reference external"}
+        html_attrs_img = {
+            "src": node["src"],
+            "alt": node["title"] or "Imgur image",
+            "width": node["width"],
+            "height": node["height"],
+            "decoding": "async",
+            "style": "height: auto; max-width: 100%",
+        }
+        writer.body.extend(
+            [writer.starttag(node, "a", "", **html_attrs_ah), writer.emptytag(node, "img", "", **html_attrs_img), "</a>"]
+        )
+        if title:
+            writer.body.extend(['<p class="imgur-embed-title">', writer.encode(title), "</p>"])
+        writer.body.append("</div>\n")
+        raise nodes.SkipNode
+
+
+class ImgurImageNode(nodes.image):
+    """Image node with HTML-only attributes (e.g. srcset) the translator doesn't know about.
+
+    Only HTML builders see this node, ImgurImageTransform converts regular image nodes into it. The "sources" attribute
+    lists (MIME type, URL) pairs of other formats, rendered as <source> elements of a <picture> around the <img>. The
+    "dimensions" attribute (width, height) is rendered as width/height attributes unless set by the directive, the
+    "placeholder" attribute (data URI, width and height) as the <img>'s background.
+    """
+
+    HTML_ATTRIBUTES = ("srcset", "sizes")
+    HTML_ONLY = HTML_ATTRIBUTES + ("dimensions", "placeholder", "sources")
+    DIMENSIONS_STYLE = "height: auto; max-width: 100%"
+    PLACEHOLDER_STYLE = DIMENSIONS_STYLE + "; background: center / cover no-repeat url({})"
+
+    @staticmethod
+    def layout_attributes(writer: "HTML5Translator", node: "ImgurImageNode", tag: str) -> str:
+        """Add dimensions and the placeholder to an <img> tag.
+
+        :param writer: HTML translator.
+        :param node: The node.
+        :param tag: The <img> tag.
+        """
+        placeholder = node.get("placeholder")
+        dimensions = node.get("dimensions") or (placeholder and (placeholder["width"], placeholder["height"]))
+        if placeholder:
+            style = writer.attval(ImgurImageNode.PLACEHOLDER_STYLE.format(placeholder["data"]))
+        elif dimensions:
+            style = ImgurImageNode.DIMENSIONS_STYLE
+        else:
+            return tag
+        loading = ' decoding="async"'
+        if node.get("preload") == "no":  # Below the fold, see ImgurPreloadTransform.
+            loading += ' loading="lazy"'
+        if ' style="' in tag:  # Dimensions from the directive's options.
+            return tag.replace(' style="', loading + ' style="{}; '.format(style), 1)
+        return '<img width="{}" height="{}" style="{}"'.format(dimensions[0], dimensions[1], style) + loading + tag[4:]
+
+    @staticmethod
+    @timed
+    def html_visit(writer: "HTML5Translator", node: "ImgurImageNode"):
+        """Let the translator render the image, then add attributes to the <img> tag."""
+        start = len(writer.body)
+        writer.visit_image(node)
+        attributes = "".join(
+            ' {}="{}"'.format(k, writer.attval(node[k])) for k in ImgurImageNode.HTML_ATTRIBUTES if node.get(k)
+        )
+        for i in range(start, len(writer.body)):
+            if writer.body[i].startswith("<img "):
+                tag = ImgurImageNode.layout_attributes(writer, node, "<img" + attributes + writer.body[i][4:])
+                if node.get("sources"):
+                    stripped = tag.rstrip()
+                    sources = "".join(
+                        '<source srcset="{}" type="{}" />'.format(writer.attval(u), m) for m, u in node["sources"]
+                    )
+                    tag = "<picture>" + sources + stripped + "</picture>" + tag[slice(len(stripped), None)]
+                writer.body[i] = tag
+                break
+
+    @staticmethod
+    def html_depart(writer: "HTML5Translator", node: "ImgurImageNode"):
+        """Same as regular images."""
+        writer.depart_image(node)
+
+
 class ImgurJavaScriptNode(nodes.Element):
-    """JavaScript node required after each embedded album/image because Imgur sucks at JavaScript."""
+    """Imgur's embed.js script node, needed once per page with embedded albums/images.
+
+    Added to HTML output by ImgurJavaScriptTransform, after each embed or once at the end of the page.
+    """
 
     @staticmethod
-    def html_visit(writer: HTML5Translator, node: "ImgurJavaScriptNode"):
+    @timed
+    def html_visit(writer: "HTML5Translator", node: "ImgurJavaScriptNode"):
         """Append opening tags to document body list."""
-        html_attrs_bq = {"async": "", "src": "//s.imgur.com/min/embed.js", "charset": "utf-8"}
+        if writer.config["imgur_embed_loading"] == "lazy":
+            writer.body.append(writer.starttag(node, "script", LAZY_LOADER_JS))
+            return
+        html_attrs_bq = {"async": "", "src": EMBED_JS_URL, "charset": "utf-8"}
         writer.body.append(writer.starttag(node, "script", "", **html_attrs_bq))
 
     @staticmethod
-    def html_depart(writer: HTML5Translator, _):
+    def html_depart(writer: "HTML5Translator", _):
         """Append closing tags to document body list."""
         writer.body.append("</script>")
 
 
 class ImgurOmittedImageNode(nodes.image):
-    """Hidden image node not included in output. Used for opengraph compatibility."""
-
-    def __init__(self, block_text: str, options: Dict[str, Any], config: Dict[str, Any], imgur_id: str, size: str, ext: str):
-        """Generate URL for hidden image.
+    """Hidden image node not included in output. Used for opengraph compatibility.
 
-        :param block_text: Raw rst text, probably not used by parent class.
-        :param options: Embed directive options.
-        :param config: Sphinx config.
-        :param imgur_id: Imgur ID from embed directive.
-        :param size: Opengraph image size from embed directive.
-        :param ext: Opengraph image extension from embed directive.
-        """
-        img_src_format, _ = img_src_target_formats(options, config)
-        if "og_imgur_id" in options:
-            imgur_id, size, ext = imgur_id_size_ext(options["og_imgur_id"], options, config)
-        if imgur_id.startswith("a/"):
-            # No hidden image when all we have is an album.
-            raise nodes.SkipNode
-        uri = img_src_format % {"id": imgur_id, "size": size, "ext": ext}
-        super().__init__(block_text, uri=uri, **options)
+    Only created when an extension in OPENGRAPH_EXTENSIONS is loaded, with just the uri and alt attributes it reads.
+    """
 
     @staticmethod
-    def html_visit(writer: HTML5Translator, _):
+    def html_visit(writer: "HTML5Translator", _):
         """Always tell Sphinx writers to skip this node."""
         raise nodes.SkipNode
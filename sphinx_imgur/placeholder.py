@@ -0,0 +1,94 @@
+"""Low quality image placeholders (imgur_placeholders): tiny previews shown while Imgur images load.
+
+Images downloaded by prefetch_images() are shrunk to a few pixels by worker processes (see convert.py) and inlined as PNG
+data URIs, once per content hash: results are kept in <doctreedir>/images/imgur-placeholders.json. ImgurImageNode
+renders them as the <img>'s CSS background, stretched (and so blurred by the browser) to the image's dimensions, which
+are also added as width/height attributes so the box has the right size before the image arrives.
+
+Images with transparency are skipped, their placeholder would show through once loaded. Requires Pillow.
+"""
+import base64
+import io
+import os
+from typing import Any, Dict, Optional
+
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+from sphinx.util import logging
+
+from sphinx_imgur.cache import load_json, save_json
+from sphinx_imgur.convert import Image, run_in_processes
+from sphinx_imgur.download import content_hash, image_keys, local_path, needs_local_copies
+from sphinx_imgur.metrics import METRICS, timed
+
+PLACEHOLDER_SIZE = 16
+PLACEHOLDERS_FILE = "imgur-placeholders.json"
+PLACEHOLDERS_VERSION = 1
+logger = logging.getLogger(__name__)
+
+
+def placeholder(path: str) -> Optional[Dict[str, Any]]:
+    """Shrink one image. Runs in a worker process.
+
+    :param path: Downloaded image.
+
+    :returns: Data URI and dimensions of the original image, None for transparent or unreadable images.
+    """
+    try:
+        with Image.open(path) as img:
+            if img.mode in ("LA", "PA", "RGBA") or "transparency" in img.info:
+                return None
+            width, height = img.size
+            img.draft("RGB", (PLACEHOLDER_SIZE * 8, PLACEHOLDER_SIZE * 8))  # Faster JPEG decoding, ignored otherwise.
+            small = img.convert("RGB")
+        small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+        buffer = io.BytesIO()
+        small.save(buffer, "PNG", optimize=True)
+    except (OSError, ValueError):
+        return None
+    data = "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode("ascii")
+    return {"data": data, "width": width, "height": height}
+
+
+def placeholders_path(app: Sphinx) -> str:
+    """Return where placeholders are kept between builds.
+
+    :param app: Sphinx application object.
+    """
+    return os.path.join(app.doctreedir, "images", PLACEHOLDERS_FILE)
+
+
+@timed
+def make_placeholders(app: Sphinx, env: BuildEnvironment):
+    """Compute placeholders of downloaded images, remembering them in app.imgur_placeholders. Called on env-updated.
+
+    :param app: Sphinx application object.
+    :param env: Sphinx build environment.
+    """
+    app.imgur_placeholders = {}
+    if not app.config["imgur_placeholders"] or not needs_local_copies(app.builder):
+        return
+    if Image is None:
+        logger.warning("imgur_placeholders: Pillow is not installed, skipping")
+        return
+
+    digests = {}  # Image URLs mapped to content hashes.
+    paths = {}  # Content hashes mapped to downloaded paths.
+    for uri in sorted(image_keys(env)):
+        path = local_path(app, uri)
+        if os.path.isfile(path):
+            digests[uri] = content_hash(path)
+            paths.setdefault(digests[uri], path)
+    stored_path = placeholders_path(app)
+    stored = load_json(stored_path, PLACEHOLDERS_VERSION, "placeholders")
+    pending = sorted(d for d in paths if d not in stored)
+    if pending:
+        logger.info("computing %d Imgur image placeholders... ", len(pending), nonl=True)
+        results = run_in_processes(placeholder, [paths[d] for d in pending])
+        stored.update(zip(pending, results))
+        METRICS.count(placeholders=len(pending))
+        logger.info("done")
+    if pending or set(stored) - set(paths):
+        save_json(stored_path, PLACEHOLDERS_VERSION, "placeholders", {d: stored[d] for d in paths})
+
+    app.imgur_placeholders = {u: stored[d] for u, d in digests.items() if stored[d]}
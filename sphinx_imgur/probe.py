@@ -0,0 +1,141 @@
+"""Intrinsic dimensions of Imgur images (imgur_dimensions), so HTML output reserves their space before they load.
+
+Only the first few kilobytes of each image are fetched with HTTP Range requests (concurrently, through the build's HTTP
+client) and parsed for the JPEG, PNG, GIF or WebP header. Images already on disk (imgur_mirror, imgur_formats,
+imgur_placeholders) are read locally instead. Dimensions never change for a given URL, they're kept in
+imgur-dimensions.json (in imgur_cache_dir or the doctree directory) and never probed again.
+"""
+import os
+import struct
+from typing import Optional, Tuple
+
+import requests
+from sphinx.application import Sphinx
+from sphinx.environment import BuildEnvironment
+from sphinx.util import logging
+
+from sphinx_imgur.cache import cache_path, load_json, save_json
+from sphinx_imgur.client import get_client, ImgurHttpClient
+from sphinx_imgur.download import image_keys, local_path
+from sphinx_imgur.metrics import METRICS, timed
+
+DIMENSIONS_FILE = "imgur-dimensions.json"
+DIMENSIONS_VERSION = 1
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}  # Start of frame, except DHT, JPG and DAC.
+PROBE_SIZES = (4096, 65536)  # Bytes fetched, the second time for JPEGs with large metadata before their frame header.
+logger = logging.getLogger(__name__)
+
+
+def jpeg_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """Return the width and height from a JPEG's frame header.
+
+    :param data: Beginning of the file.
+    """
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None  # Not at a marker, corrupt.
+        marker = data[i + 1]
+        if marker == 0xFF:  # Fill byte.
+            i += 1
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack(">HH", data[slice(i + 5, i + 9)])
+            return width, height
+        if marker == 0x01 or 0xD0 <= marker <= 0xD9:  # Markers without a length.
+            i += 2
+            continue
+        i += 2 + struct.unpack(">H", data[slice(i + 2, i + 4)])[0]
+    return None
+
+
+def webp_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """Return the width and height from a WebP's first chunk.
+
+    :param data: Beginning of the file.
+    """
+    chunk = data[slice(12, 16)]
+    if chunk == b"VP8 " and len(data) >= 30 and data[slice(23, 26)] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", data[slice(26, 30)])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and len(data) >= 25 and data[20] == 0x2F:
+        bits = struct.unpack("<I", data[slice(21, 25)])[0]
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(data) >= 30:
+        return int.from_bytes(data[slice(24, 27)], "little") + 1, int.from_bytes(data[slice(27, 30)], "little") + 1
+    return None
+
+
+def parse_dimensions(data: bytes) -> Optional[Tuple[int, int]]:
+    """Return the width and height of a JPEG, PNG, GIF or WebP image.
+
+    :param data: Beginning of the file.
+
+    :returns: Dimensions, None for other formats or when data is too short.
+    """
+    if data.startswith(b"\x89PNG\r\n\x1a\n") and data[slice(12, 16)] == b"IHDR" and len(data) >= 24:
+        return struct.unpack(">II", data[slice(16, 24)])
+    if data[slice(0, 6)] in (b"GIF87a", b"GIF89a") and len(data) >= 10:
+        return struct.unpack("<HH", data[slice(6, 10)])
+    if data.startswith(b"RIFF") and data[slice(8, 12)] == b"WEBP":
+        return webp_dimensions(data)
+    if data.startswith(b"\xff\xd8"):
+        return jpeg_dimensions(data)
+    return None
+
+
+def probe(client: ImgurHttpClient, uri: str) -> Tuple[bool, Optional[Tuple[int, int]]]:
+    """Fetch the beginning of a remote image and parse its dimensions.
+
+    :param client: HTTP client.
+    :param uri: Image URL.
+
+    :returns: If the image was fetched, and its dimensions (None when unknown).
+    """
+    for size in PROBE_SIZES:
+        try:
+            with client.get(uri, headers={"Range": "bytes=0-{}".format(size - 1)}, stream=True) as response:
+                response.raise_for_status()
+                data = response.raw.read(size, decode_content=True)
+        except (OSError, requests.RequestException) as exc:
+            logger.verbose("Could not probe remote image: %s [%s]", uri, exc)
+            METRICS.count(probe_failures=1)
+            return False, None
+        dimensions = parse_dimensions(data)
+        if dimensions or len(data) < size:  # Found, or the whole file was read.
+            METRICS.count(probes=1)
+            return True, dimensions
+    return True, None
+
+
+@timed
+def probe_images(app: Sphinx, env: BuildEnvironment):
+    """Find dimensions of images not probed before, remembering them in app.imgur_dimensions. Called on env-updated.
+
+    :param app: Sphinx application object.
+    :param env: Sphinx build environment.
+    """
+    app.imgur_dimensions = {}
+    if app.builder.format != "html" or not app.config["imgur_dimensions"]:
+        return
+    uris = sorted(image_keys(env))
+    path = cache_path(app, DIMENSIONS_FILE)
+    stored = load_json(path, DIMENSIONS_VERSION, "dimensions")
+    probed = {}
+    remote = []
+    for uri in (u for u in uris if u not in stored):
+        local = local_path(app, uri)
+        if os.path.isfile(local):
+            with open(local, "rb") as handle:
+                probed[uri] = parse_dimensions(handle.read(PROBE_SIZES[-1]))
+        else:
+            remote.append(uri)
+    if remote:
+        logger.info("probing %d Imgur images... ", len(remote), nonl=True)
+        results = get_client(app).map(probe, remote)
+        probed.update((u, d) for u, (fetched, d) in zip(remote, results) if fetched)
+        logger.info("%d done", sum(fetched for fetched, _ in results))
+    if probed:
+        stored.update(probed)
+        save_json(path, DIMENSIONS_VERSION, "dimensions", stored)
+    app.imgur_dimensions = {u: tuple(stored[u]) for u in uris if stored.get(u)}
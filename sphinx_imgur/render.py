@@ -0,0 +1,178 @@
+"""Render snippets with Imgur directives to HTML without a Sphinx build (e.g. live previews in an editor).
+
+Setting up a Sphinx application costs far more than rendering a few directives. render() parses the snippet with plain
+docutils, running the same directive classes (URL resolution with resolve() and imgur_id_size_ext()) against a minimal
+stand-in for Sphinx's environment, and writes it with docutils' HTML5 writer using the same node visitors as Sphinx's
+HTML builders. Sphinx roles and directives aren't available, and config values needing a build (downloads, API requests)
+are rejected.
+
+Docutils keeps directives in a global registry. The Imgur directives are only registered while rendering, one snippet at
+a time, the same way Sphinx scopes its registrations to a build.
+"""
+import copy
+import io
+import threading
+from functools import lru_cache
+from types import SimpleNamespace
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from docutils import frontend, nodes
+from docutils.core import publish_parts
+from docutils.parsers.rst import directives, Parser
+from docutils.transforms import Transform
+from docutils.writers import html5_polyglot
+from sphinx.util.docutils import docutils_namespace
+
+from sphinx_imgur.environment import get_references
+from sphinx_imgur.imgur import (
+    DEFAULT_EMBED_LOADING,
+    DEFAULT_EMBED_SCRIPT,
+    DEFAULT_EXT,
+    DEFAULT_PRELOAD,
+    DEFAULT_SIZE,
+    DEFAULT_SRCSET,
+    IMG_SRC_FORMAT,
+    ImgurEmbed,
+    ImgurFigure,
+    ImgurImage,
+    TARGET_FORMAT,
+)
+from sphinx_imgur.nodes import ImgurEmbedNode, ImgurImageNode, ImgurJavaScriptNode
+from sphinx_imgur.transforms import add_script_nodes, choose_preloads, replace_html_images
+from sphinx_imgur.utils import validate_config
+
+BUILDER = SimpleNamespace(name="html", format="html")  # For imgur_builder_policy.
+DEFAULT_CONFIG = {
+    "imgur_builder_policy": {},
+    "imgur_default_ext": DEFAULT_EXT,
+    "imgur_default_size": DEFAULT_SIZE,
+    "imgur_embed_loading": DEFAULT_EMBED_LOADING,
+    "imgur_embed_script": DEFAULT_EMBED_SCRIPT,
+    "imgur_hide_post_details": False,
+    "imgur_img_src_format": IMG_SRC_FORMAT,
+    "imgur_preload": DEFAULT_PRELOAD,
+    "imgur_srcset": DEFAULT_SRCSET,
+    "imgur_srcset_sizes": None,
+    "imgur_target_format": TARGET_FORMAT,
+}
+DIRECTIVES = {"imgur": ImgurImage, "imgur-embed": ImgurEmbed, "imgur-figure": ImgurFigure, "imgur-image": ImgurImage}
+HTML_VISITORS = {
+    ImgurEmbedNode: (ImgurEmbedNode.html_visit, ImgurEmbedNode.html_depart),
+    ImgurImageNode: (ImgurImageNode.html_visit, ImgurImageNode.html_depart),
+    ImgurJavaScriptNode: (ImgurJavaScriptNode.html_visit, ImgurJavaScriptNode.html_depart),
+}
+LOCK = threading.Lock()
+SNIPPET = "snippet"
+
+
+class Rendered(NamedTuple):
+    """HTML of a snippet and what its directives resolved to."""
+
+    html: str
+    references: List[Dict[str, Any]]  # Directive, line number, imgur_id, size, ext, src and target of each directive.
+    warnings: str  # Docutils messages, also rendered in the HTML.
+
+
+class RenderEnvironment:  # pylint: disable=too-few-public-methods
+    """What the directives read from Sphinx's BuildEnvironment."""
+
+    docname = SNIPPET
+
+    def __init__(self, config: Dict[str, Any]):
+        """Constructor.
+
+        :param config: Complete Imgur config.
+        """
+        self.config = config
+        self.app = SimpleNamespace(builder=BUILDER, extensions=())
+
+
+class ImgurRenderTransform(Transform):  # pylint: disable=too-few-public-methods
+    """Same changes as the post-transforms of Sphinx's HTML builders."""
+
+    default_priority = 900
+
+    def apply(self, **kwargs: Any):
+        """Main method."""
+        config = self.document.settings.env.config
+        choose_preloads(self.document, config["imgur_preload"])
+        replace_html_images(self.document)
+        placement = config["imgur_embed_script"]
+        add_script_nodes(self.document, "body" if placement == "head" else placement)  # Snippets have no <head>.
+
+
+class ImgurHTMLTranslator(html5_polyglot.HTMLTranslator):  # pylint: disable=abstract-method
+    """Docutils' HTML5 translator with the visitors setup() registers for Sphinx's, see HTML_VISITORS."""
+
+    def __init__(self, document: nodes.document):
+        """Constructor.
+
+        :param document: Document to translate.
+        """
+        super().__init__(document)
+        self.config = document.settings.env.config  # Read by the visitors, like Sphinx's translator.
+
+
+for _node, (_visit, _depart) in HTML_VISITORS.items():  # Same as app.add_node() does for Sphinx's translators.
+    setattr(ImgurHTMLTranslator, "visit_" + _node.__name__, _visit)
+    setattr(ImgurHTMLTranslator, "depart_" + _node.__name__, _depart)
+
+
+class ImgurHTMLWriter(html5_polyglot.Writer):
+    """Docutils' HTML5 writer applying ImgurRenderTransform and using ImgurHTMLTranslator."""
+
+    def __init__(self):
+        """Constructor."""
+        super().__init__()
+        self.translator_class = ImgurHTMLTranslator
+
+    def get_transforms(self) -> List[type]:
+        """Add ImgurRenderTransform."""
+        return super().get_transforms() + [ImgurRenderTransform]
+
+
+@lru_cache(maxsize=1)
+def default_settings() -> frontend.Values:
+    """Return docutils settings shared by every render, parsing them is slower than rendering a snippet."""
+    settings = frontend.OptionParser(components=(Parser, ImgurHTMLWriter)).get_default_values()
+    settings.doctitle_xform = False  # Keep section titles of snippets in the body.
+    settings.output_encoding = "unicode"
+    settings.stylesheet_path = []  # Not part of the fragment, don't read them from disk every time.
+    settings.traceback = True  # Raise exceptions instead of exiting.
+    return settings
+
+
+def render_config(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Return the complete Imgur config, validated like conf.py.
+
+    :param config: Imgur config values overriding DEFAULT_CONFIG.
+
+    :raises ValueError: Config values render() doesn't support.
+    :raises sphinx.errors.ConfigError: Malformed URL formats or imgur_builder_policy.
+    """
+    unsupported = sorted(set(config or ()) - set(DEFAULT_CONFIG))
+    if unsupported:
+        raise ValueError("Config values not supported without a Sphinx build: {}".format(", ".join(unsupported)))
+    merged = dict(DEFAULT_CONFIG, **(config or {}))
+    validate_config(None, merged)
+    return merged
+
+
+def render(source: str, config: Optional[Dict[str, Any]] = None) -> Rendered:
+    """Render reStructuredText with Imgur directives to an HTML fragment.
+
+    :param source: reStructuredText, e.g. ".. imgur:: 611EovQ".
+    :param config: Imgur config values (e.g. {"imgur_default_size": "l"}), defaults are the same as in conf.py.
+
+    :raises ValueError: Config values render() doesn't support.
+    :raises sphinx.errors.ConfigError: Malformed URL formats or imgur_builder_policy.
+    """
+    settings = copy.copy(default_settings())
+    settings.env = RenderEnvironment(render_config(config))
+    settings.warning_stream = io.StringIO()
+    with LOCK, docutils_namespace():
+        for name, directive in DIRECTIVES.items():
+            directives.register_directive(name, directive)
+        parts = publish_parts(source, source_path=SNIPPET, writer=ImgurHTMLWriter(), settings=settings)
+    references = [dict(e) for e in get_references(settings.env).get(SNIPPET, [])]
+    return Rendered(parts["body"], references, settings.warning_stream.getvalue())
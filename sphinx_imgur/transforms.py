@@ -0,0 +1,257 @@
+"""Transforms applied to resolved doctrees before writing output."""
+import html
+from typing import Any, Dict, List, Set
+from urllib.parse import urlsplit
+
+from docutils.nodes import image, Node, paragraph, reference, Text
+from sphinx.application import Sphinx
+from sphinx.transforms.post_transforms import SphinxPostTransform
+
+from sphinx_imgur.download import needs_embed_fallback
+from sphinx_imgur.nodes import (
+    EMBED_JS_URL,
+    EMBED_TARGET_FORMAT,
+    ImgurEmbedNode,
+    ImgurGalleryNode,
+    ImgurImageNode,
+    ImgurJavaScriptNode,
+    ImgurOmittedImageNode,
+    ImgurStaticImageNode,
+    LAZY_LOADER_JS,
+)
+from sphinx_imgur.utils import findall, url_template
+
+EMBED_SCRIPT_PLACEMENTS = ("body", "head", "each")
+
+
+def replace_html_images(doctree: Node):
+    """Convert image nodes with HTML-only attributes into ImgurImageNode, so the HTML translator renders them.
+
+    :param doctree: Document to modify in place.
+    """
+    for node in findall(doctree, image):
+        if isinstance(node, ImgurImageNode) or not any(k in node for k in ImgurImageNode.HTML_ONLY):
+            continue
+        node.replace_self(ImgurImageNode(node.rawsource, *node.children, **node.attributes))
+
+
+def choose_preloads(doctree: Node, remaining: int):
+    """Decide which images are preloaded: those marked with :preload:, and the first few others.
+
+    :param doctree: Document to modify in place.
+    :param remaining: Number of images without :preload: or :nopreload: to preload (imgur_preload).
+    """
+    for node in findall(doctree, image):
+        if node.get("preload") != "auto":
+            continue
+        if remaining > 0 and not node.get("sources"):
+            node["preload"] = "yes"
+            remaining -= 1
+        else:
+            node["preload"] = "no"
+
+
+def add_script_nodes(doctree: Node, placement: str):
+    """Add embed.js script nodes after each embed, or once at the end of documents with embeds.
+
+    :param doctree: Document to modify in place.
+    :param placement: Value of imgur_embed_script, nothing is added for "head" (see add_embed_script()).
+    """
+    embeds = findall(doctree, ImgurEmbedNode)
+    if placement == "each":
+        for node in embeds:
+            node.parent.insert(node.parent.index(node) + 1, ImgurJavaScriptNode())
+    elif embeds and placement == "body":
+        doctree.append(ImgurJavaScriptNode())
+
+
+class ImgurImageTransform(SphinxPostTransform):
+    """Convert image nodes with HTML-only attributes into ImgurImageNode, so the HTML translator renders them."""
+
+    default_priority = 500
+    formats = ("html",)
+
+    def run(self, **kwargs: Any):
+        """Main method."""
+        replace_html_images(self.document)
+
+
+class ImgurPreloadTransform(SphinxPostTransform):
+    """Decide which images of the page are preloaded: those marked with :preload:, and the first imgur_preload others.
+
+    Images with <picture> sources (imgur_formats) aren't preloaded, browsers would fetch the fallback format. Images not
+    preloaded are lazy loaded when their dimensions are known.
+    """
+
+    default_priority = 460  # After ImgurImageMirror, before ImgurImageTransform.
+    formats = ("html",)
+
+    def run(self, **kwargs: Any):
+        """Main method."""
+        choose_preloads(self.document, self.app.config["imgur_preload"])
+
+
+class ImgurStaticEmbedTransform(SphinxPostTransform):
+    """Replace embeds with static galleries/images when fetch_embeds() found their metadata, they don't need embed.js."""
+
+    default_priority = 400  # Before ImgurJavaScriptTransform.
+    formats = ("html",)
+
+    def run(self, **kwargs: Any):
+        """Main method."""
+        embeds = getattr(self.app, "imgur_embeds", None)
+        if not embeds:
+            return
+        for node in findall(self.document, ImgurEmbedNode):
+            metadata = embeds.get(node["imgur_id"])
+            if metadata is None or ("images" not in metadata and not node.get("thumbnail")):
+                continue
+            attributes = {"imgur_id": node["imgur_id"], "hide_post_details": node.get("hide_post_details", False)}
+            if "images" in metadata:
+                static = ImgurGalleryNode(**attributes, **metadata)
+            else:
+                static = ImgurStaticImageNode(src=node["thumbnail"], **attributes, **metadata)
+            node.replace_self(static)
+
+
+def embed_fallback(node: ImgurEmbedNode, thumbnail: bool) -> List[Node]:
+    """Return nodes standing in for an embed: its thumbnail linking to Imgur, and a paragraph with the link's URL.
+
+    :param node: Embed node.
+    :param thumbnail: Include the thumbnail (if the embed has one), False for builders without image support.
+    """
+    target = EMBED_TARGET_FORMAT.format(node["imgur_id"])
+    title = node.get("title")
+    fallback = []
+    if thumbnail and node.get("thumbnail"):
+        alt = title or ("Imgur album" if node["imgur_id"].startswith("a/") else "Imgur image")
+        node_img = image(uri=node["thumbnail"], alt=alt, candidates={"?": node["thumbnail"]})
+        fallback.append(reference("", "", node_img, refuri=target))
+    link = paragraph()
+    if title:
+        link += Text(title + ": ")
+    link += reference(target, target, refuri=target)
+    fallback.append(link)
+    return fallback
+
+
+class ImgurEmbedFallbackTransform(SphinxPostTransform):
+    """Render embeds for builders that can't run embed.js, and remove their hidden opengraph image.
+
+    Builders supporting images (e.g. LaTeX, EPUB) get a thumbnail linking to Imgur, downloaded by prefetch_images() along
+    with every other image, followed by the URL. Others (e.g. text, man pages) only get the URL.
+    """
+
+    default_priority = 50  # Before images are downloaded.
+
+    def is_supported(self) -> bool:
+        """Only builders without embed.js support."""
+        return needs_embed_fallback(self.app.builder)
+
+    def run(self, **kwargs: Any):
+        """Main method."""
+        for node in findall(self.document, ImgurOmittedImageNode):
+            node.parent.remove(node)
+        thumbnail = bool(self.app.builder.supported_image_types)
+        for node in findall(self.document, ImgurEmbedNode):
+            node.replace_self(embed_fallback(node, thumbnail))
+
+
+class ImgurJavaScriptTransform(SphinxPostTransform):
+    """Add embed.js script nodes after each embed, or once at the end of pages with embeds (imgur_embed_script)."""
+
+    default_priority = 500
+    formats = ("html",)
+
+    def run(self, **kwargs: Any):
+        """Main method."""
+        add_script_nodes(self.document, self.config["imgur_embed_script"])
+
+
+def add_embed_script(app: Sphinx, _: str, __: str, context: Dict[str, Any], doctree: Node):
+    """Add a deferred embed.js script (or the lazy loader) to the <head> of pages with embeds. Called on html-page-context.
+
+    :param app: Sphinx application object.
+    :param _: Name of the page being rendered.
+    :param __: Template name.
+    :param context: Template context, modified in place.
+    :param doctree: Doctree of the page, None for pages without one (e.g. search).
+    """
+    if app.config["imgur_embed_script"] != "head" or doctree is None or not findall(doctree, ImgurEmbedNode):
+        return
+    from sphinx.builders.html import JavaScript  # pylint: disable=import-outside-toplevel  # Only HTML builders.
+
+    if app.config["imgur_embed_loading"] == "lazy":
+        script = JavaScript(None, body=LAZY_LOADER_JS)
+    else:
+        script = JavaScript("https:" + EMBED_JS_URL, defer="defer", charset="utf-8")
+    context["script_files"] = list(context["script_files"]) + [script]
+
+
+def origin(url: str) -> str:
+    """Return the scheme and host of a URL, e.g. https://i.imgur.com.
+
+    :param url: Absolute or protocol-relative URL.
+    """
+    parts = urlsplit(url)
+    return "{}://{}".format(parts.scheme or "https", parts.netloc)
+
+
+def hint_origins(app: Sphinx, doctree: Node) -> Dict[str, Set[str]]:
+    """Return hosts the page will connect to (preconnect), or might connect to (dns-prefetch).
+
+    :param app: Sphinx application object.
+    :param doctree: Doctree of the page.
+    """
+    preconnect = {origin(n["uri"]) for n in findall(doctree, image) if "preload" in n and "://" in n["uri"]}
+    if findall(doctree, ImgurGalleryNode) or findall(doctree, ImgurStaticImageNode):
+        preconnect.add(origin(url_template(app.config["imgur_img_src_format"])("", "", "jpg")))
+    prefetch = set()
+    embeds = findall(doctree, ImgurEmbedNode)
+    if embeds and app.config["imgur_embed_loading"] == "lazy":  # Thumbnails now, embed.js and iframes maybe later.
+        preconnect.update(origin(n["thumbnail"]) for n in embeds if n.get("thumbnail"))
+        prefetch.update(origin(u) for u in (EMBED_JS_URL, EMBED_TARGET_FORMAT))
+    elif embeds:
+        preconnect.update(origin(u) for u in (EMBED_JS_URL, EMBED_TARGET_FORMAT))
+    return {"preconnect": preconnect, "dns-prefetch": preconnect | prefetch}
+
+
+def preload_links(doctree: Node) -> List[str]:
+    """Return <link rel="preload"> tags of images chosen by ImgurPreloadTransform.
+
+    :param doctree: Doctree of the page.
+    """
+    links = []
+    for node in findall(doctree, image):
+        if node.get("preload") != "yes" or node.get("sources"):
+            continue
+        attributes = {"rel": "preload", "as": "image", "href": node["uri"], "fetchpriority": "high"}
+        if node.get("srcset"):
+            attributes.update(imagesrcset=node["srcset"], imagesizes=node.get("sizes") or "100vw")
+        link = "<link {} />".format(" ".join('{}="{}"'.format(k, html.escape(v)) for k, v in attributes.items()))
+        if link not in links:
+            links.append(link)
+    return links
+
+
+def add_resource_hints(app: Sphinx, _: str, __: str, context: Dict[str, Any], doctree: Node):
+    """Add resource hints for Imgur content of the page to its <head>. Called on html-page-context.
+
+    Hosts serving the page's images and embeds get preconnect/dns-prefetch hints (imgur_preconnect), images above the
+    fold get preload hints (imgur_preload, :preload:).
+
+    :param app: Sphinx application object.
+    :param _: Name of the page being rendered.
+    :param __: Template name.
+    :param context: Template context, modified in place.
+    :param doctree: Doctree of the page, None for pages without one (e.g. search).
+    """
+    if doctree is None:
+        return
+    links = []
+    if app.config["imgur_preconnect"]:
+        for rel, origins in hint_origins(app, doctree).items():
+            links.extend('<link rel="{}" href="{}" />'.format(rel, html.escape(o)) for o in sorted(origins))
+    links.extend(preload_links(doctree))
+    if links:
+        context["metatags"] = context.get("metatags", "") + "".join("\n" + link for link in links)
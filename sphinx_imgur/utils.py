@@ -1,22 +1,141 @@
 """Helpers."""
-from typing import Any, Dict, Optional, Tuple
+import re
+import sys
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, Type
 
+from docutils.nodes import Node
+from sphinx.application import Sphinx
+from sphinx.builders import Builder
+from sphinx.config import Config
+from sphinx.errors import ConfigError
 
-def imgur_id_size_ext(arg: str, options: Dict[str, Any], config: Dict[str, Any]) -> Tuple[str, str, str]:
+# Substitutions compiled into str.format() fields, for format strings using nothing else (e.g. no %(id)r).
+FIELDS = {"id": "{0}", "size": "{1}", "ext": "{2}"}
+NAMED_SUBSTITUTION = re.compile(r"%\((id|size|ext)\)s|%%")
+# Modern image formats of imgur_formats, and their MIME types.
+FORMATS = {"avif": "image/avif", "webp": "image/webp"}
+POLICY_KEYS = frozenset({"ext", "size"})  # Of each imgur_builder_policy entry.
+# Directive options affecting resolve().
+RESOLVE_OPTIONS = ("ext", "fullsize", "img_src_format", "notarget", "size", "target")
+# Widths of Imgur's non-square thumbnails (s and b are square crops).
+THUMBNAIL_WIDTHS = {"t": 160, "m": 320, "l": 640, "h": 1024}
+UNNAMED_SUBSTITUTION = re.compile(r"%(?![(%])")
+
+
+class ImgurUrls(NamedTuple):
+    """Everything derived from an Imgur directive argument and its options."""
+
+    imgur_id: str
+    size: str
+    ext: str
+    src: str
+    target: Optional[str]
+
+
+class UrlTemplate:  # pylint: disable=too-few-public-methods
+    """URL formatter (e.g. imgur_img_src_format) validated once instead of failing while formatting each image.
+
+    Formatting is compiled into a positional str.format() call, which is faster than %-formatting with a dict.
+    """
+
+    __slots__ = ("format", "format_string")
+
+    def __init__(self, format_string: str):
+        """Constructor.
+
+        :param format_string: Old-style format string, valid substitutions are %(id)s, %(size)s, and %(ext)s.
+
+        :raises ValueError: Malformed format string.
+        """
+        try:
+            if not isinstance(format_string, str):
+                raise TypeError("not a string")
+            if UNNAMED_SUBSTITUTION.search(format_string.replace("%%", "")):
+                raise TypeError("unnamed substitution")
+            format_string % {"id": "", "size": "", "ext": ""}  # pylint: disable=pointless-statement
+        except KeyError as exc:
+            reason = "unknown substitution %({})s".format(exc.args[0])
+        except (TypeError, ValueError) as exc:
+            reason = str(exc)
+        else:
+            self.format_string = format_string
+            self.format = self.compile(format_string)
+            return
+        raise ValueError(
+            "Invalid URL format {!r} ({}). Valid substitutions are %(id)s, %(size)s, and %(ext)s, "
+            "literal percent signs must be written as %%.".format(format_string, reason)
+        )
+
+    @staticmethod
+    def compile(format_string: str) -> Callable[[str, str, str], str]:
+        """Return a function formatting URLs from the image ID, size, and extension.
+
+        :param format_string: Valid old-style format string.
+        """
+        if "%" in NAMED_SUBSTITUTION.sub("", format_string):  # Other conversions or flags, e.g. %(id)r.
+            return lambda imgur_id, size, ext: format_string % {"id": imgur_id, "size": size, "ext": ext}
+        escaped = format_string.replace("{", "{{").replace("}", "}}")
+        return NAMED_SUBSTITUTION.sub(lambda m: FIELDS[m.group(1)] if m.group(1) else "%", escaped).format
+
+    def __call__(self, imgur_id: str, size: str, ext: str) -> str:
+        """Format a URL.
+
+        :param imgur_id: Imgur image or album ID.
+        :param size: Imgur size character.
+        :param ext: File extension.
+        """
+        return self.format(imgur_id, size, ext)
+
+
+@lru_cache(maxsize=256)
+def url_template(format_string: str) -> UrlTemplate:
+    """Return a validated URL formatter, reusing previous ones.
+
+    :param format_string: Old-style format string.
+
+    :raises ValueError: Malformed format string.
+    """
+    return UrlTemplate(format_string)
+
+
+def builder_policy(config: Dict[str, Any], builder: Optional[Builder]) -> Dict[str, str]:
+    """Return the imgur_builder_policy entry of a builder, looked up by name (e.g. epub) then format (e.g. html).
+
+    :param config: Sphinx config.
+    :param builder: The builder, None for no policy.
+
+    :returns: Size and/or extension replacing imgur_default_size and imgur_default_ext, empty when there's none.
+    """
+    if builder is None or "imgur_builder_policy" not in config or not config["imgur_builder_policy"]:
+        return {}
+    policy = config["imgur_builder_policy"]
+    return policy.get(builder.name) or policy.get(builder.format) or {}
+
+
+def imgur_id_size_ext(
+    arg: str, options: Dict[str, Any], config: Dict[str, Any], builder: Optional[Builder] = None
+) -> Tuple[str, str, str]:
     """Determine the image ID, size, and file extension.
 
+    Sizes and extensions in the argument or options win over imgur_builder_policy, which wins over the defaults.
+
     :param arg: First argument given to directive.
     :param options: Directive options.
     :param config: Sphinx config.
+    :param builder: The builder, to apply its imgur_builder_policy entry.
     """
+    policy = builder_policy(config, builder)
+    default_ext = policy.get("ext") or config["imgur_default_ext"]
+
     # Extension.
     if "." in arg:
         imgur_id, ext = arg.rsplit(".", 1)
         if not ext:
-            ext = config["imgur_default_ext"]
+            ext = default_ext
     else:
         imgur_id = arg
-        ext = config["imgur_default_ext"]
+        ext = default_ext
     if "ext" in options:
         ext = options["ext"]
 
@@ -29,7 +148,7 @@ def imgur_id_size_ext(arg: str, options: Dict[str, Any], config: Dict[str, Any])
         # User specified extension in the argument, interpreting it as requesting full size (e.g. a gif).
         size = ""
     else:
-        size = config["imgur_default_size"]
+        size = policy["size"] if "size" in policy else config["imgur_default_size"]
     if "fullsize" in options:
         size = ""
     elif "size" in options:
@@ -61,3 +180,157 @@ def img_src_target_formats(options: Dict[str, Any], config: Dict[str, Any]) -> T
         target_format = None
 
     return img_src_format, target_format
+
+
+class Resolver:  # pylint: disable=too-few-public-methods
+    """Resolve Imgur directive arguments and options for one configuration, with its URL formats compiled once."""
+
+    def __init__(self, default_ext: str, default_size: str, img_src_format: str, target_format: Optional[str]):
+        """Constructor.
+
+        :param default_ext: Value of imgur_default_ext.
+        :param default_size: Value of imgur_default_size.
+        :param img_src_format: Value of imgur_img_src_format.
+        :param target_format: Value of imgur_target_format, None or empty to not link images.
+
+        :raises ValueError: Malformed URL format.
+        """
+        self.defaults = {"imgur_default_ext": default_ext, "imgur_default_size": default_size}
+        self.img_src = url_template(img_src_format).format
+        self.target = url_template(target_format).format if target_format else None
+
+    def __call__(self, arg: str, options: Dict[str, Any]) -> ImgurUrls:
+        """Resolve one directive.
+
+        :param arg: First argument given to directive.
+        :param options: Directive options.
+
+        :raises ValueError: Malformed URL format in the options.
+        """
+        imgur_id, size, ext = imgur_id_size_ext(arg, options, self.defaults)
+        img_src = url_template(options["img_src_format"]).format if "img_src_format" in options else self.img_src
+        if "target" in options:
+            target = url_template(options["target"]).format
+        elif "notarget" in options:
+            target = None
+        else:
+            target = self.target
+        # Interned so documents repeating an image share strings, pickled once per doctree and environment.
+        src = sys.intern(img_src(imgur_id, size, ext))
+        return ImgurUrls(imgur_id, size, ext, src, target and sys.intern(target(imgur_id, size, ext)))
+
+
+@lru_cache(maxsize=16)
+def get_resolver(default_ext: str, default_size: str, img_src_format: str, target_format: Optional[str]) -> Resolver:
+    """Return the resolver for a configuration, reusing previous ones.
+
+    :param default_ext: Value of imgur_default_ext.
+    :param default_size: Value of imgur_default_size.
+    :param img_src_format: Value of imgur_img_src_format.
+    :param target_format: Value of imgur_target_format.
+
+    :raises ValueError: Malformed URL format.
+    """
+    return Resolver(default_ext, default_size, img_src_format, target_format)
+
+
+def resolve(arg: str, options: Dict[str, Any], config: Dict[str, Any], builder: Optional[Builder] = None) -> ImgurUrls:
+    """Determine the image ID, size, file extension, image URL, and link target of an Imgur directive.
+
+    Resolvers (and their compiled URL formats) are reused for the same configuration.
+
+    :param arg: First argument given to directive.
+    :param options: Directive options.
+    :param config: Sphinx config.
+    :param builder: The builder, to apply its imgur_builder_policy entry.
+
+    :raises ValueError: Malformed URL format.
+    """
+    policy = builder_policy(config, builder)
+    resolver = get_resolver(
+        policy.get("ext") or config["imgur_default_ext"],
+        policy["size"] if "size" in policy else config["imgur_default_size"],
+        config["imgur_img_src_format"],
+        config["imgur_target_format"],
+    )
+    return resolver(arg, options)
+
+
+def validate_config(_: Sphinx, config: Config):
+    """Check imgur_builder_policy and compile URL formats in conf.py, so mistakes are reported before reading any documents.
+
+    Called on config-inited.
+
+    :param _: Sphinx application object.
+    :param config: Sphinx config.
+    """
+    policy = config["imgur_builder_policy"]
+    if not isinstance(policy, dict) or not all(
+        isinstance(v, dict) and set(v) <= POLICY_KEYS and all(isinstance(s, str) for s in v.values())
+        for v in policy.values()
+    ):
+        raise ConfigError('imgur_builder_policy: expected builder names mapped to {"size": ..., "ext": ...} dicts')
+    for name in ("imgur_img_src_format", "imgur_target_format"):
+        if name == "imgur_target_format" and not config[name]:
+            continue
+        try:
+            url_template(config[name])
+        except (TypeError, ValueError) as exc:  # TypeError when unhashable.
+            raise ConfigError("{}: {}".format(name, exc)) from exc
+
+
+def validate_formats(_: Sphinx, config: Config):
+    """Reject unknown formats in conf.py. Called on config-inited.
+
+    :param _: Sphinx application object.
+    :param config: Sphinx config.
+    """
+    value = config["imgur_formats"]
+    if isinstance(value, str) or not all(f in FORMATS for f in value):
+        raise ConfigError("imgur_formats: must be a list with any of {}, got {!r}".format(", ".join(FORMATS), value))
+
+
+def srcset_sizes(urls: ImgurUrls, options: Dict[str, Any], config: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+    """Determine <img srcset> and sizes values listing smaller Imgur thumbnails of the image.
+
+    Only thumbnails up to the size of the image itself are listed, so browsers never pick something larger than before.
+
+    :param urls: Return value of resolve().
+    :param options: Directive options.
+    :param config: Sphinx config.
+
+    :returns: srcset and sizes attribute values, None when disabled or not applicable (e.g. square thumbnails, or full
+        size images whose width is unknown: thumbnails would replace them, e.g. animated GIFs with still images).
+    """
+    if "nosrcset" in options:
+        return None
+    if "srcset" in options:
+        chars = options["srcset"].replace(",", " ").split() or list(THUMBNAIL_WIDTHS)
+    else:
+        chars = config["imgur_srcset"]
+    size = urls.size
+    if not chars or size not in THUMBNAIL_WIDTHS:
+        return None
+
+    max_width = THUMBNAIL_WIDTHS[size]
+    widths = {THUMBNAIL_WIDTHS[c]: c for c in list(chars) + [size] if THUMBNAIL_WIDTHS.get(c, max_width + 1) <= max_width}
+    if len(widths) < 2:
+        return None
+    template = url_template(img_src_target_formats(options, config)[0])
+    srcset = ", ".join("{} {}w".format(template(urls.imgur_id, widths[w], urls.ext), w) for w in sorted(widths))
+    sizes = options.get("sizes") or config["imgur_srcset_sizes"] or "(max-width: {0}px) 100vw, {0}px".format(max(widths))
+    return srcset, sizes
+
+
+def findall(node: Node, condition: Type[Node]) -> List[Node]:
+    """Return all descendants (including the node itself) of a given type.
+
+    Node.findall() replaced Node.traverse() in docutils 0.18.1.
+
+    :param node: Node to search.
+    :param condition: Node class to look for.
+    """
+    try:
+        return list(node.findall(condition))
+    except AttributeError:
+        return list(node.traverse(condition))
@@ -0,0 +1 @@
+"""Benchmarks, run them with python -m (they're not collected by pytest)."""
@@ -0,0 +1,74 @@
+"""Run one Sphinx build and print phase timings and peak RSS as JSON. Executed in a subprocess by run.py.
+
+python -m tests.benchmarks.build SRCDIR OUTDIR DOCTREEDIR BUILDER [JOBS]
+"""
+import json
+import sys
+import time
+from io import StringIO
+from typing import Optional
+
+from sphinx.application import Sphinx
+
+# Event listener priorities, around sphinx-imgur's own (default 500) env-updated listener that downloads images.
+FIRST = 1
+LAST = 999
+
+
+def peak_rss() -> Optional[int]:
+    """Return the peak RSS in KiB of this process, or of its largest finished child process (-j workers).
+
+    On Linux ru_maxrss of a process starts at its parent's peak RSS, carried over through fork and exec: it would measure
+    run.py instead of the build. The high water mark of this process' own memory is read from /proc instead. Forked
+    workers start at this process' real peak, which is what they share with it anyway.
+
+    :returns: None when unsupported (e.g. Windows).
+    """
+    try:
+        import resource  # pylint: disable=import-outside-toplevel  # Unix only.
+    except ImportError:
+        return None
+    scale = 1024 if sys.platform == "darwin" else 1  # Bytes on macOS.
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale
+    try:
+        with open("/proc/self/status", encoding="utf8") as handle:
+            own = next(int(line.split()[1]) for line in handle if line.startswith("VmHWM:"))
+    except (OSError, StopIteration):
+        pass
+    return max(own, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale)
+
+
+def main():
+    """Main function."""
+    srcdir, outdir, doctreedir, builder = sys.argv[1:5]
+    jobs = int(sys.argv[5]) if len(sys.argv) > 5 else 1
+    marks = {"start": time.perf_counter()}
+
+    def mark(name: str):
+        def listener(*_):
+            marks[name] = time.perf_counter()
+
+        return listener
+
+    warnings = StringIO()
+    app = Sphinx(srcdir, srcdir, outdir, doctreedir, builder, status=None, warning=warnings, parallel=jobs)
+    marks["init"] = time.perf_counter()
+    app.connect("env-updated", mark("read"), priority=FIRST)
+    app.connect("env-updated", mark("download"), priority=LAST)
+    app.connect("build-finished", mark("write"), priority=FIRST)
+    app.build()
+
+    end = marks["write"]
+    read_end = marks.get("read", marks["init"])  # No env-updated without outdated documents.
+    download_end = marks.get("download", read_end)
+    timings = {
+        "init": marks["init"] - marks["start"],
+        "read": read_end - marks["init"],
+        "download": download_end - read_end,
+        "write": end - download_end,
+    }
+    print(json.dumps({"timings": timings, "warnings": len(warnings.getvalue().splitlines()), "peak_rss": peak_rss()}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Generate synthetic Sphinx projects with many Imgur directives."""
+import random
+from pathlib import Path
+from typing import Any, List, NamedTuple
+
+FORMATS = ("rst", "myst")
+
+RST = {
+    "imgur": ".. imgur:: {imgur_id}\n    :alt: Image {n}\n",
+    "imgur-figure": ".. imgur-figure:: {imgur_id}.png\n    :notarget:\n\n    Figure {n}.\n",
+    "imgur-embed": ".. imgur-embed:: {imgur_id}\n    :alt: Embed {n}\n",
+}
+MYST = {
+    "imgur": "```{{imgur}} {imgur_id}\n:alt: Image {n}\n```\n",
+    "imgur-figure": "```{{imgur-figure}} {imgur_id}.png\n:notarget:\n\nFigure {n}.\n```\n",
+    "imgur-embed": "```{{imgur-embed}} {imgur_id}\n:alt: Embed {n}\n```\n",
+}
+
+
+class Corpus(NamedTuple):
+    """Shape of a generated project."""
+
+    documents: int = 100
+    images: int = 5  # Per document.
+    figures: int = 2  # Per document.
+    embeds: int = 1  # Per document.
+    distinct: int = 200  # Number of distinct Imgur IDs shared by all documents.
+    fmt: str = "rst"
+    seed: int = 0
+    plain: int = 0  # Additional documents without Imgur directives.
+
+
+def imgur_ids(count: int, seed: int) -> List[str]:
+    """Return Imgur-like IDs (odd length, so no size character is implied).
+
+    :param count: Number of IDs.
+    :param seed: Random seed.
+    """
+    rand = random.Random(seed)
+    alphabet = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    return ["".join(rand.choice(alphabet) for _ in range(7)) for _ in range(count)]
+
+
+def document(corpus: Corpus, number: int, ids: List[str], rand: random.Random) -> str:
+    """Return the contents of one document.
+
+    :param corpus: Shape of the project.
+    :param number: Document number, documents numbered after corpus.documents have no Imgur directives.
+    :param ids: Pool of Imgur IDs.
+    :param rand: Random number generator.
+    """
+    templates = RST if corpus.fmt == "rst" else MYST
+    title = "Document {}".format(number)
+    parts = [title + "\n" + "=" * len(title) + "\n" if corpus.fmt == "rst" else "# " + title + "\n"]
+    if number >= corpus.documents:
+        return "\n".join(parts + ["Paragraph without Imgur directives.\n"] * 3)
+    directives = ["imgur"] * corpus.images + ["imgur-figure"] * corpus.figures + ["imgur-embed"] * corpus.embeds
+    for n, directive in enumerate(directives):
+        parts.append("Paragraph {} before a directive.\n".format(n))
+        parts.append(templates[directive].format(imgur_id=rand.choice(ids), n=n))
+    return "\n".join(parts)
+
+
+def generate(srcdir: Path, corpus: Corpus, server_url: str) -> List[str]:
+    """Write a project.
+
+    :param srcdir: Empty or missing directory to write the project to.
+    :param corpus: Shape of the project.
+    :param server_url: Base URL images are downloaded from (e.g. a local stand-in for i.imgur.com).
+
+    :returns: Document names.
+    """
+    if corpus.fmt not in FORMATS:
+        raise ValueError("Unknown format: {}".format(corpus.fmt))
+    srcdir.mkdir(parents=True, exist_ok=True)
+    extensions = ["myst_parser", "sphinx_imgur.imgur"] if corpus.fmt == "myst" else ["sphinx_imgur.imgur"]
+    conf = [
+        "exclude_patterns = ['_build']",
+        "extensions = {!r}".format(extensions),
+        "html_theme = 'basic'",
+        "imgur_img_src_format = {!r}".format(server_url + "/%(id)s%(size)s.%(ext)s"),
+        "latex_documents = [('index', 'corpus.tex', 'Corpus', 'Benchmark', 'howto')]",
+    ]
+    (srcdir / "conf.py").write_text("\n".join(conf) + "\n", encoding="utf8")
+
+    docnames = ["doc{:05d}".format(i) for i in range(corpus.documents + corpus.plain)]
+    suffix = ".rst" if corpus.fmt == "rst" else ".md"
+    toctree = "\n".join("    {}".format(d) for d in docnames)
+    if corpus.fmt == "rst":
+        index = "Corpus\n======\n\n.. toctree::\n\n{}\n".format(toctree)
+    else:
+        index = "# Corpus\n\n```{{toctree}}\n{}\n```\n".format("\n".join(docnames))
+    (srcdir / ("index" + suffix)).write_text(index, encoding="utf8")
+
+    ids = imgur_ids(corpus.distinct, corpus.seed)
+    rand = random.Random(corpus.seed)
+    for number, docname in enumerate(docnames):
+        (srcdir / (docname + suffix)).write_text(document(corpus, number, ids, rand), encoding="utf8")
+    return docnames
+
+
+def touch(srcdir: Path, docnames: List[str], fraction: float, fmt: str) -> List[str]:
+    """Modify some documents to trigger an incremental rebuild.
+
+    :param srcdir: Project directory.
+    :param docnames: Document names returned by generate().
+    :param fraction: Fraction of documents to modify, at least one is modified.
+    :param fmt: Source format.
+
+    :returns: Modified document names.
+    """
+    suffix = ".rst" if fmt == "rst" else ".md"
+    modified = docnames[: max(1, int(len(docnames) * fraction))]
+    for docname in modified:
+        with (srcdir / (docname + suffix)).open("a", encoding="utf8") as handle:
+            handle.write("\nAppended paragraph.\n")
+    return modified
+
+
+def change_config(srcdir: Path, **values: Any):
+    """Append config values to conf.py.
+
+    :param srcdir: Project directory.
+    :param values: Config names and values.
+    """
+    with (srcdir / "conf.py").open("a", encoding="utf8") as handle:
+        for name, value in values.items():
+            handle.write("{} = {!r}\n".format(name, value))
@@ -0,0 +1,135 @@
+"""Measure the latency of rendering a snippet with sphinx_imgur.render, compared to a Sphinx build of the same snippet.
+
+Live previews render one snippet per request, so what matters is the cost of each render from a warm process.
+
+python -m tests.benchmarks.render [--runs 500] [--sphinx-runs 20] [--budget 10]
+
+Exits with status 1 when the median render time exceeds the budget (milliseconds).
+"""
+import argparse
+import json
+import statistics
+import sys
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from sphinx.application import Sphinx
+from sphinx.util.docutils import docutils_namespace, patch_docutils
+
+from sphinx_imgur.render import render
+
+# Milliseconds, median of warm renders of SNIPPET. Update deliberately.
+BUDGET_MS = 10.0
+CONFIG = {"imgur_default_size": "l", "imgur_srcset": ("m", "l")}
+SNIPPET = """\
+Preview
+=======
+
+.. imgur:: 611EovQ
+    :alt: Image
+
+.. imgur-figure:: 611EovQm.png
+
+    Caption.
+
+.. imgur-embed:: a/hWyW0
+    :og_imgur_id: 611EovQ
+"""
+
+
+def sample(func: Callable[[], object], runs: int) -> List[float]:
+    """Call a function several times after a warm up call.
+
+    :param func: Function to measure.
+    :param runs: Number of measured calls.
+
+    :returns: Duration of each call in milliseconds.
+    """
+    func()
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def sphinx_build(workdir: Path) -> Callable[[], object]:
+    """Return a function rendering SNIPPET with a new Sphinx application, like the unit tests do.
+
+    :param workdir: Empty directory for the project.
+    """
+    srcdir = workdir / "src"
+    srcdir.mkdir()
+    settings = ["{} = {!r}".format(k, v) for k, v in sorted(CONFIG.items())]
+    (srcdir / "conf.py").write_text("\n".join(["extensions = ['sphinx_imgur.imgur']"] + settings) + "\n", encoding="utf8")
+    (srcdir / "index.rst").write_text(SNIPPET, encoding="utf8")
+
+    def build():
+        outdir = srcdir / "_build"
+        with patch_docutils(str(srcdir)), docutils_namespace():  # Same as sphinx-build.
+            app = Sphinx(str(srcdir), str(srcdir), str(outdir), str(outdir / ".doctrees"), "html", StringIO(), StringIO())
+            app.build(force_all=True)
+
+    return build
+
+
+def measure(runs: int, sphinx_runs: int) -> Dict[str, object]:
+    """Render SNIPPET with both.
+
+    :param runs: Number of measured renders with sphinx_imgur.render.
+    :param sphinx_runs: Number of measured Sphinx builds, 0 to skip.
+
+    :returns: Median and 95th percentile in milliseconds.
+    """
+    samples = sample(lambda: render(SNIPPET, CONFIG), runs)
+    results = {
+        "render_median_ms": statistics.median(samples),
+        "render_p95_ms": sorted(samples)[int(len(samples) * 0.95)],
+    }
+    if sphinx_runs:
+        with tempfile.TemporaryDirectory() as workdir:
+            samples = sample(sphinx_build(Path(workdir)), sphinx_runs)
+        results["sphinx_median_ms"] = statistics.median(samples)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Main function.
+
+    :param argv: Command line arguments, sys.argv when None.
+
+    :returns: Exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", default=500, type=int, help="Number of measured renders.")
+    parser.add_argument("--sphinx-runs", default=20, type=int, help="Number of measured Sphinx builds, 0 to skip.")
+    parser.add_argument("--budget", default=BUDGET_MS, type=float, help="Maximum median render time in milliseconds.")
+    parser.add_argument("--output", help="Write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    results = dict(measure(args.runs, args.sphinx_runs), budget_ms=args.budget, python=sys.version.split()[0])
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, sort_keys=True), encoding="utf8")
+    print(
+        "render(): {:.2f} ms median, {:.2f} ms p95 of {} runs (budget {:.1f} ms)".format(
+            results["render_median_ms"], results["render_p95_ms"], args.runs, args.budget
+        )
+    )
+    if "sphinx_median_ms" in results:
+        print(
+            "Sphinx build: {:.1f} ms median of {} runs ({:.0f}x slower)".format(
+                results["sphinx_median_ms"], args.sphinx_runs, results["sphinx_median_ms"] / results["render_median_ms"]
+            )
+        )
+    if results["render_median_ms"] > args.budget:
+        print("Render time over budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
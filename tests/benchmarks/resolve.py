@@ -0,0 +1,74 @@
+"""Micro-benchmark of resolving Imgur directive arguments and options into URLs.
+
+Compares the per-directive cost of the old code path (parse, pick formats, %-format both URLs every time) with resolve().
+
+python -m tests.benchmarks.resolve [--directives 100000] [--unique 2000]
+"""
+import argparse
+import random
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from sphinx_imgur.imgur import DEFAULT_EXT, DEFAULT_SIZE, IMG_SRC_FORMAT, TARGET_FORMAT
+from sphinx_imgur.utils import get_resolver, img_src_target_formats, imgur_id_size_ext, resolve
+
+CONFIG = {
+    "imgur_default_ext": DEFAULT_EXT,
+    "imgur_default_size": DEFAULT_SIZE,
+    "imgur_img_src_format": IMG_SRC_FORMAT,
+    "imgur_target_format": TARGET_FORMAT,
+}
+OPTIONS = [{}, {"align": "center"}, {"notarget": None}, {"size": "m"}, {"fullsize": None, "ext": "gif"}]
+Directive = Tuple[str, Dict[str, Any]]
+
+
+def generate(count: int, unique: int, seed: int = 0) -> List[Directive]:
+    """Return directive arguments and options, drawn from a limited number of distinct images like real projects.
+
+    :param count: Number of directives.
+    :param unique: Number of distinct images.
+    :param seed: Random seed.
+    """
+    rand = random.Random(seed)
+    images = ["{:07x}{}".format(i, rand.choice(["", "", "t", "l", ".png"])) for i in range(unique)]
+    return [(rand.choice(images), dict(rand.choice(OPTIONS))) for _ in range(count)]
+
+
+def before(arg: str, options: Dict[str, Any], config: Dict[str, Any]) -> Tuple[str, str, str, str, Any]:
+    """Resolution as done by the directives before URL formats were compiled."""
+    imgur_id, size, ext = imgur_id_size_ext(arg, options, config)
+    img_src_format, target_format = img_src_target_formats(options, config)
+    src = img_src_format % {"id": imgur_id, "size": size, "ext": ext}
+    target = target_format % {"id": imgur_id, "size": size, "ext": ext} if target_format else None
+    return imgur_id, size, ext, src, target
+
+
+def measure(func: Callable, directives: List[Directive]) -> float:
+    """Return the average cost of one call in microseconds."""
+    start = time.perf_counter()
+    for arg, options in directives:
+        func(arg, options, CONFIG)
+    return (time.perf_counter() - start) / len(directives) * 1e6
+
+
+def main():
+    """Main function."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--directives", default=100000, type=int, help="Number of directives.")
+    parser.add_argument("--unique", default=2000, type=int, help="Number of distinct images.")
+    args = parser.parse_args()
+
+    for label, unique in (("repeated images", args.unique), ("all unique", args.directives)):
+        directives = generate(args.directives, unique)
+        assert all(tuple(resolve(a, o, CONFIG)) == before(a, o, CONFIG) for a, o in directives[:1000])
+        get_resolver.cache_clear()
+        results = {"before": measure(before, directives), "after": measure(resolve, directives)}
+        print(
+            "{:,} directives, {} ({:,} distinct): before {:.2f} us, after {:.2f} us per directive ({:.1f}x)".format(
+                args.directives, label, unique, results["before"], results["after"], results["before"] / results["after"]
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Build a generated project with several builders and record wall time, peak RSS and pickle sizes.
+
+Each builder runs a clean build, an incremental build after modifying some documents, another one after changing
+imgur_default_size, and a no-op build. Images are served by the same local stand-in for i.imgur.com as the unit tests,
+so results don't depend on the network.
+
+python -m tests.benchmarks.run --documents 1000 --output results.json [--baseline previous.json]
+
+Exits with status 1 when a metric regressed by more than its threshold compared to the baseline.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import sphinx
+
+from sphinx_imgur import __version__
+from tests.benchmarks.corpus import change_config, Corpus, FORMATS, generate, touch
+from tests.fake_imgur import FakeImgur
+
+BUILDERS = ("html", "dirhtml", "latex")
+ROOT = Path(__file__).resolve().parents[2]
+PHASES = ("clean", "incremental", "config", "noop")
+# Relative increase over the baseline considered a regression, per metric.
+THRESHOLDS = {"wall": 0.25, "peak_rss": 0.15, "environment_pickle": 0.05, "doctrees": 0.05}
+# Wall times below this many seconds are too noisy to compare.
+MIN_WALL = 0.5
+
+
+def sizes(doctreedir: Path) -> Dict[str, int]:
+    """Return the size of the pickled environment and the total size of pickled doctrees in bytes."""
+    environment = doctreedir / "environment.pickle"
+    return {
+        "environment_pickle": environment.stat().st_size if environment.is_file() else 0,
+        "doctrees": sum(p.stat().st_size for p in doctreedir.rglob("*.doctree")),
+    }
+
+
+def build(srcdir: Path, outdir: Path, doctreedir: Path, builder: str, jobs: int) -> Dict[str, Any]:
+    """Run one build in a subprocess.
+
+    :returns: Wall time in seconds, and the peak RSS in KiB (None when unsupported) and phase timings measured by the
+        subprocess itself (see build.peak_rss()).
+    """
+    command = [sys.executable, "-m", "tests.benchmarks.build", str(srcdir), str(outdir), str(doctreedir), builder, str(jobs)]
+    start = time.perf_counter()
+    environ = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])))
+    process = subprocess.run(command, stdout=subprocess.PIPE, env=environ, check=False)
+    wall = time.perf_counter() - start
+    if process.returncode:
+        raise RuntimeError("Build failed ({}): {}".format(process.returncode, " ".join(command)))
+    return dict(json.loads(process.stdout), wall=wall)
+
+
+def run_builder(workdir: Path, corpus: Corpus, server: FakeImgur, builder: str, jobs: int, touched: float) -> Dict[str, Any]:
+    """Run all phases for one builder in a fresh copy of the project."""
+    srcdir = workdir / builder / "src"
+    outdir = workdir / builder / "out"
+    doctreedir = workdir / builder / "doctrees"
+    docnames = generate(srcdir, corpus, server.url)
+    results = {}
+    for phase in PHASES:
+        if phase == "incremental":
+            touch(srcdir, docnames, touched, corpus.fmt)
+        elif phase == "config":
+            change_config(srcdir, imgur_default_size="l")
+        server.reset()
+        result = build(srcdir, outdir, doctreedir, builder, jobs)
+        result.update(sizes(doctreedir), downloads=len(server.paths()))
+        results[phase] = result
+        print(
+            "{:8} {:12} {:7.2f}s {:>8} KiB peak RSS, {:,} bytes environment.pickle, {} downloads".format(
+                builder, phase, result["wall"], result["peak_rss"], result["environment_pickle"], result["downloads"]
+            ),
+            file=sys.stderr,
+        )
+    return results
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], thresholds: Dict[str, float]) -> List[str]:
+    """Return descriptions of metrics that regressed compared to a baseline result file."""
+    regressions = []
+    for builder, phases in results["results"].items():
+        for phase, metrics in phases.items():
+            previous_metrics = baseline["results"].get(builder, {}).get(phase)
+            if not previous_metrics:
+                continue
+            for metric, threshold in thresholds.items():
+                current, previous = metrics.get(metric), previous_metrics.get(metric)
+                if not current or not previous or (metric == "wall" and previous < MIN_WALL):
+                    continue
+                if current > previous * (1 + threshold):
+                    regressions.append(
+                        "{} {} {}: {} -> {} (+{:.0%}, threshold {:.0%})".format(
+                            builder, phase, metric, previous, current, current / previous - 1, threshold
+                        )
+                    )
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse command line arguments."""
+    defaults = Corpus()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", default=defaults.documents, type=int, help="Number of documents.")
+    parser.add_argument("--images", default=defaults.images, type=int, help="imgur directives per document.")
+    parser.add_argument("--figures", default=defaults.figures, type=int, help="imgur-figure directives per document.")
+    parser.add_argument("--embeds", default=defaults.embeds, type=int, help="imgur-embed directives per document.")
+    parser.add_argument("--plain", default=defaults.plain, type=int, help="Additional documents without directives.")
+    parser.add_argument("--distinct", default=defaults.distinct, type=int, help="Number of distinct Imgur IDs.")
+    parser.add_argument("--format", default=defaults.fmt, choices=FORMATS, dest="fmt", help="Source format.")
+    parser.add_argument("--builders", default=",".join(BUILDERS), help="Comma separated builder names.")
+    parser.add_argument("--jobs", default=1, type=int, help="Parallel jobs (sphinx-build -j).")
+    parser.add_argument("--touched", default=0.05, type=float, help="Fraction of documents modified before rebuilding.")
+    parser.add_argument("--latency", default=0.0, type=float, help="Seconds the stand-in server waits per request.")
+    parser.add_argument("--output", type=Path, help="Write results to this JSON file.")
+    parser.add_argument("--baseline", type=Path, help="Compare results to this JSON file.")
+    parser.add_argument("--workdir", type=Path, help="Keep generated projects here instead of a temporary directory.")
+    args = parser.parse_args(argv)
+    if args.fmt == "myst":
+        try:
+            __import__("myst_parser")
+        except ImportError:
+            parser.error("--format myst requires myst-parser")
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Main function.
+
+    :returns: Exit status.
+    """
+    args = parse_args(argv)
+    corpus = Corpus(
+        documents=args.documents,
+        images=args.images,
+        figures=args.figures,
+        embeds=args.embeds,
+        distinct=args.distinct,
+        fmt=args.fmt,
+        plain=args.plain,
+    )
+    results = {
+        "corpus": corpus._asdict(),
+        "environment": {
+            "python": platform.python_version(),
+            "sphinx": sphinx.__version__,
+            "sphinx_imgur": __version__,
+            "platform": platform.platform(),
+            "jobs": args.jobs,
+        },
+        "thresholds": THRESHOLDS,
+        "results": {},
+    }
+
+    server = FakeImgur()
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+    try:
+        with tempfile.TemporaryDirectory() as temporary:
+            workdir = args.workdir or Path(temporary)
+            for builder in args.builders.split(","):
+                server.latency = args.latency
+                results["results"][builder] = run_builder(workdir, corpus, server, builder, args.jobs, args.touched)
+                server.reset()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n", encoding="utf8")
+    if not args.baseline:
+        return 0
+    baseline = json.loads(args.baseline.read_text(encoding="utf8"))
+    regressions = compare(results, baseline, dict(THRESHOLDS, **baseline.get("thresholds", {})))
+    for regression in regressions:
+        print("REGRESSION: " + regression, file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
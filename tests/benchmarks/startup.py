@@ -0,0 +1,111 @@
+"""Measure how long loading the extension takes, on top of what sphinx-build imports anyway, with python -X importtime.
+
+Every sphinx-build invocation pays for it, whatever the builder. Modules in DEFERRED are only needed by some builders or
+build phases and must not be imported with the extension module.
+
+python -m tests.benchmarks.startup [--runs 7] [--budget 25]
+
+Exits with status 1 when the median import time exceeds the budget (milliseconds) or a deferred module was imported.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+EXTENSION = "sphinx_imgur.imgur"
+ROOT = Path(__file__).resolve().parents[2]
+# Milliseconds, median of warm runs (bytecode cached) excluding modules Sphinx already imported. Update deliberately.
+BUDGET_MS = 25.0
+DEFERRED = (
+    "asyncio",
+    "concurrent.futures",
+    "sphinx.builders.html",
+    "sphinx.writers.html",
+    "sphinx.writers.html5",
+    "sphinx_imgur.api",
+    "sphinx_imgur.check",
+    "sphinx_imgur.convert",
+    "sphinx_imgur.placeholder",
+    "sphinx_imgur.probe",
+)
+# Modules sphinx-build imports before loading extensions from conf.py.
+SPHINX_PRELUDE = (
+    "import importlib, sphinx.application\nfor e in sphinx.application.builtin_extensions: importlib.import_module(e)\n"
+)
+
+
+def import_times(prelude: str, pycache: str) -> Dict[str, int]:
+    """Import the extension in a new interpreter.
+
+    :param prelude: Code run before importing the extension.
+    :param pycache: Where bytecode is cached between runs.
+
+    :returns: Cumulative import time in microseconds of each module imported after the prelude.
+    """
+    code = prelude + "import sys\nsys.stderr.write('-- prelude done\\n')\nimport " + EXTENSION
+    environ = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])))
+    environ.pop("PYTHONDONTWRITEBYTECODE", None)
+    command = [sys.executable, "-X", "importtime", "-X", "pycache_prefix=" + pycache, "-c", code]
+    stderr = subprocess.run(command, stderr=subprocess.PIPE, check=True, env=environ).stderr.decode("utf8")
+    times = {}
+    for line in stderr.split("-- prelude done\n", 1)[1].splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.split("|")
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(runs: int) -> Dict[str, object]:
+    """Import the extension several times.
+
+    :param runs: Number of measured runs, after one run warming the bytecode cache.
+
+    :returns: Median and individual import times in milliseconds, and deferred modules imported anyway.
+    """
+    with tempfile.TemporaryDirectory() as pycache:
+        import_times(SPHINX_PRELUDE, pycache)
+        samples = [import_times(SPHINX_PRELUDE, pycache)[EXTENSION] / 1000 for _ in range(runs)]
+        standalone = import_times("", pycache)  # Without Sphinx's builtin extensions, e.g. plain docutils users.
+    return {
+        "median_ms": statistics.median(samples),
+        "samples_ms": samples,
+        "deferred_imported": sorted(m for m in DEFERRED if m in standalone),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Main function.
+
+    :param argv: Command line arguments, sys.argv when None.
+
+    :returns: Exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", default=7, type=int, help="Number of measured imports.")
+    parser.add_argument("--budget", default=BUDGET_MS, type=float, help="Maximum median import time in milliseconds.")
+    parser.add_argument("--output", help="Write results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    results = dict(measure(args.runs), budget_ms=args.budget, python=sys.version.split()[0])
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2, sort_keys=True), encoding="utf8")
+    print(
+        "{}: {:.1f} ms median of {} runs (budget {:.1f} ms)".format(EXTENSION, results["median_ms"], args.runs, args.budget)
+    )
+    status = 0
+    if results["median_ms"] > args.budget:
+        print("Import time over budget")
+        status = 1
+    if results["deferred_imported"]:
+        print("Imported at startup: {}".format(", ".join(results["deferred_imported"])))
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""Local HTTP stand-in imitating i.imgur.com and api.imgur.com so tests never touch the network."""
+import hashlib
+import json
+import re
+import struct
+import threading
+import time
+import zlib
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from typing import Any, Dict, List, NamedTuple, Optional, Set, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+# Widths of Imgur thumbnails by size character, empty string is the original image.
+WIDTHS = {"s": 90, "b": 160, "t": 160, "m": 320, "l": 640, "h": 1024, "": 2048}
+CONTENT_TYPES = {"gif": "image/gif", "jpeg": "image/jpeg", "jpg": "image/jpeg", "png": "image/png"}
+
+
+class Request(NamedTuple):
+    """A request received by the server."""
+
+    method: str
+    path: str
+    headers: Dict[str, str]
+
+
+# Pseudo-random bytes, and tables turning them into noise (amplitude 32) around each gray level.
+NOISE = b"".join(hashlib.sha256(struct.pack(">I", i)).digest() for i in range(2048))
+NOISE_TABLES = [bytes((level + (n >> 3)) % 256 for n in range(256)) for level in range(256)]
+
+
+@lru_cache(maxsize=None)
+def png(width: int, height: int) -> bytes:
+    """Return a valid grayscale PNG image, a noisy vertical gradient compressing about as poorly as a photo."""
+    rows = []
+    for y in range(height):
+        offset = y * 7919 % (len(NOISE) - width)
+        rows.append(b"\x00" + NOISE[slice(offset, offset + width)].translate(NOISE_TABLES[y % 256]))
+    chunks = []
+    for kind, data in (
+        (b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0)),
+        (b"IDAT", zlib.compress(b"".join(rows))),
+        (b"IEND", b""),
+    ):
+        chunks.append(struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data)))
+    return b"\x89PNG\r\n\x1a\n" + b"".join(chunks)
+
+
+def gif(width: int, height: int) -> bytes:
+    """Return a GIF header with a single transparent pixel."""
+    return b"GIF89a" + struct.pack("<HH", width, height) + b"\x80\x00\x00" + b"\x00" * 6 + b";"
+
+
+def jpeg(width: int, height: int) -> bytes:
+    """Return JPEG headers (SOI, APP0, SOF0) followed by padding, enough for anything that only parses headers."""
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+    sof0 = b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\x00"
+    return b"\xff\xd8" + app0 + sof0 + b"\x00" * (width * 8) + b"\xff\xd9"
+
+
+def image(name: str) -> Tuple[bytes, str]:
+    """Return image bytes and content type for a file name such as 611EovQh.jpg.
+
+    :param name: Image file name, size character is implied when the ID has an even length.
+    """
+    imgur_id, ext = name.rsplit(".", 1)
+    size = imgur_id[-1] if len(imgur_id) % 2 == 0 else ""
+    width = WIDTHS.get(size, WIDTHS[""])
+    height = width * 3 // 4
+    if ext == "png":
+        return png(width, height), CONTENT_TYPES[ext]
+    if ext == "gif":
+        return gif(width, height), CONTENT_TYPES[ext]
+    return jpeg(width, height), CONTENT_TYPES.get(ext, "image/jpeg")
+
+
+def album(album_id: str) -> Dict[str, Any]:
+    """Return an API response for GET /3/album/<album_id> with a landscape JPEG, a portrait PNG, and a small GIF.
+
+    :param album_id: Imgur album ID.
+    """
+    images = [
+        {"id": "000EovQ", "title": "First", "type": "image/jpeg", "width": 2048, "height": 1536, "ext": "jpg"},
+        {"id": "001EovQ", "title": None, "type": "image/png", "width": 600, "height": 900, "ext": "png"},
+        {"id": "002EovQ", "title": None, "type": "image/gif", "width": 200, "height": 100, "ext": "gif"},
+    ]
+    for entry in images:
+        entry["description"] = None
+        entry["link"] = "https://i.imgur.com/{}.{}".format(entry["id"], entry.pop("ext"))
+    data = {"id": album_id, "title": "Album {}".format(album_id), "description": None, "images_count": 3, "images": images}
+    return {"data": data, "success": True, "status": 200}
+
+
+def oembed(url: str) -> Dict[str, Any]:
+    """Return an oEmbed response for an image page URL such as https://imgur.com/611EovQ.
+
+    :param url: Imgur page URL.
+    """
+    imgur_id = url.rsplit("/", 1)[-1]
+    html = (
+        '<blockquote class="imgur-embed-pub" lang="en" data-id="{0}"><a href="{1}">View post on imgur.com</a></blockquote>'
+    )
+    return {
+        "version": "1.0",
+        "type": "rich",
+        "provider_name": "Imgur",
+        "provider_url": "https://imgur.com",
+        "title": "Image {}".format(imgur_id),
+        "width": 2048,
+        "height": 1536,
+        "html": html.format(imgur_id, url),
+    }
+
+
+class FakeImgur(ThreadingMixIn, HTTPServer):  # pylint: disable=too-many-instance-attributes
+    """Threaded HTTP server recording requests and tracking concurrency.
+
+    Set latency to delay every response, throttle to answer that many of the next requests with 429 (Retry-After: 0).
+    Paths in missing are answered with 404, paths in removed are redirected to /removed.png. Images support Range requests.
+    """
+
+    daemon_threads = True
+
+    def __init__(self):
+        """Listen on a random local port."""
+        super().__init__(("127.0.0.1", 0), Handler)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+        self.connections: Set[Tuple[str, int]] = set()
+        self.latency = 0.0
+        self.missing: Set[str] = set()
+        self.removed: Set[str] = set()
+        self.head_allowed = True
+        self.requests: List[Request] = []
+        self.api_remaining: Optional[int] = None
+        self.throttle = 0
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server."""
+        return "http://{}:{}".format(*self.server_address)
+
+    def reset(self):
+        """Forget previous requests and settings."""
+        with self.lock:
+            self.active = self.max_active = 0
+            self.connections.clear()
+            self.latency = 0.0
+            self.missing.clear()
+            self.removed.clear()
+            self.head_allowed = True
+            self.requests.clear()
+            self.api_remaining = None
+            self.throttle = 0
+
+    def paths(self, method: str = "GET") -> List[str]:
+        """Return requested paths for one HTTP method."""
+        return [r.path for r in self.requests if r.method == method]
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Request handler serving generated images and API responses."""
+
+    protocol_version = "HTTP/1.1"  # Keep-alive.
+    server: FakeImgur
+
+    def log_message(self, *_):
+        """Silence."""
+
+    def do_HEAD(self):  # noqa pylint: disable=invalid-name
+        """Handle HEAD requests."""
+        self.respond(body=False)
+
+    def do_GET(self):  # noqa pylint: disable=invalid-name
+        """Handle GET requests."""
+        self.respond(body=True)
+
+    def respond(self, body: bool):  # pylint: disable=too-many-return-statements
+        """Track the request, then reply with an image or an error."""
+        server = self.server
+        with server.lock:
+            server.requests.append(Request(self.command, self.path, dict(self.headers)))
+            server.connections.add(self.client_address)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            time.sleep(server.latency)
+            with server.lock:
+                throttled, server.throttle = server.throttle > 0, max(0, server.throttle - 1)
+            if throttled:
+                return self.send_bytes(429, b"Too Many Requests", "text/plain", body, **{"Retry-After": "0"})
+            if self.command == "HEAD" and not server.head_allowed:
+                return self.send_bytes(405, b"Method Not Allowed", "text/plain", body)
+            if self.path in server.missing:
+                return self.send_bytes(404, b"Not Found", "text/plain", body)
+            if self.path in server.removed:  # Imgur redirects deleted images instead of answering 404.
+                return self.send_bytes(302, b"", "text/plain", body, Location="/removed.png")
+            if self.path.startswith("/3/"):
+                return self.respond_api(body)
+            if self.path.startswith("/oembed.json?"):
+                url = parse_qs(urlsplit(self.path).query)["url"][0]
+                return self.send_bytes(200, json.dumps(oembed(url)).encode("utf8"), "application/json", body)
+            data, content_type = image(self.path.lstrip("/"))
+            etag = '"{}"'.format(hashlib.md5(data).hexdigest())
+            if self.headers.get("If-None-Match") == etag:
+                return self.send_bytes(304, b"", content_type, body, ETag=etag)
+            match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+            if match:
+                first, last = int(match.group(1)), min(int(match.group(2)), len(data) - 1)
+                content_range = "bytes {}-{}/{}".format(first, last, len(data))
+                data = data[slice(first, last + 1)]
+                return self.send_bytes(206, data, content_type, body, ETag=etag, **{"Content-Range": content_range})
+            return self.send_bytes(200, data, content_type, body, ETag=etag)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def respond_api(self, body: bool):
+        """Reply to an API request, enforcing authentication and the client's rate limit."""
+        server = self.server
+        if not self.headers.get("Authorization", "").startswith("Client-ID "):
+            return self.send_bytes(403, b'{"success": false, "status": 403}', "application/json", body)
+        headers = {}
+        with server.lock:
+            if server.api_remaining is not None:
+                if server.api_remaining <= 0:
+                    return self.send_bytes(429, b'{"success": false, "status": 429}', "application/json", body)
+                server.api_remaining -= 1
+                headers["X-RateLimit-ClientRemaining"] = str(server.api_remaining)
+        kind, _, imgur_id = self.path[3:].partition("/")
+        if kind != "album":
+            return self.send_bytes(404, b'{"success": false, "status": 404}', "application/json", body)
+        data = json.dumps(album(imgur_id)).encode("utf8")
+        return self.send_bytes(200, data, "application/json", body, **headers)
+
+    def send_bytes(self, status: int, data: bytes, content_type: str, body: bool, **headers: str):
+        """Send a complete response."""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(data)
@@ -1,4 +1,6 @@
 """pytest fixtures."""
+import os
+import threading
 from pathlib import Path
 from typing import Dict, List
 
@@ -9,6 +11,8 @@ from sphinx.testing.path import path
 from sphinx.testing.util import SphinxTestApp
 from TexSoup import TexNode, TexSoup
 
+from tests.fake_imgur import FakeImgur
+
 pytest_plugins = "sphinx.testing.fixtures"  # pylint: disable=invalid-name
 
 
@@ -28,6 +32,24 @@ def rootdir() -> path:
     return path(__file__).parent.abspath() / "test_docs"
 
 
+@pytest.fixture(scope="session", name="fake_imgur_server")
+def _fake_imgur_server() -> FakeImgur:
+    """Run a local Imgur stand-in for the whole session, test docs read its URL from an environment variable."""
+    server = FakeImgur()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["SPHINX_IMGUR_TEST_SERVER"] = server.url
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture()
+def fake_imgur(fake_imgur_server: FakeImgur) -> FakeImgur:
+    """Return the local Imgur stand-in with a clean slate."""
+    fake_imgur_server.reset()
+    return fake_imgur_server
+
+
 @pytest.fixture(name="sphinx_app")
 def _sphinx_app(app: SphinxTestApp) -> SphinxTestApp:
     """Instantiate a new Sphinx app per test function."""
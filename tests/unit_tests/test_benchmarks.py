@@ -0,0 +1,80 @@
+"""Tests."""
+import json
+from pathlib import Path
+
+from tests.benchmarks import render, startup
+from tests.benchmarks.corpus import Corpus, generate, touch
+from tests.benchmarks.run import compare, main
+
+
+def test_corpus(tmp_path: Path):
+    """Test generating projects."""
+    corpus = Corpus(documents=3, images=2, figures=1, embeds=1, distinct=2)
+    docnames = generate(tmp_path / "rst", corpus, "http://127.0.0.1:1")
+    assert docnames == ["doc00000", "doc00001", "doc00002"]
+    text = (tmp_path / "rst" / "doc00001.rst").read_text(encoding="utf8")
+    assert text.startswith("Document 1\n==========\n")
+    assert text.count(".. imgur:: ") == 2
+    assert text.count(".. imgur-figure:: ") == 1
+    assert text.count(".. imgur-embed:: ") == 1
+    assert "imgur_img_src_format = 'http://127.0.0.1:1/%(id)s%(size)s.%(ext)s'" in (tmp_path / "rst" / "conf.py").read_text()
+
+    generate(tmp_path / "myst", corpus._replace(fmt="myst"), "http://127.0.0.1:1")
+    text = (tmp_path / "myst" / "doc00001.md").read_text(encoding="utf8")
+    assert text.startswith("# Document 1\n")
+    assert text.count("```{imgur} ") == 2
+    assert "myst_parser" in (tmp_path / "myst" / "conf.py").read_text()
+
+    assert touch(tmp_path / "rst", docnames, 0.0, "rst") == ["doc00000"]
+    assert (tmp_path / "rst" / "doc00000.rst").read_text(encoding="utf8").endswith("\nAppended paragraph.\n")
+
+
+def test_compare():
+    """Test regression detection."""
+    baseline = {"results": {"html": {"clean": {"wall": 10.0, "peak_rss": 1000, "doctrees": 100}}}}
+    results = {"results": {"html": {"clean": {"wall": 12.0, "peak_rss": 1200, "doctrees": 100}, "noop": {"wall": 99.0}}}}
+    assert compare(results, baseline, {"wall": 0.25, "peak_rss": 0.1, "doctrees": 0.0}) == [
+        "html clean peak_rss: 1000 -> 1200 (+20%, threshold 10%)"
+    ]
+
+
+def test_run(tmp_path: Path):
+    """Test running a tiny benchmark."""
+    output = tmp_path / "results.json"
+    args = ["--documents", "2", "--builders", "html", "--workdir", str(tmp_path), "--output", str(output)]
+    assert main(args) == 0
+    results = json.loads(output.read_text(encoding="utf8"))
+    assert sorted(results["results"]["html"]) == ["clean", "config", "incremental", "noop"]
+    clean = results["results"]["html"]["clean"]
+    assert clean["warnings"] == 0
+    assert clean["environment_pickle"] > 0
+    assert clean["doctrees"] > 0
+    assert sorted(clean["timings"]) == ["download", "init", "read", "write"]
+
+    # Compare to a baseline with a much smaller environment pickle.
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"results": {"html": {"noop": {"environment_pickle": 1}}}}), encoding="utf8")
+    assert (
+        main(["--documents", "2", "--builders", "html", "--workdir", str(tmp_path / "2"), "--baseline", str(baseline)]) == 1
+    )
+
+
+def test_startup(tmp_path: Path):
+    """Test loading the extension doesn't import builder specific modules. The time budget is checked by make bench."""
+    output = tmp_path / "startup.json"
+    assert startup.main(["--runs", "3", "--budget", "inf", "--output", str(output)]) == 0
+    results = json.loads(output.read_text(encoding="utf8"))
+    assert results["deferred_imported"] == []
+    assert results["median_ms"] > 0
+    assert startup.main(["--runs", "1", "--budget", "0"]) == 1
+
+
+def test_render(tmp_path: Path):
+    """Test measuring snippet render latency. The latency budget is checked by make bench."""
+    output = tmp_path / "render.json"
+    assert render.main(["--runs", "20", "--sphinx-runs", "1", "--budget", "inf", "--output", str(output)]) == 0
+    results = json.loads(output.read_text(encoding="utf8"))
+    assert sorted(results) == ["budget_ms", "python", "render_median_ms", "render_p95_ms", "sphinx_median_ms"]
+    assert 0 < results["render_median_ms"] <= results["render_p95_ms"]
+    assert results["sphinx_median_ms"] > 0
+    assert render.main(["--runs", "1", "--sphinx-runs", "0", "--budget", "0"]) == 1
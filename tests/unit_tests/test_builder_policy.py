@@ -0,0 +1,93 @@
+"""Tests."""
+import shutil
+from io import StringIO
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Callable
+
+import pytest
+from sphinx.errors import ConfigError
+from sphinx.testing.path import path
+
+from sphinx_imgur.utils import imgur_id_size_ext, resolve
+from tests.fake_imgur import FakeImgur
+
+CONFIG = {
+    "imgur_builder_policy": {"html": {"size": "l"}, "epub": {"size": "m", "ext": "png"}, "latex": {"size": ""}},
+    "imgur_default_ext": "jpg",
+    "imgur_default_size": "h",
+    "imgur_img_src_format": "https://i.imgur.com/%(id)s%(size)s.%(ext)s",
+    "imgur_target_format": None,
+}
+HTML = SimpleNamespace(name="html", format="html")
+DIRHTML = SimpleNamespace(name="dirhtml", format="html")
+EPUB = SimpleNamespace(name="epub", format="html")
+LATEX = SimpleNamespace(name="latex", format="latex")
+TEXT = SimpleNamespace(name="text", format="text")
+
+
+def test_imgur_id_size_ext():
+    """Test policies replace defaults, but not sizes and extensions given in documents."""
+    assert imgur_id_size_ext("611EovQ", {}, CONFIG) == ("611EovQ", "h", "jpg")
+    assert imgur_id_size_ext("611EovQ", {}, CONFIG, HTML) == ("611EovQ", "l", "jpg")
+    assert imgur_id_size_ext("611EovQ", {}, CONFIG, DIRHTML) == ("611EovQ", "l", "jpg")  # By format.
+    assert imgur_id_size_ext("611EovQ", {}, CONFIG, EPUB) == ("611EovQ", "m", "png")  # By name first.
+    assert imgur_id_size_ext("611EovQ", {}, CONFIG, LATEX) == ("611EovQ", "", "jpg")  # Full size.
+    assert imgur_id_size_ext("611EovQ", {}, CONFIG, TEXT) == ("611EovQ", "h", "jpg")
+
+    assert imgur_id_size_ext("611EovQt", {}, CONFIG, EPUB) == ("611EovQ", "t", "png")
+    assert imgur_id_size_ext("611EovQ.gif", {}, CONFIG, EPUB) == ("611EovQ", "", "gif")
+    assert imgur_id_size_ext("611EovQ", {"size": "b", "ext": "jpg"}, CONFIG, EPUB) == ("611EovQ", "b", "jpg")
+    assert imgur_id_size_ext("611EovQ", {"fullsize": None}, CONFIG, HTML) == ("611EovQ", "", "jpg")
+
+    assert resolve("611EovQ", {}, CONFIG, EPUB).src == "https://i.imgur.com/611EovQm.png"
+    assert resolve("611EovQ", {}, CONFIG, LATEX).src == "https://i.imgur.com/611EovQ.jpg"
+    assert resolve("611EovQ", {}, CONFIG).src == "https://i.imgur.com/611EovQh.jpg"
+
+
+@pytest.mark.parametrize(
+    "builder,expected",
+    [
+        ("html", []),  # Not downloaded.
+        ("latex", ["/611EovQl.jpg", "/711EovQt.jpg", "/811EovQ.png", "/911EovQm.jpg"]),
+        ("epub", ["/611EovQm.png", "/711EovQt.png", "/811EovQ.png", "/911EovQm.png"]),
+    ],
+)
+def test_builder_policy(fake_imgur: FakeImgur, make_app: Callable, rootdir: path, tmp_path: Path, builder, expected):
+    """Test each builder downloads and embeds the images its policy asks for."""
+    shutil.copytree(str(rootdir / "test-builder-policy"), str(tmp_path / "src"))
+    app = make_app(builder, srcdir=path(str(tmp_path / "src")), status=StringIO(), warning=StringIO())
+    app.build()
+    assert sorted(fake_imgur.paths()) == expected
+
+    if builder == "latex":
+        tex = (Path(app.outdir) / "python.tex").read_text(encoding="utf8")
+        assert all("{{{}}}".format(p.lstrip("/").rsplit(".", 1)[0]) in tex for p in expected)
+    else:
+        page = (Path(app.outdir) / "index.xhtml" if builder == "epub" else Path(app.outdir) / "index.html").read_text(
+            encoding="utf8"
+        )
+        names = expected or ["/611EovQh.jpg", "/711EovQt.jpg", "/811EovQ.png", "/911EovQm.jpg"]
+        assert all('{}"'.format(n.lstrip("/")) in page for n in names)
+
+
+def test_shared_doctrees(fake_imgur: FakeImgur, make_app: Callable, rootdir: path, tmp_path: Path):
+    """Test documents are read again when the next builder sharing the environment has a different policy."""
+    shutil.copytree(str(rootdir / "test-builder-policy"), str(tmp_path / "src"))
+    srcdir = path(str(tmp_path / "src"))
+    read = []
+    for builder in ("html", "latex", "latex", "html"):
+        app = make_app(builder, srcdir=srcdir, status=StringIO(), warning=StringIO())
+        app.connect("source-read", lambda a, docname, __: read.append((a.builder.name, docname)))
+        app.build()
+    assert read == [("html", "index"), ("latex", "index"), ("html", "index")]
+    assert fake_imgur.paths().count("/611EovQl.jpg") == 1
+
+
+@pytest.mark.parametrize("policy", [["latex"], {"latex": "l"}, {"latex": {"width": 100}}, {"latex": {"size": 1}}])
+def test_invalid(make_app: Callable, tmp_path: Path, policy):
+    """Test malformed policies stop the build before reading documents."""
+    (tmp_path / "conf.py").write_text('extensions = ["sphinx_imgur.imgur"]\n', encoding="utf8")
+    (tmp_path / "index.rst").write_text("Title\n=====\n", encoding="utf8")
+    with pytest.raises(ConfigError, match="imgur_builder_policy"):
+        make_app("html", srcdir=path(str(tmp_path)), confoverrides={"imgur_builder_policy": policy})
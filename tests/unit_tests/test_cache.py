@@ -0,0 +1,89 @@
+"""Tests."""
+import json
+import multiprocessing
+import shutil
+import time
+from io import StringIO
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from sphinx.testing.util import SphinxTestApp
+
+from sphinx_imgur.cache import ImgurCache
+from tests.fake_imgur import FakeImgur
+
+NAMES = ["001EovQh.jpg", "011EovQh.jpg", "021EovQl.png"]
+
+
+@pytest.mark.sphinx("latex", testroot="cache")
+def test_cache(fake_imgur: FakeImgur, app: SphinxTestApp, status: StringIO, make_app: Callable):
+    """Test clean builds served from the cache, revalidation and eviction."""
+    cache_dir = Path(app.srcdir) / "_imgur_cache"
+
+    def clean_build(**confoverrides) -> str:
+        shutil.rmtree(str(Path(app.srcdir) / "_build"))
+        fake_imgur.reset()
+        status_ = StringIO()
+        app_ = make_app("latex", srcdir=app.srcdir, confoverrides=confoverrides, status=status_)
+        app_.build()
+        for name in NAMES:
+            assert (Path(app_.outdir) / name).stat().st_size > 0
+        return status_.getvalue()
+
+    # Cold cache.
+    app.build()
+    assert sorted(fake_imgur.paths()) == ["/" + n for n in NAMES]
+    assert "imgur cache: 0 hits, 3 misses, 0 revalidated, 0 evicted" in status.getvalue()
+    index = json.loads((cache_dir / "index.json").read_text(encoding="utf8"))
+    assert sorted(index["entries"]) == NAMES
+    assert all(e["etag"] for e in index["entries"].values())
+    assert sorted(p.name for p in (cache_dir / "objects").iterdir()) == NAMES
+
+    # Warm cache.
+    assert "imgur cache: 3 hits, 0 misses, 0 revalidated, 0 evicted" in clean_build()
+    assert not fake_imgur.requests
+
+    # Stale entries revalidated with conditional requests.
+    assert "imgur cache: 0 hits, 0 misses, 3 revalidated, 0 evicted" in clean_build(imgur_cache_ttl=0)
+    assert len(fake_imgur.requests) == 3
+    assert all(r.headers["If-None-Match"] for r in fake_imgur.requests)
+
+    # Stale entries still served when they can't be revalidated.
+    fake_imgur.missing.update("/" + n for n in NAMES)
+    status_ = StringIO()
+    warning_ = StringIO()
+    shutil.rmtree(str(Path(app.srcdir) / "_build"))
+    app_ = make_app("latex", srcdir=app.srcdir, confoverrides={"imgur_cache_ttl": 0}, status=status_, warning=warning_)
+    app_.build()
+    for name in NAMES:
+        assert (Path(app_.outdir) / name).stat().st_size > 0
+    assert "imgur cache: 3 hits, 0 misses, 0 revalidated, 0 evicted" in status_.getvalue()
+    assert warning_.getvalue().count("Could not revalidate cached Imgur image, using stale copy") == 3
+
+    # Least recently used entries evicted to fit the size limit, the latest build still gets its images.
+    largest = max((cache_dir / "objects" / n).stat().st_size for n in NAMES)
+    assert "2 evicted" in clean_build(imgur_cache_max_size=largest)
+    index = json.loads((cache_dir / "index.json").read_text(encoding="utf8"))
+    assert len(index["entries"]) == 1
+    assert len(list((cache_dir / "objects").iterdir())) == 1
+
+
+def update_index(directory: str, number: int):
+    """Add cache entries from another process."""
+    cache = ImgurCache(directory, max_size=1024**3, ttl=60)
+    for i in range(20):
+        key = "{}-{}".format(number, i)
+        Path(cache.object_path(key)).write_bytes(b"x")
+        cache.update({key: {"bytes": 1, "validated": time.time(), "accessed": time.time()}}, used=[])
+
+
+def test_cache_concurrent_processes(tmp_path: Path):
+    """Test concurrent builds never lose each other's index updates."""
+    ImgurCache(str(tmp_path), max_size=0, ttl=0).update({}, [])  # Create directories.
+    processes = [multiprocessing.Process(target=update_index, args=(str(tmp_path), n)) for n in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert len(ImgurCache(str(tmp_path), max_size=0, ttl=0).entries()) == 80
@@ -0,0 +1,134 @@
+"""Tests."""
+import asyncio
+import time
+from io import StringIO
+from pathlib import Path
+from typing import Callable
+
+import pytest
+import requests
+from sphinx.testing.util import SphinxTestApp
+
+from sphinx_imgur.client import BudgetExceeded, histogram, ImgurHttpClient, RateLimited, TokenBucket
+from tests.fake_imgur import FakeImgur
+
+
+def test_retry_after(fake_imgur: FakeImgur):
+    """Test 429 responses with a short Retry-After are retried."""
+    fake_imgur.throttle = 2
+    client = ImgurHttpClient(workers=2, backoff=0)
+    response = client.get(fake_imgur.url + "/611EovQh.jpg")
+    client.close()
+    assert response.status_code == 200
+    assert fake_imgur.paths() == ["/611EovQh.jpg"] * 3
+    summary = client.summary()
+    assert (summary["requests"], summary["retries"], summary["rate_limited"]) == (3, 2, 2)
+    assert not client.is_limited(fake_imgur.url)
+
+
+def test_retries_exhausted(fake_imgur: FakeImgur):
+    """Test the host is not requested again once retries are exhausted by 429 responses."""
+    fake_imgur.throttle = 10
+    client = ImgurHttpClient(retries=1, backoff=0)
+    assert client.get(fake_imgur.url + "/611EovQh.jpg").status_code == 429
+    assert client.is_limited(fake_imgur.url + "/anything")
+    with pytest.raises(RateLimited):
+        client.get(fake_imgur.url + "/711EovQh.jpg")
+    client.close()
+    assert len(fake_imgur.requests) == 2
+
+
+def test_connection_error():
+    """Test connection errors are retried, then raised."""
+    client = ImgurHttpClient(retries=2, backoff=0)
+    with pytest.raises(requests.ConnectionError):
+        client.get("http://127.0.0.1:1/611EovQh.jpg")
+    client.close()
+    assert (client.stats["requests"], client.stats["retries"]) == (3, 2)
+
+
+def test_budget(fake_imgur: FakeImgur):
+    """Test requests stop once the budget is spent."""
+    client = ImgurHttpClient(budget=2)
+    assert [client.get(fake_imgur.url + "/611EovQh.jpg").status_code for _ in range(2)] == [200, 200]
+    with pytest.raises(BudgetExceeded):
+        client.get(fake_imgur.url + "/611EovQh.jpg")
+    client.close()
+    assert len(fake_imgur.requests) == 2
+    assert client.summary()["budget_exceeded"] == 1
+
+
+def test_token_bucket():
+    """Test requests are spaced out after the initial burst."""
+    bucket = TokenBucket(20)
+    start = time.monotonic()
+    for _ in range(30):
+        bucket.acquire()
+    assert 0.4 <= time.monotonic() - start < 2
+
+
+def test_pool_and_latency(fake_imgur: FakeImgur):
+    """Test concurrency is bounded by the pool, connections are reused, and latencies are recorded."""
+    fake_imgur.latency = 0.05
+    client = ImgurHttpClient(workers=3)
+    statuses = client.map(lambda c, i: c.get("{}/{:02d}1EovQh.jpg".format(fake_imgur.url, i)).status_code, list(range(12)))
+    client.close()
+    assert statuses == [200] * 12
+    assert 1 < fake_imgur.max_active <= 3
+    assert len(fake_imgur.connections) <= 3
+    latencies = client.summary()["latency_histogram"]
+    assert sum(latencies.values()) == 12
+    assert latencies["<=0.01"] == latencies["<=0.025"] == latencies["<=0.05"] == 0
+
+
+def test_get_async(fake_imgur: FakeImgur):
+    """Test the asyncio facade."""
+    client = ImgurHttpClient(workers=4)
+
+    async def main():
+        urls = ["{}/{:02d}1EovQh.jpg".format(fake_imgur.url, i) for i in range(4)]
+        return await asyncio.gather(*(client.get_async(u) for u in urls))
+
+    responses = asyncio.new_event_loop().run_until_complete(main())
+    client.close()
+    assert [r.status_code for r in responses] == [200] * 4
+    assert len(fake_imgur.requests) == 4
+
+
+def test_histogram():
+    """Test."""
+    counts = histogram([0.001, 0.01, 0.3, 12])
+    assert counts["<=0.01"] == 2
+    assert counts["<=0.5"] == 1
+    assert counts[">10.0"] == 1
+    assert sum(counts.values()) == 4
+
+
+def remove_downloads(app: SphinxTestApp):
+    """Remove images downloaded by previous builds sharing the test root."""
+    for path in Path(app.doctreedir, "images").rglob("*"):
+        if path.is_file():
+            path.unlink()
+
+
+@pytest.mark.sphinx("latex", testroot="download", freshenv=True, confoverrides={"imgur_metrics": "metrics.json"})
+def test_client_build(fake_imgur: FakeImgur, app: SphinxTestApp, make_app: Callable, tmp_path: Path):
+    """Test downloads retry throttled requests, and the client's summary is reported."""
+    fake_imgur.throttle = 3
+    remove_downloads(app)
+    app.build()
+    assert not hasattr(app, "imgur_client")  # Closed on build-finished.
+    assert len(fake_imgur.paths()) == 11 + 3
+
+    report = (Path(app.outdir) / "metrics.json").read_text(encoding="utf8")
+    assert '"rate_limited": 3' in report
+    assert '"latency_histogram"' in report
+
+    # Budget spent.
+    fake_imgur.reset()
+    remove_downloads(app)
+    warning = StringIO()
+    confoverrides = {"imgur_http_budget": 4, "imgur_cache_dir": str(tmp_path)}
+    make_app("latex", srcdir=app.srcdir, freshenv=True, confoverrides=confoverrides, warning=warning).build()
+    assert "imgur_http_budget of 4 requests spent" in warning.getvalue()
+    remove_downloads(app)
@@ -0,0 +1,81 @@
+"""Tests."""
+import io
+import struct
+from io import StringIO
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from bs4 import BeautifulSoup
+from sphinx.testing.util import SphinxTestApp
+
+from sphinx_imgur.convert import Image, supported_formats
+from sphinx_imgur.probe import parse_dimensions, PROBE_SIZES
+from tests.fake_imgur import FakeImgur, gif, jpeg, png
+
+
+def test_parse_dimensions():
+    """Test."""
+    assert parse_dimensions(png(320, 240)[:24]) == (320, 240)
+    assert parse_dimensions(gif(200, 100)[:10]) == (200, 100)
+    assert parse_dimensions(jpeg(1024, 768)[:64]) == (1024, 768)
+    assert parse_dimensions(jpeg(1024, 768)[:10]) is None  # Truncated.
+    assert parse_dimensions(b"<html>") is None
+
+    # JPEG frame header after large metadata.
+    app1 = b"\xff\xe1" + struct.pack(">H", 10000) + b"\x00" * 9998
+    data = jpeg(640, 480)
+    data = data[:2] + app1 + data[2:]
+    assert parse_dimensions(data[: PROBE_SIZES[0]]) is None
+    assert parse_dimensions(data[: PROBE_SIZES[1]]) == (640, 480)
+
+
+@pytest.mark.skipif(supported_formats(["webp"]) != ["webp"], reason="Pillow not installed or without WebP support")
+@pytest.mark.parametrize("kwargs", [{}, {"lossless": True}, {"mode": "RGBA"}])
+def test_parse_dimensions_webp(kwargs):
+    """Test lossy (VP8), lossless (VP8L) and extended (VP8X) WebP images."""
+    buffer = io.BytesIO()
+    Image.new(kwargs.pop("mode", "RGB"), (301, 157)).save(buffer, "WEBP", **kwargs)
+    assert parse_dimensions(buffer.getvalue()[:64]) == (301, 157)
+
+
+@pytest.mark.sphinx("html", testroot="dimensions", freshenv=True)
+def test_dimensions(fake_imgur: FakeImgur, app: SphinxTestApp, status: StringIO, make_app: Callable, tmp_path: Path):
+    """Test."""
+    fake_imgur.missing.add("/711EovQh.jpg")
+    app.config["imgur_cache_dir"] = str(tmp_path)
+    app.build()
+    assert "probing 4 Imgur images... 3 done" in status.getvalue()
+    ranges = {r.path: r.headers["Range"] for r in fake_imgur.requests}
+    assert ranges == {
+        "/611EovQ.gif": "bytes=0-4095",
+        "/611EovQh.jpg": "bytes=0-4095",
+        "/611EovQm.png": "bytes=0-4095",
+        "/711EovQh.jpg": "bytes=0-4095",
+    }
+
+    index = BeautifulSoup((Path(app.outdir) / "index.html").read_text(encoding="utf8"), "html.parser")
+    first, figure, animated, missing = index.find_all("img")
+    assert (first["width"], first["height"], first["decoding"]) == ("1024", "768", "async")
+    assert first["style"] == "height: auto; max-width: 100%"
+    assert "loading" not in first.attrs  # Preloaded (imgur_preload = 1).
+    assert (figure["width"], figure["height"], figure["loading"]) == ("320", "240", "lazy")
+    assert "height" not in animated.attrs  # Dimensions from the directive's options win.
+    assert animated["style"].startswith("height: auto; max-width: 100%; width: 50%")
+    assert animated["loading"] == "lazy"
+    assert not {"width", "height", "loading", "decoding"} & set(missing.attrs)
+
+    # Probed once, failures retried.
+    fake_imgur.reset()
+    confoverrides = {"imgur_cache_dir": str(tmp_path)}
+    make_app("html", srcdir=app.srcdir, freshenv=True, confoverrides=confoverrides, status=StringIO()).build()
+    assert fake_imgur.paths() == ["/711EovQh.jpg"]
+    index = BeautifulSoup((Path(app.outdir) / "index.html").read_text(encoding="utf8"), "html.parser")
+    assert index.find_all("img")[-1]["width"] == "1024"
+
+    # Downloaded images are read from disk.
+    fake_imgur.reset()
+    app = make_app("html", srcdir=app.srcdir, freshenv=True, confoverrides={"imgur_mirror": True}, status=StringIO())
+    app.build()
+    assert not [r for r in fake_imgur.requests if "Range" in r.headers]
+    assert len(app.imgur_dimensions) == 4
@@ -0,0 +1,10 @@
+"""Sphinx test configuration."""
+import os
+
+exclude_patterns = ["_build"]
+extensions = ["sphinx_imgur.imgur"]
+html_theme = "basic"
+imgur_download_workers = 4
+imgur_img_src_format = os.environ["SPHINX_IMGUR_TEST_SERVER"] + "/%(id)s%(size)s.%(ext)s"
+master_doc = "index"
+nitpicky = True
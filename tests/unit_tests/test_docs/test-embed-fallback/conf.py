@@ -0,0 +1,9 @@
+"""Sphinx test configuration."""
+import os
+
+exclude_patterns = ["_build"]
+extensions = ["sphinx_imgur.imgur"]
+html_theme = "basic"
+imgur_img_src_format = os.environ["SPHINX_IMGUR_TEST_SERVER"] + "/%(id)s%(size)s.%(ext)s"
+master_doc = "index"
+nitpicky = True
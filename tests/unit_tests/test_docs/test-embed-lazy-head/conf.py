@@ -0,0 +1,8 @@
+"""Sphinx test configuration."""
+exclude_patterns = ["_build"]
+extensions = ["sphinx_imgur.imgur"]
+html_theme = "basic"
+imgur_embed_loading = "lazy"
+imgur_embed_script = "head"
+master_doc = "index"
+nitpicky = True
@@ -0,0 +1,7 @@
+"""Sphinx test configuration."""
+exclude_patterns = ["_build"]
+extensions = ["sphinx_imgur.imgur"]
+html_theme = "basic"
+imgur_embed_script = "each"
+master_doc = "index"
+nitpicky = True
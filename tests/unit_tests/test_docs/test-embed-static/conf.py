@@ -0,0 +1,13 @@
+"""Sphinx test configuration."""
+import os
+
+exclude_patterns = ["_build"]
+extensions = ["sphinx_imgur.imgur"]
+html_theme = "basic"
+imgur_api_url = os.environ["SPHINX_IMGUR_TEST_SERVER"] + "/3"
+imgur_client_id = "0123456789abcde"
+imgur_embed_mode = "static"
+imgur_img_src_format = os.environ["SPHINX_IMGUR_TEST_SERVER"] + "/%(id)s%(size)s.%(ext)s"
+imgur_oembed_url = os.environ["SPHINX_IMGUR_TEST_SERVER"] + "/oembed.json"
+master_doc = "index"
+nitpicky = True
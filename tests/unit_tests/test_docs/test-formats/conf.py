@@ -0,0 +1,13 @@
+"""Sphinx test configuration."""
+import os
+
+exclude_patterns = ["_build"]
+extensions = ["sphinx_imgur.imgur"]
+html_theme = "basic"
+imgur_default_ext = "png"
+imgur_default_size = "m"
+imgur_formats = ("avif", "webp")
+imgur_img_src_format = os.environ["SPHINX_IMGUR_TEST_SERVER"] + "/%(id)s%(size)s.%(ext)s"
+imgur_srcset = ("t", "m")
+master_doc = "index"
+nitpicky = True
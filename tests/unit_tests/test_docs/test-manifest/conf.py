@@ -0,0 +1,7 @@
+"""Sphinx test configuration."""
+exclude_patterns = ["_build"]
+extensions = ["sphinx_imgur.imgur"]
+html_theme = "basic"
+imgur_manifest = "_static/imgur-manifest.json"
+master_doc = "index"
+nitpicky = True
@@ -0,0 +1,8 @@
+"""Sphinx test configuration."""
+exclude_patterns = ["_build"]
+extensions = ["sphinx_imgur.imgur"]
+html_theme = "basic"
+imgur_preload = 1
+imgur_srcset = ("t", "m")
+master_doc = "index"
+nitpicky = True
@@ -0,0 +1,84 @@
+"""Tests."""
+import pickle
+from io import StringIO
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from sphinx.testing.path import path
+
+from sphinx_imgur.nodes import ImgurEmbedNode, ImgurOmittedImageNode
+from sphinx_imgur.utils import findall
+
+DIRECTIVES = 1000
+BUDGETS = {  # Pickled doctree bytes per 1,000 directives.
+    "imgur": 200_000,
+    "imgur-figure": 320_000,
+    "imgur-embed": 130_000,
+    "imgur-embed-opengraph": 185_000,
+}
+RST = {
+    "imgur": ".. imgur:: {imgur_id}\n    :alt: Image {n}\n",
+    "imgur-figure": ".. imgur-figure:: {imgur_id}.png\n    :notarget:\n\n    Figure {n}.\n",
+    "imgur-embed": ".. imgur-embed:: {imgur_id}\n    :alt: Embed {n}\n",
+}
+
+
+def doctree_size(make_app: Callable, srcdir: Path, directive: str, extensions: str) -> int:
+    """Return the pickled doctree size of a document with many directives, minus the size of an empty document.
+
+    :param make_app: Sphinx application factory.
+    :param srcdir: Empty directory to write the project to.
+    :param directive: Directive to repeat.
+    :param extensions: Value of the extensions config in conf.py.
+    """
+    srcdir.mkdir(parents=True, exist_ok=True)
+    (srcdir / "conf.py").write_text("extensions = {}\n".format(extensions), encoding="utf8")
+    title = "Title\n=====\n\n"
+    body = "\n".join(RST[directive].format(imgur_id="611EovQ" if n % 2 else "a/hWyW0", n=n) for n in range(DIRECTIVES))
+    if directive != "imgur-embed":
+        body = body.replace("a/hWyW0", "711EovQ")
+    (srcdir / "index.rst").write_text(title + body, encoding="utf8")
+    (srcdir / "empty.rst").write_text(":orphan:\n\n" + title, encoding="utf8")
+    app = make_app("dummy", srcdir=path(str(srcdir)), status=StringIO(), warning=StringIO())
+    app.build()
+    doctreedir = Path(app.doctreedir)
+    return (doctreedir / "index.doctree").stat().st_size - (doctreedir / "empty.doctree").stat().st_size
+
+
+@pytest.mark.parametrize("directive", ["imgur", "imgur-figure", "imgur-embed"])
+def test_doctree_size(make_app: Callable, tmp_path: Path, directive: str):
+    """Test doctrees (and the environment pickle) stay small with many directives."""
+    size = doctree_size(make_app, tmp_path, directive, "['sphinx_imgur.imgur']")
+    assert size * 1000 // DIRECTIVES <= BUDGETS[directive]
+
+
+def test_doctree_size_opengraph(make_app: Callable, tmp_path: Path):
+    """Test hidden opengraph images are only added when opengraph is loaded."""
+    size = doctree_size(make_app, tmp_path, "imgur-embed", "['sphinx_imgur.imgur', 'sphinxext.opengraph']")
+    assert size * 1000 // DIRECTIVES <= BUDGETS["imgur-embed-opengraph"]
+
+
+def test_embed_nodes(make_app: Callable, tmp_path: Path):
+    """Test embed nodes carry only the attributes needed to write them, and can be copied."""
+    doctree_size(make_app, tmp_path / "plain", "imgur-embed", "['sphinx_imgur.imgur']")
+    with (tmp_path / "plain" / "_build" / "doctrees" / "index.doctree").open("rb") as handle:
+        doctree = pickle.load(handle)
+    embeds = findall(doctree, ImgurEmbedNode)
+    assert len(embeds) == DIRECTIVES
+    assert not findall(doctree, ImgurOmittedImageNode)
+    defaults = {"ids", "classes", "names", "dupnames", "backrefs"}
+    assert set(embeds[0].attributes) - defaults == {"imgur_id", "title"}  # Album, no thumbnail.
+    assert set(embeds[1].attributes) - defaults == {"imgur_id", "thumbnail", "title"}
+    assert embeds[1].deepcopy()["thumbnail"] == "https://i.imgur.com/611EovQh.jpg"
+
+
+def test_embed_nodes_opengraph(make_app: Callable, tmp_path: Path):
+    """Test hidden opengraph images carry only the attributes opengraph reads."""
+    doctree_size(make_app, tmp_path / "og", "imgur-embed", "['sphinx_imgur.imgur', 'sphinxext.opengraph']")
+    with (tmp_path / "og" / "_build" / "doctrees" / "index.doctree").open("rb") as handle:
+        doctree = pickle.load(handle)
+    hidden = findall(doctree, ImgurOmittedImageNode)
+    defaults = {"ids", "classes", "names", "dupnames", "backrefs"}
+    assert len(hidden) == DIRECTIVES // 2
+    assert set(hidden[0].attributes) - defaults == {"uri", "alt", "candidates"}
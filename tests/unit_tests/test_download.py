@@ -0,0 +1,48 @@
+"""Tests."""
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from sphinx.testing.util import SphinxTestApp
+from TexSoup import TexSoup
+
+from tests.fake_imgur import FakeImgur
+
+
+@pytest.mark.sphinx("latex", testroot="download")
+def test_download(fake_imgur: FakeImgur, app: SphinxTestApp, make_app: Callable):
+    """Test concurrent prefetching of images over a pooled session."""
+    fake_imgur.latency = 0.1
+    app.build()
+
+    # Every image fetched exactly once.
+    expected = sorted(["/{:02d}1EovQh.jpg".format(i) for i in range(10)] + ["/101EovQm.png"])
+    assert sorted(fake_imgur.paths()) == expected
+
+    # Bounded concurrency over keep-alive connections.
+    assert 1 < fake_imgur.max_active <= 4
+    assert len(fake_imgur.connections) <= 4
+
+    # Images copied to the output directory and referenced by LaTeX.
+    outdir = Path(app.outdir)
+    for name in [p.lstrip("/") for p in expected]:
+        assert (outdir / name).stat().st_size > 0
+    tex = TexSoup((outdir / "python.tex").read_text(encoding="utf8"))
+    graphics = tex.find_all("sphinxincludegraphics")
+    assert [g.text for g in graphics][:2] == [["001EovQh", ".jpg"], ["011EovQh", ".jpg"]]
+    assert "://" not in str(graphics)
+
+    # Nothing downloaded again on a fresh read.
+    fake_imgur.reset()
+    make_app("latex", srcdir=app.srcdir, freshenv=True).build()
+    assert not fake_imgur.requests
+
+
+@pytest.mark.sphinx("latex", testroot="download-missing")
+def test_download_missing(fake_imgur: FakeImgur, app: SphinxTestApp, warning):
+    """Test failed downloads fall back to Sphinx's image downloader."""
+    fake_imgur.missing.add("/001EovQh.jpg")
+    app.build()
+    assert sorted(fake_imgur.paths()) == ["/001EovQh.jpg", "/001EovQh.jpg", "/011EovQh.jpg"]
+    assert "Could not fetch remote image" in warning.getvalue()
+    assert (Path(app.outdir) / "011EovQh.jpg").is_file()
@@ -0,0 +1,93 @@
+"""Tests."""
+import shutil
+from io import StringIO
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from bs4 import BeautifulSoup
+from sphinx.testing.path import path
+from sphinx.testing.util import SphinxTestApp
+from TexSoup import TexSoup
+
+from tests.fake_imgur import FakeImgur
+
+THUMBNAILS = ["/611EovQh.jpg", "/711EovQh.jpg", "/811EovQh.jpg"]
+
+
+def build(make_app: Callable, rootdir: path, tmp_path: Path, builder: str, **kwargs) -> SphinxTestApp:
+    """Build a copy of the test-embed-fallback testroot, so nothing was downloaded before.
+
+    :param make_app: Sphinx application factory.
+    :param rootdir: Directory with testroots.
+    :param tmp_path: Empty directory to copy the testroot to.
+    :param builder: Builder name.
+    :param kwargs: Passed to make_app().
+    """
+    srcdir = tmp_path / "src"
+    shutil.copytree(str(rootdir / "test-embed-fallback"), str(srcdir))
+    app = make_app(builder, srcdir=path(str(srcdir)), **kwargs)
+    app.build()
+    return app
+
+
+def test_embed_fallback_latex(fake_imgur: FakeImgur, make_app: Callable, rootdir: path, tmp_path: Path):
+    """Test embeds become linked thumbnails, downloaded in the same batch as images."""
+    status = StringIO()
+    app = build(make_app, rootdir, tmp_path, "latex", status=status)
+    assert sorted(fake_imgur.paths()) == THUMBNAILS
+    assert "downloading 3 Imgur images... 3 done" in status.getvalue()
+
+    tex_text = (Path(app.outdir) / "python.tex").read_text(encoding="utf8")
+    graphics = TexSoup(tex_text).find_all("sphinxincludegraphics")
+    assert [g.text for g in graphics] == [
+        ["811EovQh", ".jpg"],
+        ["611EovQh", ".jpg"],
+        ["711EovQh", ".jpg"],
+        ["611EovQh", ".jpg"],
+    ]
+    assert "\\sphinxhref{https://imgur.com/611EovQ}" in tex_text
+    assert "My album: \\sphinxurl{https://imgur.com/a/hWyW0}" in tex_text
+    assert "\\sphinxurl{https://imgur.com/a/VMlM6}" in tex_text  # Album without thumbnail, only the link.
+    assert "Duplicate: \\sphinxurl{https://imgur.com/611EovQ}" in tex_text
+
+
+def test_embed_fallback_epub(fake_imgur: FakeImgur, make_app: Callable, rootdir: path, tmp_path: Path):
+    """Test EPUB can't run embed.js either."""
+    app = build(make_app, rootdir, tmp_path, "epub")
+    assert sorted(fake_imgur.paths()) == THUMBNAILS
+
+    index = BeautifulSoup((Path(app.outdir) / "index.xhtml").read_text(encoding="utf8"), "html.parser")
+    assert not index.find_all("blockquote") and not index.find_all("script", src=True)
+    images = [(i["src"], i["alt"]) for i in index.find_all("img")]
+    assert images[1:] == [
+        ("_images/611EovQh.jpg", "Imgur image"),
+        ("_images/711EovQh.jpg", "My album"),
+        ("_images/611EovQh.jpg", "Duplicate"),
+    ]
+    links = [a["href"] for a in index.find_all("a", class_="reference external")]
+    assert links.count("https://imgur.com/a/VMlM6") == 1
+    assert (Path(app.outdir) / "_images" / "711EovQh.jpg").is_file()
+
+
+@pytest.mark.parametrize("builder,filename", [("text", "index.txt"), ("man", "python.1")])
+def test_embed_fallback_url(
+    fake_imgur: FakeImgur, make_app: Callable, rootdir: path, tmp_path: Path, builder: str, filename: str
+):
+    """Test builders without images only get URLs, and nothing is downloaded."""
+    app = build(make_app, rootdir, tmp_path, builder)
+    assert not fake_imgur.requests
+
+    text = (Path(app.outdir) / filename).read_text(encoding="utf8")
+    for url in ("https://imgur.com/611EovQ", "https://imgur.com/a/VMlM6"):
+        assert url in text
+    assert "My album: " in text
+
+
+def test_embed_fallback_opengraph(fake_imgur: FakeImgur, make_app: Callable, rootdir: path, tmp_path: Path):
+    """Test hidden opengraph images aren't written."""
+    overrides = {"extensions": "sphinx_imgur.imgur,sphinxext.opengraph", "ogp_site_url": "https://robpol86.com"}
+    app = build(make_app, rootdir, tmp_path, "latex", confoverrides=overrides)
+    tex_text = (Path(app.outdir) / "python.tex").read_text(encoding="utf8")
+    assert len(TexSoup(tex_text).find_all("sphinxincludegraphics")) == 4
+    assert sorted(fake_imgur.paths()) == THUMBNAILS
@@ -0,0 +1,140 @@
+"""Tests."""
+from io import StringIO
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from bs4 import BeautifulSoup
+from sphinx.testing.util import SphinxTestApp
+from sphinx.util.console import strip_colors
+
+from tests.fake_imgur import FakeImgur
+
+EMBED_JS = "//s.imgur.com/min/embed.js"
+
+
+def build(make_app: Callable, srcdir: Path, cache_dir: Path, **confoverrides) -> str:
+    """Build the test docs with metadata kept in cache_dir, return warnings."""
+    warning = StringIO()
+    confoverrides.setdefault("imgur_cache_dir", str(cache_dir))
+    make_app("html", srcdir=srcdir, confoverrides=confoverrides, status=StringIO(), warning=warning).build()
+    return "".join(w for w in strip_colors(warning.getvalue()).splitlines(True) if "already registered" not in w)
+
+
+def read(app: SphinxTestApp, name: str) -> BeautifulSoup:
+    """Parse an HTML file in the output directory."""
+    return BeautifulSoup((Path(app.outdir) / name).read_text(encoding="utf8"), "html.parser")
+
+
+@pytest.mark.sphinx("html", testroot="embed-static")
+def test_embed_static(fake_imgur: FakeImgur, app: SphinxTestApp, make_app: Callable, tmp_path: Path):
+    """Test."""
+    assert not build(make_app, app.srcdir, tmp_path)
+    assert sorted(fake_imgur.paths()) == [
+        "/3/album/VRe5m",
+        "/3/album/hWyW0",
+        "/oembed.json?url=https%3A%2F%2Fimgur.com%2F611EovQ",
+    ]
+    api = [r for r in fake_imgur.requests if r.path.startswith("/3/")]
+    assert {r.headers["Authorization"] for r in api} == {"Client-ID 0123456789abcde"}
+
+    index = read(app, "index.html")
+    gallery = index.find("div", class_="imgur-gallery")
+    assert gallery["data-id"] == "a/hWyW0"
+    images = [(i["src"], i["alt"], i["width"], i["height"]) for i in gallery.find_all("img")]
+    assert images == [
+        (fake_imgur.url + "/000EovQm.jpg", "First", "320", "240"),
+        (fake_imgur.url + "/001EovQm.png", "Album hWyW0", "213", "320"),
+        (fake_imgur.url + "/002EovQm.jpg", "Album hWyW0", "200", "100"),  # Never scaled up, still image for GIFs.
+    ]
+    assert [a["href"] for a in gallery.find_all("a")] == [
+        "https://imgur.com/000EovQ",
+        "https://imgur.com/001EovQ",
+        "https://imgur.com/002EovQ",
+        "https://imgur.com/a/hWyW0",
+    ]
+    assert gallery.find("p", class_="imgur-gallery-title").text == "Album hWyW0"
+    static = index.find("div", class_="imgur-embed-static")
+    assert static["data-id"] == "611EovQ"
+    img = static.find("img")
+    assert (img["src"], img["alt"], img["width"], img["height"]) == (
+        fake_imgur.url + "/611EovQh.jpg",
+        "Image 611EovQ",
+        "2048",
+        "1536",
+    )
+    assert img.parent["href"] == "https://imgur.com/611EovQ"
+    assert static.find("p", class_="imgur-embed-title").text == "Image 611EovQ"
+    assert not index.find("blockquote")
+    assert not index.find_all("script", src=EMBED_JS)
+
+    page = read(app, "sub/page.html")
+    assert [g["data-id"] for g in page.find_all("div", class_="imgur-gallery")] == ["a/hWyW0", "a/VRe5m"]
+    assert page.find("p", class_="imgur-gallery-title").text == "Imgur album"  # hide_post_details
+    assert not page.find("blockquote")
+    assert not page.find_all("script", src=EMBED_JS)
+
+    # Metadata is reused.
+    fake_imgur.reset()
+    assert not build(make_app, app.srcdir, tmp_path, imgur_hide_post_details=True)
+    assert not fake_imgur.requests
+    index = read(app, "index.html")
+    assert index.find("p", class_="imgur-gallery-title").text == "Imgur album"
+    assert not index.find("p", class_="imgur-embed-title")
+
+    # Widgets unless configured.
+    build(make_app, app.srcdir, tmp_path, imgur_embed_mode="widget")
+    assert not fake_imgur.requests
+    assert not read(app, "sub/page.html").find("div", class_="imgur-gallery")
+
+
+@pytest.mark.sphinx("html", testroot="embed-static")
+def test_embed_static_no_client_id(fake_imgur: FakeImgur, app: SphinxTestApp, make_app: Callable, tmp_path: Path):
+    """Test albums fall back to the widget, oEmbed doesn't need a client ID."""
+    warnings = build(make_app, app.srcdir, tmp_path, imgur_client_id=None)
+    assert "WARNING: imgur_client_id not set, 2 albums rendered with Imgur's embed widget" in warnings
+    assert fake_imgur.paths() == ["/oembed.json?url=https%3A%2F%2Fimgur.com%2F611EovQ"]
+    page = read(app, "sub/page.html")
+    assert not page.find("div", class_="imgur-gallery")
+    assert [b["data-id"] for b in page.find_all("blockquote")] == ["a/hWyW0", "a/VRe5m"]
+
+
+@pytest.mark.sphinx("html", testroot="embed-static")
+def test_embed_static_rate_limit(fake_imgur: FakeImgur, app: SphinxTestApp, make_app: Callable, tmp_path: Path):
+    """Test requests stop when few API credits remain or Imgur rejects them."""
+    fake_imgur.api_remaining = 11
+    warnings = build(make_app, app.srcdir, tmp_path, imgur_download_workers=1)
+    assert "WARNING: Imgur API rate limit reached" in warnings
+    assert fake_imgur.paths() == ["/oembed.json?url=https%3A%2F%2Fimgur.com%2F611EovQ", "/3/album/VRe5m"]
+    assert read(app, "index.html").find("blockquote")["data-id"] == "a/hWyW0"
+    page = read(app, "sub/page.html")
+    assert [g["data-id"] for g in page.find_all("div", class_="imgur-gallery")] == ["a/VRe5m"]
+    assert [b["data-id"] for b in page.find_all("blockquote")] == ["a/hWyW0"]
+    assert len(page.find_all("script", src=EMBED_JS)) == 1
+
+    # Rejected, previously fetched metadata still used.
+    fake_imgur.reset()
+    fake_imgur.api_remaining = 0
+    warnings = build(make_app, app.srcdir, tmp_path, imgur_cache_ttl=0)
+    assert "WARNING: Imgur API rate limit reached" in warnings
+    page = read(app, "sub/page.html")
+    assert [g["data-id"] for g in page.find_all("div", class_="imgur-gallery")] == ["a/VRe5m"]
+
+
+@pytest.mark.sphinx("html", testroot="embed-static")
+def test_embed_static_unavailable(fake_imgur: FakeImgur, app: SphinxTestApp, make_app: Callable, tmp_path: Path):
+    """Test images fall back to the widget when oEmbed data can't be fetched."""
+    fake_imgur.missing.add("/oembed.json?url=https%3A%2F%2Fimgur.com%2F611EovQ")
+    assert not build(make_app, app.srcdir, tmp_path)
+    index = read(app, "index.html")
+    assert index.find("div", class_="imgur-gallery")
+    assert not index.find("div", class_="imgur-embed-static")
+    assert index.find("blockquote")["data-id"] == "611EovQ"
+    assert len(index.find_all("script", src=EMBED_JS)) == 1
+
+    # Rendered once available.
+    fake_imgur.reset()
+    assert not build(make_app, app.srcdir, tmp_path)
+    index = read(app, "index.html")
+    assert index.find("div", class_="imgur-embed-static")
+    assert not index.find("blockquote")
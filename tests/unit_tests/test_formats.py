@@ -0,0 +1,74 @@
+"""Tests."""
+import hashlib
+from io import StringIO
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from bs4 import BeautifulSoup
+from sphinx.errors import ConfigError
+from sphinx.testing.path import path
+from sphinx.testing.util import SphinxTestApp
+
+from sphinx_imgur.convert import supported_formats
+from tests.fake_imgur import FakeImgur, image
+
+pytestmark = pytest.mark.skipif(
+    supported_formats(["avif", "webp"]) != ["avif", "webp"], reason="Pillow not installed or without AVIF/WebP support"
+)
+
+
+@pytest.mark.sphinx("html", testroot="formats")
+def test_formats(fake_imgur: FakeImgur, app: SphinxTestApp, status: StringIO, make_app: Callable):
+    """Test."""
+    app.build()
+    digest = hashlib.sha256(image("611EovQm.png")[0]).hexdigest()[:16]
+    avif, webp = "611EovQm.{}.avif".format(digest), "611EovQm.{}.webp".format(digest)
+    outdir = Path(app.outdir)
+    assert sorted(p.name for p in (outdir / "_images" / "imgur").iterdir()) == [avif, webp]
+    assert "converting 2 Imgur images... 2 done" in status.getvalue()
+
+    index = BeautifulSoup((outdir / "index.html").read_text(encoding="utf8"), "html.parser")
+    pictures = index.find_all("picture")
+    assert len(pictures) == 2
+    for picture in pictures:
+        sources = [(s["type"], s["srcset"]) for s in picture.find_all("source")]
+        assert sources == [("image/avif", "_images/imgur/" + avif), ("image/webp", "_images/imgur/" + webp)]
+        img = picture.find("img")
+        assert img["src"] == fake_imgur.url + "/611EovQm.png"  # Fallback for other browsers.
+        assert "srcset" not in img.attrs
+        assert picture.parent["href"] == "https://imgur.com/611EovQ"
+    gif = index.find("img", src=fake_imgur.url + "/611EovQm.gif")
+    assert gif.parent.name == "a"  # Not converted.
+
+    # Variants are cached, mirrored images are used as the fallback.
+    status_ = StringIO()
+    make_app("html", srcdir=app.srcdir, freshenv=True, confoverrides={"imgur_mirror": True}, status=status_).build()
+    assert "converting" not in status_.getvalue()
+    picture = BeautifulSoup((outdir / "index.html").read_text(encoding="utf8"), "html.parser").find("picture")
+    assert picture.find("img")["src"].startswith("_images/imgur/611EovQm.")
+
+    # Not converted unless configured.
+    app = make_app("html", srcdir=app.srcdir, confoverrides={"imgur_formats": ()})
+    app.build()
+    index = BeautifulSoup((outdir / "index.html").read_text(encoding="utf8"), "html.parser")
+    assert not index.find("picture")
+    assert "srcset" in index.find("img").attrs
+
+
+@pytest.mark.sphinx("latex", testroot="formats")
+@pytest.mark.usefixtures("fake_imgur")
+def test_formats_latex(app: SphinxTestApp, status: StringIO):
+    """Test images are only converted for HTML builders."""
+    app.build()
+    assert "converting" not in status.getvalue()
+    assert app.imgur_variants == {}
+    assert sorted(p.suffix for p in Path(app.outdir).glob("611EovQm.*")) == [".png"]
+
+
+@pytest.mark.parametrize("value", [("jpegxl",), ("webp", "gif")])
+def test_formats_invalid(make_app: Callable, tmp_path: Path, value):
+    """Test unknown formats in conf.py fail before reading documents."""
+    (tmp_path / "conf.py").write_text('extensions = ["sphinx_imgur.imgur"]\n', encoding="utf8")
+    with pytest.raises(ConfigError, match="^imgur_formats: must be a list"):
+        make_app("html", srcdir=path(str(tmp_path)), confoverrides={"imgur_formats": value}, status=StringIO())
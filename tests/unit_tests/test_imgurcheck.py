@@ -0,0 +1,65 @@
+"""Tests."""
+import json
+from io import StringIO
+from pathlib import Path
+from typing import Callable
+from urllib.parse import urlencode
+
+import pytest
+from sphinx.testing.util import SphinxTestApp
+
+from tests.fake_imgur import FakeImgur
+
+OEMBED_PATH = "/oembed.json?" + urlencode({"url": "https://imgur.com/a/hWyW0"})
+
+
+@pytest.mark.sphinx("imgurcheck", testroot="imgurcheck", freshenv=True)
+def test_imgurcheck(fake_imgur: FakeImgur, app: SphinxTestApp, make_app: Callable, status: StringIO, tmp_path: Path):
+    """Test."""
+    app.config["imgur_cache_dir"] = str(tmp_path)
+    app.build()
+    assert sorted(fake_imgur.paths("HEAD")) == ["/611EovQh.jpg", "/711EovQh.jpg", "/711EovQm.jpg", OEMBED_PATH]
+    assert "imgurcheck: 5 working, 0 broken, 0 unchecked" in status.getvalue()
+    assert app.statuscode == 0
+    outdir = Path(app.outdir)
+    assert (outdir / "output.txt").read_text(encoding="utf8") == ""
+    results = json.loads((outdir / "output.json").read_text(encoding="utf8"))["results"]
+    assert [(r["source"], r["lineno"], r["directive"], r["status"]) for r in results] == [
+        ("index.rst", 9, "imgur", "working"),
+        ("index.rst", 11, "imgur-embed", "working"),
+        ("index.rst", 11, "imgur-embed", "working"),
+        ("sub/page.rst", 5, "imgur-figure", "working"),
+        ("sub/page.rst", 10, "imgur", "working"),
+    ]
+    assert results[2]["uri"] == fake_imgur.url + "/711EovQh.jpg"  # From :og_imgur_id:.
+
+    # Working URLs aren't checked again until imgur_check_ttl expires.
+    fake_imgur.reset()
+    confoverrides = {"imgur_cache_dir": str(tmp_path)}
+    make_app("imgurcheck", srcdir=app.srcdir, confoverrides=confoverrides, status=StringIO()).build()
+    assert not fake_imgur.requests
+
+    # Deleted album and image.
+    fake_imgur.missing.add(OEMBED_PATH)
+    fake_imgur.removed.add("/711EovQh.jpg")
+    warning = StringIO()
+    confoverrides["imgur_check_ttl"] = 0
+    app = make_app("imgurcheck", srcdir=app.srcdir, confoverrides=confoverrides, status=StringIO(), warning=warning)
+    app.build()
+    assert app.statuscode == 1
+    assert "index.rst:11: WARNING: broken Imgur imgur-embed: " + fake_imgur.url + OEMBED_PATH in warning.getvalue()
+    assert (outdir / "output.txt").read_text(encoding="utf8").splitlines() == [
+        "index.rst:11: [broken] {0}{1}: 404 Client Error: Not Found for url: {0}{1}".format(fake_imgur.url, OEMBED_PATH),
+        "index.rst:11: [broken] {}/711EovQh.jpg: removed from Imgur".format(fake_imgur.url),
+    ]
+
+
+@pytest.mark.sphinx("imgurcheck", testroot="imgurcheck", freshenv=True)
+def test_imgurcheck_head_not_allowed(fake_imgur: FakeImgur, app: SphinxTestApp, tmp_path: Path):
+    """Test servers rejecting HEAD requests are checked with a single byte GET."""
+    fake_imgur.head_allowed = False
+    app.config["imgur_cache_dir"] = str(tmp_path)
+    app.build()
+    assert app.statuscode == 0
+    assert len(fake_imgur.paths("HEAD")) == len(fake_imgur.paths("GET")) == 4
+    assert {r.headers["Range"] for r in fake_imgur.requests if r.method == "GET"} == {"bytes=0-0"}
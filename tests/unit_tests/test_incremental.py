@@ -0,0 +1,46 @@
+"""Tests."""
+from io import StringIO
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pytest
+from sphinx.testing.util import SphinxTestApp
+
+
+def rebuild(make_app: Callable, srcdir: str, **confoverrides: Any) -> List[str]:
+    """Build again with different config values, return names of documents read."""
+    app = make_app("html", srcdir=srcdir, confoverrides=confoverrides, status=StringIO())
+    read = []
+    app.connect("source-read", lambda _, docname, __: read.append(docname))
+    app.build()
+    return sorted(read)
+
+
+@pytest.mark.sphinx("html", testroot="incremental")
+def test_incremental(app: SphinxTestApp, make_app: Callable):
+    """Test changing config values only re-reads documents using them."""
+    app.build()
+    assert app.env.imgur_config["imgur_default_size"] == "h"
+    srcdir = app.srcdir
+    overrides: Dict[str, Any] = {}
+
+    assert not rebuild(make_app, srcdir)
+
+    overrides["imgur_default_size"] = "m"
+    assert rebuild(make_app, srcdir, **overrides) == ["embeds", "images"]
+    assert 'src="https://i.imgur.com/611EovQm.jpg"' in (Path(app.outdir) / "images.html").read_text(encoding="utf8")
+
+    overrides["imgur_target_format"] = "https://example.com/%(id)s"
+    assert rebuild(make_app, srcdir, **overrides) == ["images"]
+    assert 'href="https://example.com/611EovQ"' in (Path(app.outdir) / "images.html").read_text(encoding="utf8")
+
+    overrides["imgur_hide_post_details"] = True
+    assert rebuild(make_app, srcdir, **overrides) == ["embeds"]
+    assert 'data-context="false"' in (Path(app.outdir) / "embeds.html").read_text(encoding="utf8")
+
+    overrides["imgur_embed_script"] = "head"
+    assert rebuild(make_app, srcdir, **overrides) == ["embeds"]
+
+    # Unrelated values.
+    overrides["imgur_download_workers"] = 2
+    assert not rebuild(make_app, srcdir, **overrides)
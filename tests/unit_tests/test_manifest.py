@@ -0,0 +1,79 @@
+"""Tests."""
+import json
+from io import StringIO
+from pathlib import Path
+
+import pytest
+from sphinx.testing.util import SphinxTestApp
+
+
+@pytest.mark.sphinx("html", testroot="manifest")
+def test_manifest(app: SphinxTestApp, status: StringIO):
+    """Test."""
+    app.build()
+    manifest = json.loads((Path(app.outdir) / "_static" / "imgur-manifest.json").read_text(encoding="utf8"))
+    assert manifest["version"] == 1
+    assert manifest["imgur_ids"] == ["611EovQ", "a/hWyW0"]
+    assert manifest["urls"] == [
+        "https://i.imgur.com/611EovQh.jpg",
+        "https://i.imgur.com/611EovQm.png",
+        "https://imgur.com/611EovQ",
+        "https://imgur.com/a/hWyW0",
+    ]
+    assert manifest["references"] == [
+        {
+            "directive": "imgur",
+            "docname": "index",
+            "ext": "jpg",
+            "imgur_id": "611EovQ",
+            "lineno": 8,
+            "size": "h",
+            "source": "index.rst",
+            "src": "https://i.imgur.com/611EovQh.jpg",
+            "target": None,
+        },
+        {
+            "directive": "imgur-embed",
+            "docname": "index",
+            "ext": "jpg",
+            "imgur_id": "a/hWyW0",
+            "lineno": 11,
+            "size": "h",
+            "source": "index.rst",
+            "src": None,
+            "target": "https://imgur.com/a/hWyW0",
+        },
+        {
+            "directive": "imgur-figure",
+            "docname": "sub/page",
+            "ext": "png",
+            "imgur_id": "611EovQ",
+            "lineno": 4,
+            "size": "m",
+            "source": "sub/page.rst",
+            "src": "https://i.imgur.com/611EovQm.png",
+            "target": "https://imgur.com/611EovQ",
+        },
+        {
+            "directive": "imgur",
+            "docname": "sub/page",
+            "ext": "jpg",
+            "imgur_id": "611EovQ",
+            "lineno": 8,
+            "size": "h",
+            "source": "sub/page.rst",
+            "src": "https://i.imgur.com/611EovQh.jpg",
+            "target": "https://imgur.com/611EovQ",
+        },
+    ]
+    assert "imgur manifest: 4 references to 2 Imgur IDs: " in status.getvalue()
+
+    # Incremental builds still list every reference.
+    (Path(app.srcdir) / "sub" / "page.rst").write_text("Page\n====\n\n.. imgur:: 611EovQl\n", encoding="utf8")
+    app.build()
+    manifest = json.loads((Path(app.outdir) / "_static" / "imgur-manifest.json").read_text(encoding="utf8"))
+    assert [r["src"] for r in manifest["references"]] == [
+        "https://i.imgur.com/611EovQh.jpg",
+        None,
+        "https://i.imgur.com/611EovQl.jpg",
+    ]
@@ -0,0 +1,90 @@
+"""Tests."""
+import json
+import os
+import shutil
+from io import StringIO
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from sphinx.testing.path import path
+from sphinx.testing.util import SphinxTestApp
+from sphinx.util.parallel import parallel_available
+
+from tests.benchmarks.corpus import Corpus, generate
+from tests.fake_imgur import FakeImgur
+
+
+@pytest.mark.sphinx("html", testroot="metrics")
+def test_metrics(app: SphinxTestApp, status: StringIO):
+    """Test."""
+    app.build()
+    report = json.loads((Path(app.outdir) / "reports" / "imgur-metrics.json").read_text(encoding="utf8"))
+    timings = report["timings"]
+    assert {k: v["count"] for k, v in timings.items()} == {
+        "ImgurEmbed.run": 2,
+        "ImgurEmbedNode.html_visit": 2,
+        "ImgurFigure.run": 1,
+        "ImgurImage.run": 2,
+        "ImgurImageNode.html_visit": 3,
+        "ImgurJavaScriptNode.html_visit": 1,
+        "convert_images": 1,
+        "fetch_embeds": 1,
+        "make_placeholders": 1,
+        "prefetch_images": 1,
+        "probe_images": 1,
+    }
+    assert set(timings["ImgurImage.run"]) == {"count", "total", "mean", "p95", "max"}
+    assert 0 < timings["ImgurImage.run"]["p95"] <= timings["ImgurImage.run"]["max"] <= timings["ImgurImage.run"]["total"]
+    assert report["counters"] == {}
+    assert report["builder"] == "html"
+    assert report["cache"] is None
+
+    assert "imgur metrics: 5 directives in " in status.getvalue()
+    assert ", 6 nodes rendered in " in status.getvalue()
+    assert not (Path(app.doctreedir) / "imgur-metrics").exists()
+
+
+@pytest.mark.skipif(not parallel_available, reason="Parallel builds not supported on this platform")
+@pytest.mark.parametrize("builder", ["html", "latex"])
+def test_metrics_parallel(fake_imgur: FakeImgur, make_app: Callable, tmp_path: Path, builder: str):
+    """Test samples from parallel read/write workers are all aggregated."""
+    corpus = Corpus(documents=40, images=3, figures=1, embeds=1, distinct=10)
+    generate(tmp_path, corpus, fake_imgur.url)
+    confoverrides = {"imgur_metrics": "metrics.json"}
+    app = make_app(builder, srcdir=path(str(tmp_path)), confoverrides=confoverrides, status=StringIO(), parallel=4)
+    app.build()
+
+    report = json.loads((Path(app.outdir) / "metrics.json").read_text(encoding="utf8"))
+    counts = {k: v["count"] for k, v in report["timings"].items()}
+    assert counts["ImgurImage.run"] == corpus.documents * corpus.images
+    assert counts["ImgurFigure.run"] == corpus.documents * corpus.figures
+    assert counts["ImgurEmbed.run"] == corpus.documents * corpus.embeds
+    assert report["processes"] > 1
+    assert report["parallel"] == 4
+    if builder == "html":
+        assert counts["ImgurEmbedNode.html_visit"] == corpus.documents * corpus.embeds
+        assert "downloads" not in report["counters"]
+    else:
+        downloaded = fake_imgur.paths()
+        assert report["counters"]["downloads"] == len(downloaded) > 0
+        assert report["counters"]["bytes_downloaded"] == sum(
+            os.path.getsize(p) for p in Path(app.doctreedir, "images").rglob("*") if p.is_file()
+        )
+        assert counts["prefetch_images"] == 1
+
+
+def test_metrics_cold_cache(fake_imgur: FakeImgur, make_app: Callable, rootdir: path, tmp_path: Path):
+    """Test the report of a build with an empty cache, nothing served from it."""
+    confoverrides = {"imgur_cache_dir": str(tmp_path / "cache"), "imgur_metrics": "metrics.json"}
+    status = StringIO()
+    shutil.copytree(str(rootdir / "test-cache"), str(tmp_path / "src"))
+    app = make_app("latex", srcdir=path(str(tmp_path / "src")), confoverrides=confoverrides, status=status)
+    app.build()
+    assert len(fake_imgur.paths()) == 3
+
+    report = json.loads((Path(app.outdir) / "metrics.json").read_text(encoding="utf8"))
+    assert report["cache"] == {"misses": 3}
+    assert report["counters"]["downloads"] == 3
+    assert ", 3 downloads (" in status.getvalue()
+    assert " bytes), 0 cache hits: " in status.getvalue()
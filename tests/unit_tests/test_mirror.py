@@ -0,0 +1,49 @@
+"""Tests."""
+import hashlib
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from bs4 import BeautifulSoup
+from sphinx.testing.util import SphinxTestApp
+
+from tests.fake_imgur import FakeImgur, image
+
+
+def mirrored_name(name: str) -> str:
+    """Return the expected mirrored file name of an image served by the stand-in server."""
+    stem, ext = name.rsplit(".", 1)
+    return "{}.{}.{}".format(stem, hashlib.sha256(image(name)[0]).hexdigest()[:16], ext)
+
+
+@pytest.mark.sphinx("html", testroot="mirror")
+def test_mirror(fake_imgur: FakeImgur, app: SphinxTestApp, make_app: Callable):
+    """Test."""
+    app.build()
+    assert sorted(fake_imgur.paths()) == ["/611EovQh.jpg", "/611EovQm.png"]
+    outdir = Path(app.outdir)
+    jpg, png = mirrored_name("611EovQh.jpg"), mirrored_name("611EovQm.png")
+    assert sorted(p.name for p in (outdir / "_images" / "imgur").iterdir()) == [jpg, png]
+
+    index = BeautifulSoup((outdir / "index.html").read_text(encoding="utf8"), "html.parser")
+    img = index.find("img")
+    assert img["src"] == "_images/imgur/" + jpg
+    assert img.parent["href"] == "https://imgur.com/611EovQ"
+    assert "srcset" not in img.attrs
+    assert index.find("blockquote", class_="imgur-embed-pub")  # Embeds are untouched.
+
+    page = BeautifulSoup((outdir / "sub" / "page.html").read_text(encoding="utf8"), "html.parser")
+    assert [i["src"] for i in page.find_all("img")] == ["../_images/imgur/" + png, "../_images/imgur/" + jpg]
+    assert page.find("img").parent["href"] == "https://imgur.com/611EovQ"
+
+    # Existing copies are reused.
+    fake_imgur.reset()
+    make_app("html", srcdir=app.srcdir, freshenv=True).build()
+    assert not fake_imgur.requests
+
+    # Not mirrored unless configured.
+    app = make_app("html", srcdir=app.srcdir, confoverrides={"imgur_mirror": False})
+    app.build()
+    img = BeautifulSoup((outdir / "index.html").read_text(encoding="utf8"), "html.parser").find("img")
+    assert img["src"] == fake_imgur.url + "/611EovQh.jpg"
+    assert "srcset" in img.attrs
@@ -0,0 +1,119 @@
+"""Tests."""
+import json
+import os
+from pathlib import Path
+from typing import Callable, Dict
+
+import pytest
+from sphinx.testing.path import path
+from sphinx.util.parallel import parallel_available
+
+DOCUMENT_COUNT = 300
+DOCUMENT_TEMPLATE = """\
+Document {number}
+=================
+
+.. imgur:: {number:03d}EovQ
+
+.. imgur-figure:: {number:03d}EovQs.png
+    :notarget:
+
+    Caption {number}.
+
+.. imgur-embed:: {number:03d}EovQ
+    :alt: Embed {number}
+
+.. imgur-embed:: a/hWyW0
+"""
+
+
+def generate_project(srcdir: Path):
+    """Write a large project with Imgur directives in every document."""
+    srcdir.mkdir(parents=True)
+    conf = [
+        'exclude_patterns = ["_build"]',
+        'extensions = ["sphinx_imgur.imgur"]',
+        'html_theme = "basic"',
+        'imgur_manifest = "imgur-manifest.json"',
+    ]
+    (srcdir / "conf.py").write_text("\n".join(conf) + "\n", encoding="utf8")
+    docnames = ["doc{:03d}".format(i) for i in range(DOCUMENT_COUNT)]
+    toctree = "\n".join("    {}".format(d) for d in docnames)
+    (srcdir / "index.rst").write_text("Index\n=====\n\n.. toctree::\n\n{}\n".format(toctree), encoding="utf8")
+    for i, docname in enumerate(docnames):
+        (srcdir / "{}.rst".format(docname)).write_text(DOCUMENT_TEMPLATE.format(number=i), encoding="utf8")
+
+
+def read_html(outdir: Path) -> Dict[str, str]:
+    """Return all rendered documents' HTML keyed by file name."""
+    return {p.name: p.read_text(encoding="utf8") for p in outdir.glob("doc*.html")}
+
+
+@pytest.mark.skipif(not parallel_available, reason="Parallel builds not supported on this platform")
+def test_parallel(make_app: Callable, tmp_path: Path):
+    """Test identical output and environment state when building with -j auto."""
+    generate_project(tmp_path / "serial")
+    generate_project(tmp_path / "parallel")
+
+    app_serial = make_app("html", srcdir=path(str(tmp_path / "serial")))
+    app_serial.build()
+    app_parallel = make_app("html", srcdir=path(str(tmp_path / "parallel")), parallel=max(os.cpu_count() or 0, 2))
+    assert app_parallel.is_parallel_allowed("read")
+    assert app_parallel.is_parallel_allowed("write")
+    app_parallel.build()
+
+    html_serial = read_html(Path(app_serial.outdir))
+    html_parallel = read_html(Path(app_parallel.outdir))
+    assert len(html_serial) == DOCUMENT_COUNT
+    assert html_parallel == html_serial
+
+    manifest_serial = json.loads((Path(app_serial.outdir) / "imgur-manifest.json").read_text(encoding="utf8"))
+    manifest_parallel = json.loads((Path(app_parallel.outdir) / "imgur-manifest.json").read_text(encoding="utf8"))
+    assert len(manifest_parallel["references"]) == DOCUMENT_COUNT * 4
+    assert manifest_parallel == manifest_serial
+
+    assert len(app_parallel.env.imgur_references) == DOCUMENT_COUNT
+    assert app_parallel.env.imgur_references == app_serial.env.imgur_references
+    assert app_parallel.env.imgur_references["doc007"] == [
+        {
+            "directive": "imgur",
+            "lineno": 4,
+            "imgur_id": "007EovQ",
+            "size": "h",
+            "ext": "jpg",
+            "src": "https://i.imgur.com/007EovQh.jpg",
+            "target": "https://imgur.com/007EovQ",
+        },
+        {
+            "directive": "imgur-figure",
+            "lineno": 6,
+            "imgur_id": "007EovQ",
+            "size": "s",
+            "ext": "png",
+            "src": "https://i.imgur.com/007EovQs.png",
+            "target": None,
+        },
+        {
+            "directive": "imgur-embed",
+            "lineno": 11,
+            "imgur_id": "007EovQ",
+            "size": "h",
+            "ext": "jpg",
+            "src": "https://i.imgur.com/007EovQh.jpg",
+            "target": "https://imgur.com/007EovQ",
+        },
+        {
+            "directive": "imgur-embed",
+            "lineno": 14,
+            "imgur_id": "a/hWyW0",
+            "size": "h",
+            "ext": "jpg",
+            "src": None,
+            "target": "https://imgur.com/a/hWyW0",
+        },
+    ]
+
+    # Removed documents are purged.
+    (Path(app_serial.srcdir) / "doc007.rst").unlink()
+    app_serial.build()
+    assert "doc007" not in app_serial.env.imgur_references
@@ -0,0 +1,51 @@
+"""Tests."""
+import base64
+import io
+from io import StringIO
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from bs4 import BeautifulSoup
+from sphinx.testing.util import SphinxTestApp
+
+from sphinx_imgur.convert import Image
+from tests.fake_imgur import FakeImgur
+
+pytestmark = pytest.mark.skipif(Image is None, reason="Pillow not installed")
+
+
+@pytest.mark.sphinx("html", testroot="placeholders")
+def test_placeholders(fake_imgur: FakeImgur, app: SphinxTestApp, status: StringIO, make_app: Callable):
+    """Test."""
+    app.build()
+    assert "computing 2 Imgur image placeholders... done" in status.getvalue()
+    index = BeautifulSoup((Path(app.outdir) / "index.html").read_text(encoding="utf8"), "html.parser")
+    image, figure, gif = index.find_all("img")
+
+    assert (image["width"], image["height"]) == ("320", "240")
+    style = image["style"]
+    assert style.startswith("height: auto; max-width: 100%; background: center / cover no-repeat url(data:image/png;")
+    data = style.split("base64,", 1)[1].rstrip(")")
+    with Image.open(io.BytesIO(base64.b64decode(data))) as placeholder:
+        assert placeholder.size == (16, 12)
+    assert len(data) < 1024
+
+    assert "width" not in figure.attrs  # Dimensions from the directive's options win.
+    assert figure["style"].startswith("height: auto; max-width: 100%; background: ")
+    assert figure["style"].endswith("; width: 50%;")
+    assert image["src"] == figure["src"] == fake_imgur.url + "/611EovQm.png"
+
+    assert "style" not in gif.attrs  # Not a valid image.
+
+    # Computed once per content hash.
+    status_ = StringIO()
+    make_app("html", srcdir=app.srcdir, freshenv=True, status=status_).build()
+    assert "computing" not in status_.getvalue()
+    index = BeautifulSoup((Path(app.outdir) / "index.html").read_text(encoding="utf8"), "html.parser")
+    assert index.find("img")["style"] == style
+
+    # Disabled.
+    make_app("html", srcdir=app.srcdir, confoverrides={"imgur_placeholders": False}).build()
+    index = BeautifulSoup((Path(app.outdir) / "index.html").read_text(encoding="utf8"), "html.parser")
+    assert "style" not in index.find("img").attrs
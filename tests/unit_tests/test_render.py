@@ -0,0 +1,78 @@
+"""Tests."""
+import pytest
+from bs4 import BeautifulSoup
+from docutils.parsers.rst import directives
+from sphinx.errors import ConfigError
+
+from sphinx_imgur.render import DEFAULT_CONFIG, render
+from sphinx_imgur.utils import resolve
+
+SNIPPET = """\
+.. imgur:: 611EovQ
+    :alt: Image
+
+.. imgur-figure:: 611EovQm.png
+    :srcset:
+
+    Caption.
+
+.. imgur-embed:: a/hWyW0
+    :og_imgur_id: 711EovQ
+"""
+
+
+def test_render():
+    """Test."""
+    rendered = render(SNIPPET)
+    assert not rendered.warnings
+    html = BeautifulSoup(rendered.html, "html.parser")
+    image, figure = html.find_all("img")
+    assert (image["src"], image["alt"], image.parent["href"]) == (
+        "https://i.imgur.com/611EovQh.jpg",
+        "Image",
+        "https://imgur.com/611EovQ",
+    )
+    assert figure["srcset"] == "https://i.imgur.com/611EovQt.png 160w, https://i.imgur.com/611EovQm.png 320w"
+    assert html.find("figcaption").text.strip() == "Caption."
+    assert html.find("blockquote", class_="imgur-embed-pub")["data-id"] == "a/hWyW0"
+    assert [s["src"] for s in html.find_all("script")] == ["//s.imgur.com/min/embed.js"]
+
+    assert [(r["directive"], r["lineno"], r["src"]) for r in rendered.references] == [
+        ("imgur", 1, "https://i.imgur.com/611EovQh.jpg"),
+        ("imgur-figure", 4, "https://i.imgur.com/611EovQm.png"),
+        ("imgur-embed", 9, "https://i.imgur.com/711EovQh.jpg"),
+    ]
+    assert rendered.references[0] == dict(directive="imgur", lineno=1, **resolve("611EovQ", {}, DEFAULT_CONFIG)._asdict())
+
+    # Nothing left registered with docutils.
+    assert "imgur" not in directives._directives  # pylint: disable=protected-access
+
+
+def test_render_config():
+    """Test config values are applied like in conf.py, including the html imgur_builder_policy entry."""
+    config = {
+        "imgur_builder_policy": {"html": {"size": "l"}},
+        "imgur_embed_loading": "lazy",
+        "imgur_embed_script": "each",
+        "imgur_target_format": None,
+    }
+    rendered = render(SNIPPET, config)
+    html = BeautifulSoup(rendered.html, "html.parser")
+    assert html.find("img")["src"] == "https://i.imgur.com/611EovQl.jpg"
+    assert html.find("img").parent.name != "a"
+    assert html.find("div", class_="imgur-embed-facade")
+    assert html.find("div", class_="imgur-embed-facade").find_next_sibling("script")
+    assert rendered.references[0]["target"] is None
+
+
+def test_render_errors():
+    """Test."""
+    rendered = render(".. imgur:: 611EovQ\n    :img_src_format: %(bad\n")
+    assert "snippet:1: (ERROR/3) Invalid URL format '%(bad'" in rendered.warnings
+    assert "system-message" in rendered.html
+    assert not rendered.references
+
+    with pytest.raises(ValueError, match="not supported without a Sphinx build: imgur_mirror"):
+        render(SNIPPET, {"imgur_mirror": True})
+    with pytest.raises(ConfigError, match="imgur_img_src_format"):
+        render(SNIPPET, {"imgur_img_src_format": "%(bad"})
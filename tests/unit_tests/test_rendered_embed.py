@@ -1,12 +1,13 @@
 """Tests."""
+import re
 from typing import List
 
 import pytest
-from bs4 import element
+from bs4 import BeautifulSoup, element
 
 
 @pytest.mark.sphinx("html", testroot="embed")
-def test_embed(blockquote_tags: List[element.Tag], img_tags: List[element.Tag]):
+def test_embed(index_html: BeautifulSoup, blockquote_tags: List[element.Tag], img_tags: List[element.Tag]):
     """Test."""
     blockquote = blockquote_tags[0]
     assert blockquote.get("class") == ["imgur-embed-pub"]
@@ -15,9 +16,7 @@ def test_embed(blockquote_tags: List[element.Tag], img_tags: List[element.Tag]):
     child = list(blockquote.children)[0]
     assert child.name == "a"
     assert child.get("href") == "https://imgur.com/a/hWyW0"
-    script = blockquote.next_sibling
-    assert script.name == "script"
-    assert script.get("src") == "//s.imgur.com/min/embed.js"
+    assert blockquote.next_sibling.name == "blockquote"
 
     blockquote = blockquote_tags[1]
     assert blockquote.get("class") == ["imgur-embed-pub"]
@@ -29,10 +28,79 @@ def test_embed(blockquote_tags: List[element.Tag], img_tags: List[element.Tag]):
     script = blockquote.next_sibling
     assert script.name == "script"
     assert script.get("src") == "//s.imgur.com/min/embed.js"
+    assert len(index_html.find_all("script", src="//s.imgur.com/min/embed.js")) == 1
 
     assert not img_tags
 
 
+@pytest.mark.sphinx("html", testroot="embed-script-each")
+def test_embed_script_each(index_html: BeautifulSoup, blockquote_tags: List[element.Tag]):
+    """Test."""
+    scripts = index_html.find_all("script", src="//s.imgur.com/min/embed.js")
+    assert len(scripts) == 2
+    for blockquote, script in zip(blockquote_tags, scripts):
+        assert blockquote.next_sibling is script
+        assert script.get("async") == ""
+
+
+@pytest.mark.sphinx("html", testroot="embed-script-head")
+def test_embed_script_head(index_html: BeautifulSoup):
+    """Test."""
+    scripts = index_html.find_all("script", src=re.compile(r"s\.imgur\.com"))
+    assert len(scripts) == 1
+    script = scripts[0]
+    assert script.parent.name == "head"
+    assert script.get("src") == "https://s.imgur.com/min/embed.js"
+    assert script.get("defer") == "defer"
+
+
+@pytest.mark.sphinx("html", testroot="embed-lazy")
+def test_embed_lazy_opengraph(index_html: BeautifulSoup, meta_tags: List[element.Tag], blockquote_tags: List[element.Tag]):
+    """Test."""
+    assert not blockquote_tags
+    facades = index_html.find_all("div", class_="imgur-embed-facade")
+    assert len(facades) == 3
+
+    facade = facades[0]
+    assert facade.get("data-id") == "611EovQ"
+    assert facade.get("data-context") is None
+    assert facade.a.get("href") == "https://imgur.com/611EovQ"
+    assert facade.img.get("src") == "https://i.imgur.com/611EovQh.jpg"
+    assert facade.img.get("alt") == "Help Text"
+    assert facade.img.get("loading") == "lazy"
+    assert facade.span.text == "Help Text"
+
+    facade = facades[1]
+    assert facade.get("data-id") == "a/hWyW0"
+    assert facade.get("data-context") == "false"
+    assert facade.img.get("src") == "https://i.imgur.com/6nOHJ5Zh.jpg"
+    assert facade.span.text == "Imgur album"
+
+    facade = facades[2]
+    assert facade.get("data-id") == "a/hWyW0"
+    assert facade.img is None
+    assert facade.a.get("href") == "https://imgur.com/a/hWyW0"
+
+    scripts = index_html.find_all("script", src=re.compile(r"s\.imgur\.com"))
+    assert not scripts
+    loaders = [s for s in index_html.find_all("script") if "IntersectionObserver" in s.text]
+    assert len(loaders) == 1
+    assert loaders[0].parent.name != "head"
+
+    og_image = [t for t in meta_tags if t.get("property", "") == "og:image"][0]
+    assert og_image.get("content") == "https://i.imgur.com/611EovQh.jpg"
+
+
+@pytest.mark.sphinx("html", testroot="embed-lazy-head")
+def test_embed_lazy_head(index_html: BeautifulSoup):
+    """Test."""
+    assert len(index_html.find_all("div", class_="imgur-embed-facade")) == 2
+    loaders = [s for s in index_html.find_all("script") if "IntersectionObserver" in s.text]
+    assert len(loaders) == 1
+    assert loaders[0].parent.name == "head"
+    assert loaders[0].get("src") is None
+
+
 @pytest.mark.sphinx("html", testroot="embed-hide-post-details")
 def test_embed_hide_post_details(blockquote_tags: List[element.Tag]):
     """Test."""
@@ -3,6 +3,7 @@ from typing import Dict, List
 
 import pytest
 from bs4 import element
+from docutils import nodes
 from TexSoup import TexNode
 
 
@@ -198,3 +199,43 @@ def test_image_target(img_tags: List[element.Tag]):
     assert image.get("src") == "https://i.imgur.com/611EovQh.jpg"
     target = image.parent
     assert target.name != "a"
+
+
+@pytest.mark.sphinx("html", testroot="image-srcset")
+def test_image_srcset(img_tags: List[element.Tag], sphinx_app):
+    """Test."""
+    image = img_tags[0]
+    assert image.get("src") == "https://i.imgur.com/611EovQh.jpg"
+    assert image.get("srcset") == (
+        "https://i.imgur.com/611EovQt.jpg 160w, https://i.imgur.com/611EovQm.jpg 320w, "
+        "https://i.imgur.com/611EovQl.jpg 640w, https://i.imgur.com/611EovQh.jpg 1024w"
+    )
+    assert image.get("sizes") == "(max-width: 1024px) 100vw, 1024px"
+    assert image.parent.get("href") == "https://imgur.com/611EovQ"
+
+    image = img_tags[1]
+    assert image.get("src") == "https://i.imgur.com/611EovQm.jpg"
+    assert image.get("srcset") == "https://i.imgur.com/611EovQt.jpg 160w, https://i.imgur.com/611EovQm.jpg 320w"
+    assert image.get("sizes") == "(max-width: 320px) 100vw, 320px"
+
+    # Disabled per directive, not applicable to square thumbnails.
+    for image in img_tags[2:4]:
+        assert image.get("srcset") is None
+        assert image.get("sizes") is None
+
+    # Full size images, never replaced with thumbnails (e.g. animated GIFs with still images).
+    assert [i.get("src") for i in img_tags[4:6]] == ["https://i.imgur.com/611EovQ.jpg", "https://i.imgur.com/611EovQ.gif"]
+    for image in img_tags[4:6]:
+        assert image.get("srcset") is None
+        assert image.get("sizes") is None
+
+    image = img_tags[6]
+    assert image.get("src") == "https://i.imgur.com/611EovQl.png"
+    assert image.get("srcset") == "https://i.imgur.com/611EovQm.png 320w, https://i.imgur.com/611EovQl.png 640w"
+    assert image.get("sizes") == "50vw"
+    assert image.find_parent("figure").find("span", class_="caption-text").text == "Caption."
+
+    # Pickled doctrees keep regular image nodes, only HTML builders convert them.
+    doctree = sphinx_app.env.get_doctree("index")
+    assert {type(n) for n in doctree.traverse(lambda n: "uri" in n)} == {nodes.image}
+    assert all("nosrcset" not in n and "srcset" in n for n in list(doctree.traverse(nodes.image))[:2])
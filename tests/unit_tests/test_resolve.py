@@ -0,0 +1,77 @@
+"""Tests."""
+from io import StringIO
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from sphinx.errors import ConfigError
+from sphinx.testing.path import path
+from sphinx.testing.util import SphinxTestApp
+from sphinx.util.console import strip_colors
+
+from sphinx_imgur.utils import ImgurUrls, resolve, url_template
+
+CONFIG = {
+    "imgur_default_ext": "jpg",
+    "imgur_default_size": "h",
+    "imgur_img_src_format": "https://i.imgur.com/%(id)s%(size)s.%(ext)s",
+    "imgur_target_format": "https://imgur.com/%(id)s",
+}
+
+
+def test_resolve():
+    """Test the public resolver API."""
+    urls = resolve("611EovQ", {}, CONFIG)
+    assert urls == ImgurUrls("611EovQ", "h", "jpg", "https://i.imgur.com/611EovQh.jpg", "https://imgur.com/611EovQ")
+    assert resolve("611EovQ", {"align": "center"}, CONFIG) == urls
+
+    urls = resolve("611EovQm.png", {"notarget": None}, CONFIG)
+    assert urls == ImgurUrls("611EovQ", "m", "png", "https://i.imgur.com/611EovQm.png", None)
+
+    urls = resolve(
+        "611EovQ", {"fullsize": None, "img_src_format": "/%%/%(id)s.%(ext)s"}, dict(CONFIG, imgur_default_ext="gif")
+    )
+    assert urls == ImgurUrls("611EovQ", "", "gif", "/%/611EovQ.gif", "https://imgur.com/611EovQ")
+
+
+@pytest.mark.parametrize(
+    "format_string",
+    ["https://i.imgur.com/%(id)s%(size)s.%(ext)s", "/{0}/100%%/%(ext)s/%(id)s?{}", "/%(id)r/%(size)5s.%(ext)s", "/static"],
+)
+def test_url_template(format_string: str):
+    """Test compiled formatting is the same as %-formatting."""
+    expected = format_string % {"id": "611EovQ", "size": "m", "ext": "jpg"}
+    assert url_template(format_string)("611EovQ", "m", "jpg") == expected
+
+
+@pytest.mark.parametrize("format_string", ["%(id)s%(size)s.%s", "%(name)s", "100%", "%(id)d", None])
+def test_url_template_invalid(format_string: str):
+    """Test."""
+    with pytest.raises(ValueError, match="Valid substitutions are"):
+        url_template(format_string)
+
+
+@pytest.mark.parametrize("name", ["imgur_img_src_format", "imgur_target_format"])
+def test_config_invalid(make_app: Callable, tmp_path: Path, name: str):
+    """Test malformed formats in conf.py fail before reading documents."""
+    (tmp_path / "conf.py").write_text('extensions = ["sphinx_imgur.imgur"]\n', encoding="utf8")
+    with pytest.raises(ConfigError, match=r"^{}: Invalid URL format '%\(id\)s/%s'".format(name)):
+        make_app("html", srcdir=path(str(tmp_path)), confoverrides={name: "%(id)s/%s"}, status=StringIO())
+
+
+@pytest.mark.sphinx("html", testroot="image-img-src-format-invalid")
+def test_directive_invalid(app: SphinxTestApp, warning: StringIO):
+    """Test malformed formats in documents are reported with their location."""
+    app.build()
+    lines = [line for line in strip_colors(warning.getvalue()).splitlines() if "Invalid URL format" in line]
+    assert len(lines) == 3
+    assert lines[0].startswith(
+        "{}:1: WARNING: Invalid URL format 'https://robpol86.com/%(id)s%(size)s.%s' (unnamed substitution)".format(
+            app.srcdir / "index.rst"
+        )
+    )
+    assert ":4: WARNING: Invalid URL format 'https://robpol86.com/100%/%(id)s'" in lines[1]
+    assert ":9: WARNING: Invalid URL format 'https://robpol86.com/%(name)s.jpg' (unknown substitution %(name)s)" in lines[2]
+
+    html = (Path(app.outdir) / "index.html").read_text(encoding="utf8")
+    assert 'src="https://i.imgur.com/611EovQm.jpg"' in html
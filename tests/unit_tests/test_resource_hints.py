@@ -0,0 +1,70 @@
+"""Tests."""
+from io import StringIO
+from pathlib import Path
+from typing import Callable
+
+import pytest
+from bs4 import BeautifulSoup
+from sphinx.testing.path import path
+from sphinx.testing.util import SphinxTestApp
+
+
+def head_links(app: SphinxTestApp, page: str = "index.html"):
+    """Return (rel, href) of <link> tags added to <head>, and attributes of preload links."""
+    head = BeautifulSoup((Path(app.outdir) / page).read_text(encoding="utf8"), "html.parser").head
+    links = head.find_all("link", rel=["preconnect", "dns-prefetch", "preload"])
+    return [(" ".join(t["rel"]), t["href"]) for t in links], [t.attrs for t in links if t["rel"] == ["preload"]]
+
+
+@pytest.mark.sphinx("html", testroot="resource-hints")
+def test_resource_hints(app: SphinxTestApp, make_app: Callable):
+    """Test."""
+    app.build()
+    links, preloads = head_links(app)
+    assert links == [
+        ("preconnect", "https://i.imgur.com"),
+        ("preconnect", "https://imgur.com"),
+        ("preconnect", "https://s.imgur.com"),
+        ("dns-prefetch", "https://i.imgur.com"),
+        ("dns-prefetch", "https://imgur.com"),
+        ("dns-prefetch", "https://s.imgur.com"),
+        ("preload", "https://i.imgur.com/711EovQh.jpg"),  # First image not excluded with :nopreload:.
+        ("preload", "https://i.imgur.com/911EovQh.jpg"),  # :preload:
+    ]
+    assert preloads[0] == {
+        "rel": ["preload"],
+        "as": "image",
+        "href": "https://i.imgur.com/711EovQh.jpg",
+        "fetchpriority": "high",
+        "imagesrcset": (
+            "https://i.imgur.com/711EovQt.jpg 160w, https://i.imgur.com/711EovQm.jpg 320w, "
+            "https://i.imgur.com/711EovQh.jpg 1024w"
+        ),
+        "imagesizes": "(max-width: 1024px) 100vw, 1024px",
+    }
+    assert "imagesrcset" not in preloads[1]
+    assert head_links(app, "plain.html") == ([], [])
+
+    # Lazy embeds, no automatic preloading.
+    confoverrides = {"imgur_embed_loading": "lazy", "imgur_preload": 0}
+    app = make_app("html", srcdir=app.srcdir, freshenv=True, confoverrides=confoverrides)
+    app.build()
+    links = head_links(app)[0]
+    assert ("preconnect", "https://s.imgur.com") not in links
+    assert ("dns-prefetch", "https://s.imgur.com") in links
+    assert [h for r, h in links if r == "preload"] == ["https://i.imgur.com/911EovQh.jpg"]
+
+    # Disabled.
+    app = make_app("html", srcdir=app.srcdir, freshenv=True, confoverrides={"imgur_preconnect": False, "imgur_preload": 0})
+    app.build()
+    assert head_links(app)[0] == [("preload", "https://i.imgur.com/911EovQh.jpg")]
+
+
+def test_preload_invalid(make_app: Callable, tmp_path: Path):
+    """Test :preload: and :nopreload: together."""
+    (tmp_path / "conf.py").write_text('extensions = ["sphinx_imgur.imgur"]\n', encoding="utf8")
+    index = "Index\n=====\n\n.. imgur:: 611EovQ\n    :preload:\n    :nopreload:\n"
+    (tmp_path / "index.rst").write_text(index, encoding="utf8")
+    warning = StringIO()
+    make_app("html", srcdir=path(str(tmp_path)), warning=warning).build()
+    assert "index.rst:4: WARNING: :preload: and :nopreload: are mutually exclusive" in warning.getvalue()